@@ -0,0 +1,70 @@
+"""广播序列化微基准：每个接收者各自json.dumps vs 只序列化一次
+
+用法（在仓库根目录运行）：
+    python benchmarks/bench_broadcast.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from word_pk_server import Player, WordPKGame, broadcast_message
+
+class NullWebSocket:
+    """丢弃所有数据的假连接，只衡量服务器侧开销"""
+    async def send(self, frame):
+        pass
+
+async def broadcast_per_recipient(game: WordPKGame, message: dict):
+    """旧实现：每个接收者各自序列化一次"""
+    tasks = [player.websocket.send(json.dumps(message))
+             for player in game.players.values()]
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def broadcast_queued(game: WordPKGame, message: dict):
+    """当前实现：只序列化一次并放入各玩家的发送队列，等待写任务发完"""
+    broadcast_message(game, message)
+    while any(player.outbox.buffered for player in game.players.values()):
+        await asyncio.sleep(0)
+
+async def measure(broadcast, game: WordPKGame, message: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await broadcast(game, message)
+    return (time.perf_counter() - start) / repeat
+
+async def main():
+    game = WordPKGame()
+    game.round = 1
+    word_data = game.get_random_word()
+    message = {
+        'type': 'new_round',
+        'round': 1,
+        'word': word_data['word'],
+        'options': word_data['options'],
+        'multiplier': 1.0,
+        'pronunciation': word_data['pronunciation'],
+        'meaning': word_data['meaning']
+    }
+
+    print(f"{'接收者':>8} {'逐个序列化(us)':>16} {'序列化一次(us)':>16} {'加速比':>8}")
+    for recipients in (2, 10, 100, 1000):
+        game.players = {}
+        for i in range(recipients):
+            ws = NullWebSocket()
+            game.players[ws] = Player(websocket=ws, name=f'p{i}')
+            game.players[ws].open_outbox()
+        message['scores'] = {p.name: p.score for p in list(game.players.values())[:2]}
+        repeat = max(20, 20000 // recipients)
+        old = await measure(broadcast_per_recipient, game, message, repeat)
+        new = await measure(broadcast_queued, game, message, repeat)
+        print(f"{recipients:>8} {old * 1e6:>16.1f} {new * 1e6:>16.1f} {old / new:>7.2f}x")
+        for player in game.players.values():
+            player.outbox.close()
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""端到端压测：启动本地服务器和大量机器人，统计吞吐、延迟和资源占用
+
+用法（在仓库根目录运行）：
+    python benchmarks/bench_e2e.py --bots 1000 --label baseline
+    python benchmarks/bench_e2e.py --bots 1000 --workers 4 --label workers4
+
+每次的结果追加到 benchmarks/results.jsonl，并与同一参数下上一次的结果对比。
+内存和CPU通过 /proc 读取，仅支持Linux。
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from word_pk_bot import Config as BotConfig, run_bots
+
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results.jsonl')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+def process_tree(pid: int) -> list:
+    """pid及其所有子进程"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+def resource_usage(pid: int) -> tuple:
+    """进程树的(CPU秒数, 常驻内存字节数)"""
+    cpu, rss = 0.0, 0
+    for p in process_tree(pid):
+        try:
+            with open(f'/proc/{p}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+            rss += int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            continue
+    return cpu, rss
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def sample_peak_rss(pid: int, stop: asyncio.Event, peak: list):
+    while not stop.is_set():
+        peak[0] = max(peak[0], resource_usage(pid)[1])
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_benchmark(args) -> dict:
+    command = [sys.executable, os.path.join(ROOT, 'word_pk_server.py')]
+    if args.workers > 1:
+        command += ['--workers', str(args.workers)]
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    try:
+        await asyncio.sleep(args.startup)
+        cpu_before, rss_before = resource_usage(server.pid)
+        stop, peak = asyncio.Event(), [rss_before]
+        sampler = asyncio.create_task(sample_peak_rss(server.pid, stop, peak))
+
+        start = time.perf_counter()
+        bots = await run_bots(args.bots, connect_rate=args.connect_rate,
+                              port=BotConfig.DEFAULT_PORT, games=args.games,
+                              accuracy=args.accuracy, min_delay=args.min_delay,
+                              max_delay=args.max_delay, encoding=args.encoding)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await sampler
+        cpu_after, _ = resource_usage(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = [latency for bot in bots for latency in bot.stats.round_latencies]
+    rooms = args.bots // 2
+    matches = sum(bot.stats.games for bot in bots) // 2
+    rounds = sum(bot.stats.rounds for bot in bots) // 2  # 每轮结果两名玩家各收到一次
+    return {
+        'label': args.label,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'bots': args.bots,
+        'workers': args.workers,
+        'games': args.games,
+        'encoding': args.encoding or 'legacy',
+        'elapsed_s': round(elapsed, 3),
+        'matches': matches,
+        'errors': sum(bot.stats.errors for bot in bots),
+        'rounds_per_s': round(rounds / elapsed, 2),
+        'latency_p50_ms': round(percentile(latencies, 50), 2),
+        'latency_p99_ms': round(percentile(latencies, 99), 2),
+        'memory_per_room_kb': round((peak[0] - rss_before) / max(rooms, 1) / 1024, 2),
+        'cpu_per_match_ms': round((cpu_after - cpu_before) / max(matches, 1) * 1000, 3),
+    }
+
+def previous_result(result: dict):
+    """同一参数下最近一次的结果"""
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    keys = ('bots', 'workers', 'games', 'encoding')
+    previous = None
+    with open(RESULTS_PATH, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if all(record.get(k) == result[k] for k in keys):
+                previous = record
+    return previous
+
+def main():
+    parser = argparse.ArgumentParser(description="单词PK端到端压测")
+    parser.add_argument('--bots', type=int, default=200)
+    parser.add_argument('--games', type=int, default=1, help="每个机器人进行的对局数")
+    parser.add_argument('--workers', type=int, default=1, help="服务器工作进程数")
+    parser.add_argument('--accuracy', type=float, default=0.8)
+    parser.add_argument('--min-delay', type=int, default=100)
+    parser.add_argument('--max-delay', type=int, default=1000)
+    parser.add_argument('--encoding', default=None, help="机器人使用的编码，默认发送名字（旧协议）")
+    parser.add_argument('--connect-rate', type=float, default=500.0, help="每秒新建连接数")
+    parser.add_argument('--startup', type=float, default=1.5, help="等待服务器启动的秒数")
+    parser.add_argument('--label', default='', help="本次结果的标记，如版本号")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    previous = previous_result(result)
+    with open(RESULTS_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    metrics = ('rounds_per_s', 'latency_p50_ms', 'latency_p99_ms',
+               'memory_per_room_kb', 'cpu_per_match_ms')
+    print(f"{result['bots']} 个机器人，{result['matches']} 场对局，"
+          f"用时 {result['elapsed_s']} 秒，错误 {result['errors']} 次")
+    for metric in metrics:
+        line = f"{metric:>20}: {result[metric]:>10}"
+        if previous:
+            line += f"   (上次 {previous['label'] or previous['time']}: {previous[metric]})"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""多进程部署：多个工作进程通过SO_REUSEPORT共享监听端口，经由本地代理进程跨进程配对
+
+代理（Broker）监听一个Unix套接字，工作进程之间用换行分隔的JSON消息通信：
+    register  工作进程上线
+    wait      某个工作进程有公开房间在等待对手
+    cancel    该房间不再等待
+    offer     代理通知后来者所在的进程：把玩家转到先等待的房间所在的进程
+    decline   后来者所在的进程放弃本次配对，先等待的房间重新排到队首
+    relay     转发给另一个工作进程的消息（玩家帧、ping/pong、关闭通知等）
+
+跨进程配对后，玩家的websocket仍由原进程持有，原进程只负责转发帧；
+房间所在进程用RemoteConnection代表这名玩家，接口与websocket连接一致。
+转发来的玩家不会独自留在房间里等待（否则两个进程可能各自留着一个无法再转发的玩家），
+这种情况下房间所在进程会把玩家退回（bounce）原进程重新配对。
+"""
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+import asyncio
+import base64
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+
+from websockets.exceptions import ConnectionClosed
+
+DEFAULT_BROKER_PATH = '/tmp/word_pk_broker.sock'
+
+def pack_frame(frame) -> dict:
+    """把websocket帧放进JSON消息"""
+    if isinstance(frame, bytes):
+        return {'frame_b64': base64.b64encode(frame).decode('ascii')}
+    return {'frame': frame}
+
+def unpack_frame(message: dict):
+    if 'frame_b64' in message:
+        return base64.b64decode(message['frame_b64'])
+    return message['frame']
+
+class Broker:
+    """跨进程匹配与转发代理"""
+    def __init__(self, path: str = DEFAULT_BROKER_PATH):
+        self.path = path
+        self.workers: Dict[int, asyncio.StreamWriter] = {}
+        self.waiting: Deque[dict] = deque()  # 等待跨进程配对的房间 {'worker': id, 'room_id': ...}
+
+    async def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle_worker, self.path)
+        async with server:
+            await server.serve_forever()
+
+    def _send(self, worker_id: int, message: dict):
+        writer = self.workers.get(worker_id)
+        if writer is not None:
+            writer.write(json.dumps(message).encode('utf-8') + b'\n')
+
+    def _remove_ticket(self, worker_id: int, room_id: str):
+        for ticket in self.waiting:
+            if ticket['worker'] == worker_id and ticket['room_id'] == room_id:
+                self.waiting.remove(ticket)
+                return
+
+    def _wait(self, ticket: dict):
+        """新房间进入等待：优先与其他进程中等待最久的房间配对"""
+        self._remove_ticket(ticket['worker'], ticket['room_id'])
+        for host in self.waiting:
+            if host['worker'] != ticket['worker']:
+                self.waiting.remove(host)
+                self._send(ticket['worker'], {
+                    'op': 'offer',
+                    'room_id': ticket['room_id'],
+                    'host_worker': host['worker'],
+                    'host_room': host['room_id']
+                })
+                return
+        self.waiting.append(ticket)
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        worker_id = None
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                op = message['op']
+                if op == 'register':
+                    worker_id = message['worker']
+                    self.workers[worker_id] = writer
+                elif op == 'wait':
+                    self._wait({'worker': worker_id, 'room_id': message['room_id']})
+                elif op == 'cancel':
+                    self._remove_ticket(worker_id, message['room_id'])
+                elif op == 'decline':
+                    self._remove_ticket(message['host_worker'], message['host_room'])
+                    self.waiting.appendleft({'worker': message['host_worker'],
+                                             'room_id': message['host_room']})
+                elif op == 'relay':
+                    message['from'] = worker_id
+                    self._send(message['to'], message)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if worker_id is not None:
+                self.workers.pop(worker_id, None)
+                self.waiting = deque(t for t in self.waiting if t['worker'] != worker_id)
+            writer.close()
+
+class ClusterLink:
+    """工作进程与代理之间的连接"""
+    def __init__(self, worker_id: int, path: str,
+                 handler: Callable[[dict], Awaitable[None]]):
+        self.worker_id = worker_id
+        self.path = path
+        self.handler = handler
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._link_ids = itertools.count(1)
+
+    async def connect(self, retries: int = 50):
+        """连接代理（代理可能稍晚启动，失败时重试）"""
+        for _ in range(retries):
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(0.1)
+        else:
+            raise ConnectionError(f"无法连接代理: {self.path}")
+        self.send({'op': 'register', 'worker': self.worker_id})
+        self._reader_task = asyncio.create_task(self._read_loop(reader))
+
+    def new_link_id(self) -> str:
+        return f"{self.worker_id}:{next(self._link_ids)}"
+
+    def send(self, message: dict):
+        if self._writer is not None:
+            self._writer.write(json.dumps(message).encode('utf-8') + b'\n')
+
+    def relay(self, to: int, message: dict):
+        """经代理把消息转发给另一个工作进程"""
+        self.send({'op': 'relay', 'to': to, **message})
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        # 按顺序处理，保证同一玩家的帧不会乱序
+        async for line in reader:
+            try:
+                await self.handler(json.loads(line))
+            except Exception as e:
+                print(f"处理代理消息时发生错误: {e}")
+
+    def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+        if self._writer:
+            self._writer.close()
+
+class RemoteConnection:
+    """另一个工作进程上的玩家连接在房间所在进程的代理对象
+
+    实现游戏逻辑用到的websocket接口：send、recv、异步迭代、ping、close。
+    """
+    def __init__(self, link: ClusterLink, worker: int, link_id: str):
+        self.link = link
+        self.worker = worker
+        self.link_id = link_id
+        self.closed = False
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._pings: Dict[int, asyncio.Future] = {}
+        self._ping_ids = itertools.count(1)
+
+    def _connection_closed(self) -> ConnectionClosed:
+        return ConnectionClosed(None, None)
+
+    def feed(self, frame):
+        """收到对端进程转发来的玩家帧"""
+        if not self.closed:
+            self._inbox.put_nowait(frame)
+
+    def feed_closed(self):
+        """对端进程报告玩家连接已断开"""
+        self.closed = True
+        self._inbox.put_nowait(None)
+        for future in self._pings.values():
+            if not future.done():
+                future.set_exception(self._connection_closed())
+        self._pings.clear()
+
+    def resolve_pong(self, ping_id: int):
+        future = self._pings.pop(ping_id, None)
+        if future and not future.done():
+            future.set_result(None)
+
+    async def send(self, frame):
+        if self.closed:
+            raise self._connection_closed()
+        self.link.relay(self.worker, {'kind': 'frame', 'link': self.link_id, **pack_frame(frame)})
+
+    async def recv(self):
+        frame = await self._inbox.get()
+        if frame is None:
+            self._inbox.put_nowait(None)  # 让后续的recv也立即返回
+            raise self._connection_closed()
+        return frame
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except ConnectionClosed:
+            raise StopAsyncIteration
+
+    async def ping(self) -> asyncio.Future:
+        """由玩家所在进程ping真实连接，返回收到pong时完成的future"""
+        if self.closed:
+            raise self._connection_closed()
+        ping_id = next(self._ping_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pings[ping_id] = future
+        self.link.relay(self.worker, {'kind': 'ping', 'link': self.link_id, 'id': ping_id})
+        return future
+
+    async def close(self, code: int = 1000, reason: str = ''):
+        if self.closed:
+            return
+        self.link.relay(self.worker, {'kind': 'close', 'link': self.link_id,
+                                      'code': code, 'reason': reason})
+        self.feed_closed()
+
+def run_cluster(workers: int, worker_main: Callable[[int, str], None],
+                broker_path: str = DEFAULT_BROKER_PATH):
+    """启动代理和workers个工作进程，阻塞直到被中断"""
+    processes: List[multiprocessing.Process] = []
+    for worker_id in range(workers):
+        process = multiprocessing.Process(target=worker_main, args=(worker_id, broker_path),
+                                          daemon=True)
+        process.start()
+        processes.append(process)
+    # 收到SIGTERM时同样走下面的清理流程，避免遗留工作进程
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(Broker(broker_path).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
@@ -0,0 +1,92 @@
+from typing import Callable, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import itertools
+
+class DeadlineHandle:
+    """已登记的截止时间，可取消"""
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when: float, callback: Callable, args: tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class DeadlineScheduler:
+    """由单个任务驱动的截止时间调度器
+
+    所有截止时间保存在一个最小堆中，只有一个后台任务等待最早的截止时间，
+    取代每个房间每轮各自创建一个sleep任务。取消采用惰性删除。
+    回调可以是普通函数或协程函数，协程会被包装成独立任务执行。
+    """
+    def __init__(self):
+        self._heap: List[Tuple[float, int, DeadlineHandle]] = []
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()  # 运行中的协程回调，保留引用以免被回收
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, delay: float, callback: Callable, *args) -> DeadlineHandle:
+        """delay秒后调用callback(*args)"""
+        loop = asyncio.get_running_loop()
+        return self.schedule_at(loop.time() + delay, callback, *args)
+
+    def schedule_at(self, when: float, callback: Callable, *args) -> DeadlineHandle:
+        """在事件循环时间when时调用callback(*args)"""
+        handle = DeadlineHandle(when, callback, args)
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (when, next(self._counter), handle))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif earliest is None or when < earliest:
+            self._wakeup.set()  # 新的截止时间更早，唤醒调度任务重新计算等待时间
+        return handle
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._heap.clear()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 丢弃堆顶已取消的条目
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, handle = heapq.heappop(self._heap)
+            if handle.cancelled:
+                continue
+            handle.cancelled = True  # 已触发，之后的cancel()无效果
+            try:
+                result = handle.callback(*handle.args)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(result)
+                    self._callbacks.add(task)
+                    task.add_done_callback(self._callback_done)
+            except Exception as e:
+                print(f"截止时间回调发生错误: {e}")
+
+    def _callback_done(self, task: asyncio.Task):
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"截止时间回调发生错误: {task.exception()}")
@@ -0,0 +1,322 @@
+"""离线生成干扰项：options1（形近词）和 options2（意近词）
+
+输入是原始单词表（JSON词汇表，或每行"单词<Tab>释义[<Tab>难度]"的文本），
+输出带干扰项的JSON词汇表，格式与 vocabulary.json 相同。
+干扰项从候选池中挑选：候选池默认是输入的单词和输入中已有的选项，可以用 --pool 追加更大的词库。
+
+形近词：字母三元组倒排索引（单词首尾补位），按共有三元组数取出候选，
+        再按编辑距离排序，只对少量候选计算编辑距离。
+意近词：释义的汉字一元、二元组倒排索引，按IDF加权的余弦相似度排序，
+        要求词性相同；与目标共享某个释义的（同义词，会造成两个正确答案）以及过于相似的会被排除。
+
+索引在主进程建好后由各工作进程共享（fork时不复制），单词按块分给多个进程并行生成；
+结果只取决于输入，与进程数无关。
+"""
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+import argparse
+import bisect
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import time
+import zlib
+
+class Config:
+    OPTIONS_PER_LIST = 3  # 每个干扰项列表的长度
+    ORTHO_CANDIDATES = 50  # 计算编辑距离的形近候选数
+    ORTHO_KEEP = 10  # 保留编辑距离最小的多少个形近候选（部分会因释义重复被跳过）
+    SEMANTIC_CANDIDATES = 50  # 参与排序的意近候选数
+    COMMON_GRAM_RATIO = 0.05  # 出现在超过该比例释义中的字（如"的"）不参与意近检索
+    SYNONYM_THRESHOLD = 0.8  # 释义相似度超过该值视为同义词，不作干扰项
+    DEFAULT_DIFFICULTY = 3  # 文本输入未给出难度时使用
+    CHUNK_SIZE = 256  # 每次分给工作进程的单词数
+
+POS_PATTERN = re.compile(r'([a-z]+)\.\s*')
+POS_ALIASES = {'vt': 'v', 'vi': 'v'}
+GLOSS_SEPARATORS = re.compile(r'[；;，,、]')
+PARENTHESES = re.compile(r'[(（][^)）]*[)）]')
+
+@dataclass(frozen=True)
+class Candidate:
+    """候选池中的一个单词"""
+    word: str
+    meaning: str  # 作为选项显示的释义，如"n. 缩写"
+    pos: FrozenSet[str]  # 词性
+    glosses: FrozenSet[str]  # 拆分后的各个释义（去掉词尾的"的""地"，"缺席的"与"缺席"视为相同）
+
+def parse_meaning(text: str) -> List[Tuple[str, str]]:
+    """把"adj.抽象的；理论的n.摘要"拆成[(词性, 释义), ...]"""
+    parts = POS_PATTERN.split(PARENTHESES.sub('', text))
+    result = []
+    # split后的形式为[词性前的文字, 词性, 释义, 词性, 释义, ...]
+    for pos, glosses in [('', parts[0])] + list(zip(parts[1::2], parts[2::2])):
+        pos = POS_ALIASES.get(pos, pos)
+        for gloss in GLOSS_SEPARATORS.split(glosses):
+            gloss = gloss.strip()
+            if gloss:
+                result.append((pos, gloss))
+    return result
+
+def make_candidate(word: str, meaning: str, meanings: Iterable[str] = ()) -> Optional[Candidate]:
+    """由单词和释义构造候选，显示的释义取第一个义项（meanings优先）"""
+    parsed = []
+    for text in list(meanings) + [meaning]:
+        parsed += parse_meaning(text)
+    if not word or not parsed:
+        return None
+    pos, gloss = parsed[0]
+    display = f"{pos}. {gloss}" if pos else gloss
+    return Candidate(word=word, meaning=display,
+                     pos=frozenset(pos for pos, _ in parsed if pos),
+                     glosses=frozenset(gloss.rstrip('的地') or gloss for _, gloss in parsed))
+
+def trigrams(word: str) -> FrozenSet[str]:
+    padded = f"$${word.lower()}$"
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def gloss_grams(glosses: Iterable[str]) -> FrozenSet[str]:
+    """释义中的单字和相邻两字"""
+    grams = set()
+    for gloss in glosses:
+        grams.update(gloss)
+        grams.update(gloss[i:i + 2] for i in range(len(gloss) - 1))
+    return frozenset(grams)
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """编辑距离；给出limit时一旦确定超过limit就提前返回limit + 1"""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class DistractorIndex:
+    """候选池上的形近、意近索引"""
+    def __init__(self, pool: List[Candidate]):
+        self.pool = pool
+
+        self._trigrams: Dict[str, array] = {}
+        self._gram_counts = array('H')  # 每个候选的三元组数
+        for i, candidate in enumerate(pool):
+            grams = trigrams(candidate.word)
+            self._gram_counts.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                self._trigrams.setdefault(gram, array('I')).append(i)
+
+        self._grams: Dict[str, array] = {}
+        candidate_grams = [gloss_grams(c.glosses) for c in pool]
+        for i, grams in enumerate(candidate_grams):
+            for gram in grams:
+                self._grams.setdefault(gram, array('I')).append(i)
+        limit = max(1, Config.COMMON_GRAM_RATIO * len(pool))
+        self._grams = {gram: ids for gram, ids in self._grams.items() if len(ids) <= limit}
+        self._idf = {gram: math.log(len(pool) / len(ids)) + 1 for gram, ids in self._grams.items()}
+        self._norms = array('d', (
+            math.sqrt(sum(self._idf[g] ** 2 for g in grams if g in self._idf)) for grams in candidate_grams))
+
+        self._by_pos: Dict[str, List[int]] = {}
+        for i, candidate in enumerate(pool):
+            for pos in candidate.pos or ('',):
+                self._by_pos.setdefault(pos, []).append(i)
+
+    def _acceptable(self, target: Candidate, candidate: Candidate, excluded: set) -> bool:
+        return (candidate.word.lower() not in excluded and candidate.meaning not in excluded and
+                not candidate.glosses & target.glosses)
+
+    def _take(self, target: Candidate, ranked: Iterable[Candidate], chosen: List[Candidate],
+              count: int, excluded: set) -> List[Candidate]:
+        """按顺序挑出可用的候选；选中的单词和释义加入excluded，避免重复"""
+        for candidate in ranked:
+            if len(chosen) >= count:
+                break
+            if self._acceptable(target, candidate, excluded):
+                chosen.append(candidate)
+                excluded.update((candidate.word.lower(), candidate.meaning))
+        return chosen
+
+    def orthographic(self, target: Candidate) -> List[Candidate]:
+        """拼写相近的候选，按编辑距离由近到远"""
+        grams = trigrams(target.word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        word = target.word.lower()
+        scored = []
+        limit = None  # 已保留的候选中最大的编辑距离，更远的不必算完
+        for i, common in shared.most_common(Config.ORTHO_CANDIDATES + 1):
+            other = self.pool[i].word.lower()
+            if other == word:
+                continue
+            # 每次编辑最多破坏3个三元组，据此得到编辑距离的下界
+            if limit is not None and max(len(grams), self._gram_counts[i]) - common > 3 * limit:
+                if len(grams) - common > 3 * limit:
+                    break  # 后面的候选共有的三元组只会更少
+                continue
+            distance = edit_distance(word, other, limit)
+            if limit is not None and distance > limit:
+                continue
+            bisect.insort(scored, (distance, -common, other, i))
+            if len(scored) >= Config.ORTHO_KEEP:
+                del scored[Config.ORTHO_KEEP:]
+                limit = scored[-1][0]
+        return [self.pool[i] for *_, i in scored]
+
+    def semantic(self, target: Candidate) -> List[Candidate]:
+        """词性相同、释义相关但不同义的候选，按相似度由高到低"""
+        grams = [g for g in gloss_grams(target.glosses) if g in self._idf]
+        if not grams:
+            return []
+        norm = math.sqrt(sum(self._idf[g] ** 2 for g in grams))
+        scores: Dict[int, float] = {}
+        for gram in grams:
+            weight = self._idf[gram] ** 2
+            for i in self._grams[gram]:
+                scores[i] = scores.get(i, 0.0) + weight
+        ranked = sorted(((score / (norm * self._norms[i]), i) for i, score in scores.items()),
+                        key=lambda item: (-item[0], self.pool[item[1]].word))
+        return [self.pool[i] for similarity, i in ranked[:Config.SEMANTIC_CANDIDATES]
+                if similarity < Config.SYNONYM_THRESHOLD and
+                (not target.pos or self.pool[i].pos & target.pos)]
+
+    def _fallback(self, target: Candidate) -> Iterable[Candidate]:
+        """候选不足时从同词性的单词中随机补足（随机数由单词决定，结果可复现）"""
+        rng = random.Random(zlib.crc32(target.word.encode('utf-8')))
+        for ids in [self._by_pos.get(pos, []) for pos in sorted(target.pos)] + [range(len(self.pool))]:
+            for _ in range(min(len(ids), 20 * Config.OPTIONS_PER_LIST)):
+                yield self.pool[ids[rng.randrange(len(ids))]]
+
+    def distractors(self, target: Candidate, count: int = Config.OPTIONS_PER_LIST
+                    ) -> Tuple[List[Candidate], List[Candidate]]:
+        """返回(形近词, 意近词)，两个列表之间不重复单词和释义"""
+        excluded = {target.word.lower(), target.meaning}
+        options1 = self._take(target, self.orthographic(target), [], count, excluded)
+        options2 = self._take(target, self.semantic(target), [], count, excluded)
+        for options in (options1, options2):
+            if len(options) < count:
+                self._take(target, self._fallback(target), options, count, excluded)
+        return options1, options2
+
+# ---- 并行生成 ----
+
+_index: Optional[DistractorIndex] = None
+
+def _init_worker(index: DistractorIndex):
+    global _index
+    _index = index
+
+def _generate(target: Candidate) -> Tuple[List[dict], List[dict]]:
+    options1, options2 = _index.distractors(target)
+    return ([{'word': c.word, 'meaning': c.meaning} for c in options1],
+            [{'word': c.word, 'meaning': c.meaning} for c in options2])
+
+def load_entries(path: str) -> List[dict]:
+    """读取JSON词汇表或"单词<Tab>释义[<Tab>难度]"文本"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            fields = line.rstrip('\n').split('\t')
+            if not fields[0].strip():
+                continue
+            if len(fields) < 2 or not fields[1].strip():
+                print(f"{path}:{line_no}: 缺少释义，已跳过")
+                continue
+            meaning = fields[1].strip()
+            entries.append({
+                'word': fields[0].strip(),
+                'pronunciation': {'uk': '', 'us': ''},
+                'meaning': meaning,
+                'meanings': [meaning],
+                'difficulty': int(fields[2]) if len(fields) > 2 and fields[2].strip()
+                              else Config.DEFAULT_DIFFICULTY,
+            })
+    return entries
+
+def build_pool(sources: Iterable[List[dict]]) -> List[Candidate]:
+    """由词汇表条目和其中已有的选项组成候选池，同一单词只保留第一次出现的"""
+    pool: Dict[str, Candidate] = {}
+    for entries in sources:
+        for entry in entries:
+            items = [(entry['word'], entry.get('meaning', ''), entry.get('meanings', ()))]
+            for key in ('options1', 'options2'):
+                items += [(opt['word'], opt['meaning'], ()) for opt in entry.get(key, [])
+                          if 'meaning' in opt]
+            for word, meaning, meanings in items:
+                if word.lower() in pool:
+                    continue
+                candidate = make_candidate(word, meaning, meanings)
+                if candidate is not None:
+                    pool[word.lower()] = candidate
+    return list(pool.values())
+
+def generate_distractors(entries: List[dict], pool: List[Candidate], processes: int = 1,
+                         overwrite: bool = False) -> int:
+    """为条目就地填写options1/options2，返回生成的条目数
+
+    overwrite为False时已有足够选项的条目保持不变。
+    """
+    targets = []
+    for position, entry in enumerate(entries):
+        if not overwrite and all(len(entry.get(key, [])) >= Config.OPTIONS_PER_LIST
+                                 for key in ('options1', 'options2')):
+            continue
+        target = make_candidate(entry['word'], entry.get('meaning', ''), entry.get('meanings', ()))
+        if target is not None:
+            targets.append((position, target))
+
+    index = DistractorIndex(pool)
+    items = [target for _, target in targets]
+    if processes > 1:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(index,)) as workers:
+            results = list(workers.imap(_generate, items, chunksize=Config.CHUNK_SIZE))
+    else:
+        _init_worker(index)
+        results = [_generate(target) for target in items]
+    for (position, _), (options1, options2) in zip(targets, results):
+        entries[position]['options1'] = options1
+        entries[position]['options2'] = options2
+    return len(targets)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为单词表离线生成形近、意近干扰项")
+    parser.add_argument('input', help="JSON词汇表，或每行\"单词<Tab>释义[<Tab>难度]\"的文本")
+    parser.add_argument('-o', '--output', help="输出的JSON词汇表（默认覆盖输入的JSON文件）")
+    parser.add_argument('--pool', action='append', default=[],
+                        help="额外的候选词库（格式同输入），可重复指定")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="并行进程数")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="重新生成已有干扰项的条目")
+    args = parser.parse_args()
+
+    output = args.output or (args.input if args.input.endswith('.json') else None)
+    if output is None:
+        parser.error("文本输入需要用 -o 指定输出文件")
+    started = time.perf_counter()
+    entries = load_entries(args.input)
+    pool = build_pool([entries] + [load_entries(path) for path in args.pool])
+    generated = generate_distractors(entries, pool, args.workers, args.overwrite)
+    tmp = output + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    os.replace(tmp, output)
+    print(f"已为 {generated}/{len(entries)} 个单词生成干扰项（候选池 {len(pool)} 个单词，"
+          f"{args.workers} 个进程，用时 {time.perf_counter() - started:.1f} 秒） -> {output}")
@@ -0,0 +1,141 @@
+"""配置和词汇表的热更新
+
+服务器把一局对局需要的配置和词汇数据打包成不可变的快照（Snapshot）：
+对局开始时取用当时的最新快照并一直使用到结束，因此替换快照不会影响进行中的对局，
+新开始的对局自动使用新快照。旧快照在最后一场使用它的对局结束后被回收。
+
+SnapshotSource定期检查配置文件和词汇表的修改时间，发生变化时：
+    配置文件  读取覆盖项，生成新的配置类（只允许覆盖RELOADABLE中列出的项）
+    词汇表    在线程池中重新校验、编译并构建索引和选题器（内容没变时直接沿用）
+只有变化的部分会重建，构建完成后在事件循环中一次赋值完成替换，不会阻塞进行中的对局。
+新配置或词汇表校验失败时保留旧快照并输出错误。
+"""
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+import asyncio
+import json
+import os
+
+from vocabulary_index import VocabularyIndex
+from vocabulary_store import DEFAULT_JSON_PATH, load_vocabulary, source_hash
+from word_selector import WordSelector
+
+@dataclass(frozen=True)
+class Snapshot:
+    """一局对局使用的配置和词汇数据"""
+    version: int
+    config: type  # 服务器Config类或其带覆盖项的子类
+    vocab_index: VocabularyIndex
+    selector: WordSelector
+
+def _file_stamp(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    """文件的(修改时间, 大小)，不存在时为None"""
+    try:
+        stat = os.stat(path) if path else None
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size) if stat else None
+
+def make_config(base: type, reloadable: Iterable[str], overrides: dict) -> type:
+    """生成带覆盖项的配置类，类型与默认值不符、超出取值范围或不允许覆盖的项抛出ValueError
+
+    取值范围由配置类的RELOADABLE_RANGES（{配置项: (最小值, 最大值)}）和
+    RELOADABLE_ORDER（[(较小项, 较大项)]）给出，按覆盖后的值检查。
+    """
+    reloadable = set(reloadable)
+    values = {}
+    for key, value in overrides.items():
+        if key not in reloadable:
+            raise ValueError(f"配置项 {key} 不存在或不支持热更新")
+        default = getattr(base, key)
+        if key == 'SPECIAL_NOS':
+            if not isinstance(value, list) or not all(
+                    isinstance(item, list) and len(item) == 2 and isinstance(item[0], int) and
+                    isinstance(item[1], (int, float)) for item in value):
+                raise ValueError("SPECIAL_NOS 必须是 [题号, 倍数] 的列表")
+            if any(multiplier <= 0 for _, multiplier in value):
+                raise ValueError("SPECIAL_NOS 的倍数必须大于0")
+            value = [(round_no, float(multiplier)) for round_no, multiplier in value]
+        elif isinstance(default, float) and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        elif type(value) is not type(default):
+            raise ValueError(f"配置项 {key} 应为 {type(default).__name__}，实际为 {value!r}")
+        values[key] = value
+    config = type(base.__name__, (base,), values)
+    for key, (low, high) in getattr(base, 'RELOADABLE_RANGES', {}).items():
+        value = getattr(config, key)
+        if (low is not None and value < low) or (high is not None and value > high):
+            bounds = f"[{'' if low is None else low}, {'' if high is None else high}]"
+            raise ValueError(f"配置项 {key} 超出取值范围 {bounds}，实际为 {value!r}")
+    for lower, upper in getattr(base, 'RELOADABLE_ORDER', ()):
+        if getattr(config, lower) > getattr(config, upper):
+            raise ValueError(f"配置项 {lower} 不能大于 {upper}")
+    return config
+
+class SnapshotSource:
+    """监视配置文件和词汇表，生成并替换快照"""
+    def __init__(self, base_config: type, reloadable: Iterable[str],
+                 config_path: Optional[str] = None,
+                 vocabulary_path: str = DEFAULT_JSON_PATH):
+        self.base_config = base_config
+        self.reloadable = tuple(reloadable)
+        self.config_path = config_path
+        self.vocabulary_path = vocabulary_path
+        self._config_stamp = _file_stamp(config_path)
+        self._vocabulary_stamp = _file_stamp(vocabulary_path)
+        self._vocabulary_hash = source_hash(vocabulary_path)
+        vocab_index = VocabularyIndex(load_vocabulary(vocabulary_path))
+        self.current = Snapshot(1, self._load_config(), vocab_index, WordSelector(vocab_index))
+
+    def _load_config(self) -> type:
+        overrides = {}
+        if self.config_path and os.path.exists(self.config_path):
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                overrides = json.load(f)
+            if not isinstance(overrides, dict):
+                raise ValueError("配置文件必须是 {配置项: 值} 形式的JSON对象")
+        return make_config(self.base_config, self.reloadable, overrides)
+
+    def _build_vocabulary(self) -> Optional[Tuple[VocabularyIndex, WordSelector]]:
+        """在线程池中执行：重新校验、编译并构建索引，内容没有变化时返回None"""
+        # 按内容判断是否变化（多个工作进程时编译产物可能已被其他进程更新）
+        vocabulary_hash = source_hash(self.vocabulary_path)
+        if vocabulary_hash == self._vocabulary_hash:
+            return None
+        vocab_index = VocabularyIndex(load_vocabulary(self.vocabulary_path))
+        self._vocabulary_hash = vocabulary_hash
+        return vocab_index, WordSelector(vocab_index)
+
+    async def reload(self) -> bool:
+        """检查文件变化，有变化时构建并替换快照，返回是否替换"""
+        config_stamp = _file_stamp(self.config_path)
+        vocabulary_stamp = _file_stamp(self.vocabulary_path)
+        if config_stamp == self._config_stamp and vocabulary_stamp == self._vocabulary_stamp:
+            return False
+        snapshot = self.current
+        config, vocab_index, selector = snapshot.config, snapshot.vocab_index, snapshot.selector
+        try:
+            if config_stamp != self._config_stamp:
+                config = self._load_config()
+            if vocabulary_stamp != self._vocabulary_stamp:
+                built = await asyncio.get_running_loop().run_in_executor(None, self._build_vocabulary)
+                if built is not None:
+                    vocab_index, selector = built
+        except (OSError, ValueError) as e:  # VocabularyError和JSON错误都是ValueError
+            print(f"热更新失败，继续使用第 {snapshot.version} 版配置和词汇表: {e}")
+            return False
+        finally:
+            # 失败时也记录，文件再次修改后才重试
+            self._config_stamp, self._vocabulary_stamp = config_stamp, vocabulary_stamp
+        if (config, vocab_index) == (snapshot.config, snapshot.vocab_index):
+            return False
+        self.current = Snapshot(snapshot.version + 1, config, vocab_index, selector)
+        print(f"已加载第 {self.current.version} 版配置和词汇表（{len(vocab_index)} 个单词），"
+              f"新开始的对局将使用新版本")
+        return True
+
+    async def watch(self, interval: float):
+        """每隔interval秒检查一次"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.reload()
@@ -0,0 +1,157 @@
+"""对局事件录制
+
+每场对局录制为一条记录：开局参数（种子、生效的配置、难度范围、玩家及其等级分、
+本局的单词）加上按时间排列的事件。有了种子和单词，题目和选项可以完全复现；
+事件记录答题到达的时刻，回放时按原来的用时重新计分（见 match_replay.py）。
+
+事件为 [时刻, 类型, 玩家序号, 内容, ...]，时刻是距开局的纳秒数（time.monotonic_ns）：
+    SENT      服务器发出的消息；玩家序号为None表示广播
+    RECEIVED  收到的答案，之后附带当时的往返时延（毫秒）和距本轮new_round发出的纳秒数
+    DEADLINE  本轮截止时间到达，内容为失联被断开的玩家序号列表
+    LEFT      玩家在对局中离开
+    HELD      玩家掉线，保留座位等待重连
+    RESUMED   掉线的玩家重连回到座位
+
+文件格式：文件头（MAGIC + 版本）之后是连续的记录，每条为4字节长度 + zlib压缩的JSON。
+压缩后与紧凑二进制编码大小相近，而解码由C实现，批量回放时快得多。
+写入只放进内存队列，由后台线程追加到文件。
+"""
+from typing import Iterator, List, Optional
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+DEFAULT_LOG_DIR = 'match_logs'
+
+MAGIC = b'WPKL'
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+RECORD_SIZE = struct.Struct('<I')
+
+# 事件类型
+SENT = 0
+RECEIVED = 1
+DEADLINE = 2
+LEFT = 3
+HELD = 4
+RESUMED = 5
+
+class MatchRecorder:
+    """录制一场对局的事件"""
+    def __init__(self, seed: int, room_id: str, players: List[str], ratings: List[float],
+                 words: List[str], config: dict, min_difficulty: int, max_difficulty: int):
+        self.started_ns = time.monotonic_ns()
+        self.players = {name: i for i, name in enumerate(players)}
+        self.events: List[list] = []
+        self.header = {
+            'version': FORMAT_VERSION,
+            'seed': seed,
+            'room_id': room_id,
+            'started_at': time.time(),
+            'players': players,
+            'ratings': ratings,
+            'words': words,
+            'config': config,
+            'min_difficulty': min_difficulty,
+            'max_difficulty': max_difficulty,
+        }
+
+    def _now(self) -> int:
+        return time.monotonic_ns() - self.started_ns
+
+    def sent(self, message: dict, player: Optional[str] = None):
+        self.events.append([self._now(), SENT, self.players.get(player), message])
+
+    def received(self, player: str, message: dict, rtt_ms: Optional[float], arrival_ns: int,
+                 since_round_ns: int):
+        self.events.append([arrival_ns - self.started_ns, RECEIVED, self.players[player], message,
+                            rtt_ms, since_round_ns])
+
+    def deadline(self, stale_players: List[str]):
+        self.events.append([self._now(), DEADLINE, None,
+                            [self.players[name] for name in stale_players]])
+
+    def left(self, player: str):
+        self.events.append([self._now(), LEFT, self.players[player], None])
+
+    def held(self, player: str):
+        self.events.append([self._now(), HELD, self.players[player], None])
+
+    def resumed(self, player: str):
+        self.events.append([self._now(), RESUMED, self.players[player], None])
+
+    def finish(self, completed: bool) -> dict:
+        """结束录制，返回整场对局的记录"""
+        return {**self.header, 'completed': completed, 'events': self.events}
+
+def encode_record(record: dict) -> bytes:
+    data = zlib.compress(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return RECORD_SIZE.pack(len(data)) + data
+
+def read_matches(path: str) -> Iterator[dict]:
+    """依次读出文件中的对局记录（末尾写了一半的记录会被忽略）"""
+    with open(path, 'rb') as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            return
+        magic, version = FILE_HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"无法识别的对局录制文件: {path}")
+        while True:
+            size = f.read(RECORD_SIZE.size)
+            if len(size) < RECORD_SIZE.size:
+                return
+            length, = RECORD_SIZE.unpack(size)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield json.loads(zlib.decompress(data))
+
+class MatchLog:
+    """把对局记录追加到文件的后台写入器"""
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0  # 已写入的对局数
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as f:
+                f.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+        self._queue: queue.Queue = queue.Queue()  # 对局记录或None（停止）
+        self._thread = threading.Thread(target=self._write_loop, name='match-log', daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict):
+        """放入一场对局的记录（立即返回，编码和写盘在后台线程中进行）"""
+        self._queue.put(record)
+
+    def _write_loop(self):
+        with open(self.path, 'ab') as f:
+            while True:
+                record = self._queue.get()
+                try:
+                    if record is None:
+                        return
+                    # 队列暂时取空时才刷新到磁盘
+                    f.write(encode_record(record))
+                    self.written += 1
+                    if self._queue.empty():
+                        f.flush()
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"写入对局录制时发生错误: {e}")
+                finally:
+                    self._queue.task_done()
+
+    def flush(self):
+        """阻塞直到已入队的记录全部写入"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,292 @@
+"""对局回放：把录制的对局重新送入服务器的对局逻辑
+
+每场对局用录制的种子和单词重新生成题目，按录制的到达时刻和往返时延依次送入答案、
+截止时间、掉线重连和离开事件，由服务器的start_game、handle_answer、handle_round_deadline
+重新计分，再与录制的结果比较。用于在大量历史对局上检验计分规则的改动：
+    python match_replay.py match_logs/*.wpkl --config new_scoring.json
+
+默认不等待，尽可能快地回放（多进程并行）；--speed 按录制的时间间隔加速回放，
+例如 --speed 1000 以1000倍速回放。
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+
+from hot_reload import make_config
+from match_log import DEADLINE, HELD, LEFT, RECEIVED, RESUMED, SENT, read_matches
+from vocabulary_index import VocabularyIndex, get_vocabulary_index
+from vocabulary_store import DEFAULT_JSON_PATH
+from wire_protocol import Codec
+from word_pk_server import (Config, Player, WordPKGame, handle_answer, handle_round_deadline,
+                            start_game)
+
+COMPARED_TYPES = ('new_round', 'round_result', 'game_over')
+# 回放按录制的事件推进，两轮之间不等待客户端的显示时间
+NO_DELAYS = {'GAME_START_DELAY': 0, 'RESULT_DISPLAY_DELAY': 0}
+
+class ReplayCodec(Codec):
+    """回放时发给玩家的消息直接丢弃，不需要真正序列化"""
+    name = 'replay'
+
+    def encode(self, message: dict) -> bytes:
+        return b''
+
+class ReplaySocket:
+    """代替玩家连接：ping立即得到回应，关闭时什么也不做"""
+    async def ping(self):
+        pong = asyncio.get_running_loop().create_future()
+        pong.set_result(None)
+        return pong
+
+    async def close(self, code: int = 1000, reason: str = ''):
+        pass
+
+class ReplayOutbox:
+    """丢弃发给玩家的消息（回放结果从录制中读取）"""
+    def offer(self, frame, coalesce_key: Optional[str] = None):
+        pass
+
+    def close(self):
+        pass
+
+class RecordedSelector:
+    """按录制的单词出题，代替自适应选题器"""
+    def __init__(self, indices: List[int]):
+        self.indices = indices
+
+    def choose(self, players, min_difficulty: int, max_difficulty: int, count: int,
+               rng=None) -> List[int]:
+        return self.indices[:count]
+
+class RecordCollector:
+    """代替对局录制文件，保留回放产生的记录"""
+    def __init__(self):
+        self.record: Optional[dict] = None
+
+    def write(self, record: dict):
+        self.record = record
+
+class ReplayError(Exception):
+    """录制的对局无法在当前词汇表上回放"""
+
+def _hold_deadline(game: WordPKGame):
+    # 截止时间由录制的事件触发，服务器登记的定时器不应自行到期
+    if game.round_timer:
+        game.round_timer.cancel()
+
+async def replay_match(record: dict, vocab_index: VocabularyIndex, positions: Dict[str, int],
+                       config: type, speed: float = 0) -> dict:
+    """回放一场对局，返回回放产生的记录；speed大于0时按录制的时间间隔加速等待"""
+    try:
+        indices = [positions[word] for word in record['words']]
+    except KeyError as e:
+        raise ReplayError(f"词汇表中没有单词 {e.args[0]}")
+    collector = RecordCollector()
+    game = WordPKGame(room_id=record['room_id'], vocab_index=vocab_index,
+                      min_difficulty=record['min_difficulty'],
+                      max_difficulty=record['max_difficulty'],
+                      selector=RecordedSelector(indices), config=config, match_log=collector)
+    players = []
+    for name, rating in zip(record['players'], record['ratings']):
+        player = Player(websocket=ReplaySocket(), name=name, codec=ReplayCodec(), ready=True,
+                        rating=rating, last_seen=time.monotonic())
+        player.outbox = ReplayOutbox()
+        game.players[player.websocket] = player
+        players.append(player)
+    game.game_in_progress = True
+    await start_game(game, seed=record['seed'])
+    _hold_deadline(game)
+
+    previous = 0
+    for t, kind, index, payload, *extra in record['events']:
+        if not game.game_in_progress:
+            break
+        if speed > 0:
+            await asyncio.sleep(max(0, t - previous) / 1e9 / speed)
+            previous = t
+        if kind == RECEIVED:
+            rtt_ms, since_round_ns = extra
+            players[index].rtt_ms = rtt_ms
+            await handle_answer(game, players[index], payload, game.round_sent_ns + since_round_ns)
+        elif kind == DEADLINE:
+            # 按录制结果决定哪些玩家被判为失联
+            now = time.monotonic()
+            for i, player in enumerate(players):
+                player.last_seen = 0.0 if i in payload else now
+            await handle_round_deadline(game, game.round)
+        elif kind == LEFT:
+            if players[index].websocket in game.players:
+                await game.handle_player_disconnect(players[index].websocket)
+        elif kind == HELD:
+            await game.hold_seat(players[index].websocket)
+        elif kind == RESUMED:
+            # 重连的玩家换用新连接
+            websocket = players[index].websocket
+            players[index].websocket = ReplaySocket()
+            game.resume_seat(websocket)
+        _hold_deadline(game)
+
+    if collector.record is None:
+        raise ReplayError("回放未能结束对局")
+    return collector.record
+
+def outcome(record: dict) -> List[dict]:
+    """记录中参与比较的广播消息（题目、每轮结果、终局）"""
+    return [event[3] for event in record['events']
+            if event[1] == SENT and event[2] is None and event[3]['type'] in COMPARED_TYPES]
+
+def questions(messages: Iterable[dict]) -> List[Tuple]:
+    return [(m['round'], m['word'], m['options'], m['multiplier'])
+            for m in messages if m['type'] == 'new_round']
+
+def final_scores(record: dict, messages: Iterable[dict]) -> Dict[str, int]:
+    scores = {name: 0 for name in record['players']}
+    for message in messages:
+        if message['type'] == 'round_result' and message.get('winner'):
+            scores[message['winner']] += message['score_added']
+    return scores
+
+def winners(scores: Dict[str, int]) -> List[str]:
+    best = max(scores.values())
+    return sorted(name for name, score in scores.items() if score == best)
+
+def compare(recorded: dict, replayed: dict) -> dict:
+    """比较录制和回放的结果"""
+    before = outcome(recorded)
+    # 回放的消息经过一次JSON编解码，与从文件读出的录制记录同样表示（元组变为列表等）
+    after = json.loads(json.dumps(outcome(replayed)))
+    scores_before = final_scores(recorded, before)
+    scores_after = final_scores(replayed, after)
+    return {
+        'identical': before == after,
+        'same_questions': questions(before) == questions(after),
+        'scores_before': scores_before,
+        'scores_after': scores_after,
+        'winner_changed': recorded['completed'] and winners(scores_before) != winners(scores_after),
+    }
+
+# ---- 多进程批量回放 ----
+
+_vocab_index: Optional[VocabularyIndex] = None
+_positions: Dict[str, int] = {}
+_overrides: dict = {}
+_configs: Dict[str, type] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _init_worker(vocabulary_path: str, overrides: dict):
+    global _vocab_index, _positions, _overrides, _loop
+    _vocab_index = get_vocabulary_index(vocabulary_path)
+    _positions = {w.word: i for i, w in enumerate(_vocab_index.words)}
+    _overrides = overrides
+    _configs.clear()
+    # 每个进程一个事件循环，所有对局在其中依次回放
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+
+def _config_for(record: dict) -> type:
+    """录制时生效的配置，再叠加命令行给出的覆盖项（按内容缓存）"""
+    # 早于座位保留的录制没有RESUME_GRACE，当时玩家掉线即结束对局
+    recorded = {'RESUME_GRACE': 0, **record['config']}
+    key = json.dumps(recorded, sort_keys=True)
+    config = _configs.get(key)
+    if config is None:
+        config = make_config(make_config(Config, Config.RELOADABLE, recorded),
+                             Config.RELOADABLE, {**_overrides, **NO_DELAYS})
+        _configs[key] = config
+    return config
+
+def _replay(record: dict, speed: float = 0) -> dict:
+    # 只把比较结果和对局概要传回主进程
+    match = {'room_id': record['room_id'], 'started_at': record['started_at'],
+             'rounds': len(record['words'])}
+    try:
+        replayed = _loop.run_until_complete(
+            replay_match(record, _vocab_index, _positions, _config_for(record), speed))
+    except ReplayError as e:
+        return {'error': str(e), 'match': match}
+    return {**compare(record, replayed), 'match': match}
+
+def iter_records(paths: Iterable[str]) -> Iterable[dict]:
+    for path in paths:
+        yield from read_matches(path)
+
+def main(paths: List[str], vocabulary_path: str, overrides: dict, processes: int,
+         speed: float, show: int):
+    started = time.perf_counter()
+    summary = {'matches': 0, 'rounds': 0, 'identical': 0, 'changed': 0, 'winner_changed': 0,
+               'questions_differ': 0, 'errors': 0}
+    shown = 0
+
+    if processes > 1 and speed <= 0:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                    initargs=(vocabulary_path, overrides))
+        results = pool.imap(_replay, iter_records(paths), chunksize=64)
+    else:
+        pool = None
+        _init_worker(vocabulary_path, overrides)
+        results = (_replay(record, speed) for record in iter_records(paths))
+
+    try:
+        for result in results:
+            match = result['match']
+            summary['matches'] += 1
+            summary['rounds'] += match['rounds']
+            if 'error' in result:
+                summary['errors'] += 1
+                print(f"无法回放房间 {match['room_id']} 的对局: {result['error']}")
+                continue
+            if result['identical']:
+                summary['identical'] += 1
+                continue
+            if not result['same_questions']:
+                summary['questions_differ'] += 1
+                continue
+            summary['changed'] += 1
+            summary['winner_changed'] += result['winner_changed']
+            if shown < show:
+                shown += 1
+                started_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(match['started_at']))
+                print(f"[{started_at}] 房间 {match['room_id']}: "
+                      f"{result['scores_before']} -> {result['scores_after']}"
+                      f"{'（胜负改变）' if result['winner_changed'] else ''}")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - started
+    print(f"回放 {summary['matches']} 场对局（{summary['rounds']} 回合），用时 {elapsed:.2f} 秒"
+          f"（{summary['matches'] / elapsed if elapsed else 0:.0f} 场/秒）")
+    print(f"  结果一致 {summary['identical']} 场")
+    print(f"  得分改变 {summary['changed']} 场，其中胜负改变 {summary['winner_changed']} 场")
+    if summary['questions_differ']:
+        print(f"  题目与录制不一致 {summary['questions_differ']} 场（词汇表内容已改变）")
+    if summary['errors']:
+        print(f"  无法回放 {summary['errors']} 场")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回放录制的对局，检验计分规则的改动")
+    parser.add_argument('logs', nargs='+', help="对局录制文件（.wpkl）")
+    parser.add_argument('--config',
+                        help="在录制时的配置上叠加的覆盖项（JSON，格式同服务器配置文件）")
+    parser.add_argument('--vocabulary', default=DEFAULT_JSON_PATH, help="词汇表路径")
+    parser.add_argument('--speed', type=float, default=0,
+                        help="按录制的时间间隔以该倍速回放（如1000），0表示不等待")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="并行进程数（--speed大于0时只用一个进程）")
+    parser.add_argument('--show', type=int, default=10, help="最多列出多少场得分改变的对局")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        try:
+            make_config(Config, Config.RELOADABLE, overrides)  # 先校验覆盖项
+        except ValueError as e:
+            parser.error(str(e))
+    main(args.logs, args.vocabulary, overrides, args.workers, args.speed, args.show)
@@ -0,0 +1,243 @@
+"""玩家资料与对局记录的持久化（SQLite，WAL模式）
+
+表结构：
+    players        每名玩家的累计对局数、胜场、总得分和等级分
+    matches        每场对局的房间、起止时间、是否完整结束
+    match_players  每场对局中各玩家的最终得分和是否获胜
+    round_answers  每轮每名玩家的答题记录（单词、所选选项、是否正确、用时）
+
+写入只放进内存队列，由后台线程按批提交（一批一个事务），游戏循环不会等待磁盘。
+读取（排行榜等）每次使用独立连接，WAL模式下不会被写入阻塞。
+多个工作进程可以共用同一个数据库文件。
+"""
+from typing import Dict, List, Optional, Tuple
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_DB_PATH = 'word_pk.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    matches INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    total_score INTEGER NOT NULL DEFAULT 0,
+    rating REAL NOT NULL DEFAULT 1500,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    is_tie INTEGER NOT NULL DEFAULT 0,
+    min_difficulty INTEGER,
+    max_difficulty INTEGER
+);
+CREATE TABLE IF NOT EXISTS match_players (
+    match_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    winner INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (match_id, name)
+);
+CREATE TABLE IF NOT EXISTS round_answers (
+    match_id TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    word TEXT NOT NULL,
+    answer TEXT,
+    correct INTEGER NOT NULL,
+    time_ms INTEGER,
+    score_added INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS round_answers_match ON round_answers (match_id, round);
+CREATE INDEX IF NOT EXISTS round_answers_player ON round_answers (player);
+"""
+
+class MatchStore:
+    """带写回队列的对局记录库"""
+    def __init__(self, path: str = DEFAULT_DB_PATH, batch_size: int = 512,
+                 flush_interval: float = 0.2):
+        self.path = path
+        self.batch_size = batch_size  # 每个事务最多包含的写操作数
+        self.flush_interval = flush_interval  # 攒批的最长等待时间（秒）
+        self._queue: queue.Queue = queue.Queue()  # (sql, 参数) 或 None（停止）
+        self.written = 0  # 已提交的写操作数
+        self.batches = 0  # 已提交的事务数
+
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            # 旧版本创建的数据库没有等级分列
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(players)')]
+            if 'rating' not in columns:
+                conn.execute('ALTER TABLE players ADD COLUMN rating REAL NOT NULL DEFAULT 1500')
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._write_loop, name='match-store', daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL')  # WAL模式下仍能保证数据库不损坏
+        return conn
+
+    # ---- 写入（只入队，立即返回） ----
+
+    def _put(self, sql: str, params: tuple):
+        self._queue.put((sql, params))
+
+    def begin_match(self, room_id: str, players: List[str],
+                    min_difficulty: Optional[int] = None,
+                    max_difficulty: Optional[int] = None) -> str:
+        """登记一场新对局，返回对局ID"""
+        match_id = uuid.uuid4().hex
+        now = time.time()
+        self._put('INSERT INTO matches (match_id, room_id, started_at, min_difficulty, max_difficulty) '
+                  'VALUES (?, ?, ?, ?, ?)',
+                  (match_id, room_id, now, min_difficulty, max_difficulty))
+        for name in players:
+            self._put('INSERT INTO players (name, first_seen, last_seen) VALUES (?, ?, ?) '
+                      'ON CONFLICT(name) DO UPDATE SET last_seen = excluded.last_seen',
+                      (name, now, now))
+            self._put('INSERT OR IGNORE INTO match_players (match_id, name) VALUES (?, ?)',
+                      (match_id, name))
+        return match_id
+
+    def record_round(self, match_id: str, round_no: int, word: str,
+                     answers: List[Tuple[str, Optional[str], bool, Optional[int], int]]):
+        """记录一轮的答题情况，answers为[(玩家, 所选选项, 是否正确, 用时毫秒, 本轮得分), ...]，
+        未作答的玩家所选选项和用时为None"""
+        for name, answer, correct, time_ms, score_added in answers:
+            self._put('INSERT INTO round_answers '
+                      '(match_id, round, player, word, answer, correct, time_ms, score_added) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                      (match_id, round_no, name, word, answer, int(correct), time_ms, score_added))
+
+    def end_match(self, match_id: str, scores: Dict[str, int], winners: List[str],
+                  rounds: int, completed: bool = True,
+                  ratings: Optional[Dict[str, float]] = None):
+        """记录对局结束；只有完整结束的对局计入玩家的对局数和胜场，ratings为赛后等级分"""
+        now = time.time()
+        is_tie = completed and len(winners) > 1
+        self._put('UPDATE matches SET ended_at = ?, rounds = ?, completed = ?, is_tie = ? '
+                  'WHERE match_id = ?',
+                  (now, rounds, int(completed), int(is_tie), match_id))
+        for name, score in scores.items():
+            won = completed and not is_tie and name in winners
+            self._put('UPDATE match_players SET score = ?, winner = ? WHERE match_id = ? AND name = ?',
+                      (score, int(won), match_id, name))
+            if completed:
+                self._put('UPDATE players SET matches = matches + 1, wins = wins + ?, '
+                          'total_score = total_score + ?, last_seen = ? WHERE name = ?',
+                          (int(won), score, now, name))
+            if ratings and name in ratings:
+                self._put('UPDATE players SET rating = ? WHERE name = ?', (ratings[name], name))
+
+    def _write_loop(self):
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            # 攒批：最多等待flush_interval秒或凑满batch_size条
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            operations = [op for op in batch if op is not None]
+            running = len(operations) == len(batch)
+            try:
+                with conn:
+                    for sql, params in operations:
+                        conn.execute(sql, params)
+                self.written += len(operations)
+                self.batches += 1
+            except sqlite3.Error as e:
+                print(f"写入对局记录时发生错误: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def flush(self):
+        """阻塞直到已入队的写操作全部提交（供关闭前和离线工具使用）"""
+        self._queue.join()
+
+    def close(self):
+        """提交剩余的写操作并停止后台线程"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    # ---- 读取（阻塞，服务器中应放到线程里执行） ----
+
+    def get_rating(self, name: str) -> Optional[float]:
+        """玩家当前的等级分，新玩家返回None"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT rating FROM players WHERE name = ?', (name,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def word_history(self, name: str) -> List[Tuple[str, int, int, int]]:
+        """玩家每个单词的(单词, 答题次数, 答对次数, 答对用时总和)，按最近一次作答的先后排列，
+        用于自适应出题"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                'SELECT word, COUNT(*), SUM(correct), SUM(CASE WHEN correct THEN time_ms ELSE 0 END) '
+                'FROM round_answers WHERE player = ? GROUP BY word ORDER BY MAX(rowid)',
+                (name,)).fetchall()
+        finally:
+            conn.close()
+
+    def leaderboard(self, limit: int = 10) -> List[dict]:
+        """按胜场、总得分排序的排行榜"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT name, matches, wins, total_score, rating FROM players '
+                'ORDER BY wins DESC, total_score DESC, name LIMIT ?', (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [{'name': name, 'matches': matches, 'wins': wins, 'total_score': total_score,
+                 'rating': round(rating)}
+                for name, matches, wins, total_score, rating in rows]
+
+    def player_stats(self, name: str) -> Optional[dict]:
+        """单个玩家的累计数据和答题正确率、平均用时"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT matches, wins, total_score, rating FROM players WHERE name = ?',
+                               (name,)).fetchone()
+            if row is None:
+                return None
+            answered, correct, avg_time = conn.execute(
+                'SELECT COUNT(*), SUM(correct), AVG(CASE WHEN correct THEN time_ms END) '
+                'FROM round_answers WHERE player = ?', (name,)).fetchone()
+        finally:
+            conn.close()
+        return {
+            'name': name,
+            'matches': row[0],
+            'wins': row[1],
+            'total_score': row[2],
+            'rating': row[3],
+            'accuracy': (correct or 0) / answered if answered else None,
+            'average_correct_time': avg_time
+        }
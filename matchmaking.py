@@ -0,0 +1,195 @@
+"""等级分与按水平配对
+
+等级分采用Elo：每场对局结束后按双方赛前等级分的期望胜率更新。
+
+配对队列按等级分分桶（每桶RATING_BUCKET分），桶内按入队顺序排列，
+非空桶的编号保存在有序列表中：入队、出队只需一次二分查找，
+查找对手时从最近的桶向两侧扩展，不需要遍历整个队列。
+每个排队者可接受的等级分差随等待时间线性放宽，直到上限。
+"""
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Hashable, Iterator, List, Optional
+import bisect
+import time
+
+class Config:
+    INITIAL_RATING = 1500.0  # 新玩家的等级分
+    K_FACTOR = 32  # 每场对局等级分的最大变化
+    RATING_BUCKET = 50  # 配对队列的分桶宽度
+    WINDOW_BASE = 100  # 刚入队时可接受的等级分差
+    WINDOW_GROWTH = 50  # 每等待一秒放宽的等级分差
+    WINDOW_MAX = 800  # 可接受等级分差的上限
+    WAIT_SAMPLES = 1024  # 计算排队时间分位数时保留的最近样本数
+
+def expected_score(rating: float, opponent: float) -> float:
+    """rating对opponent的期望得分（胜1、平0.5、负0）"""
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+def update_ratings(ratings: Dict[str, float], winners: List[str],
+                   k_factor: float = Config.K_FACTOR) -> Dict[str, float]:
+    """根据对局结果返回新的等级分；多名赢家表示平局
+
+    多于两名玩家时按两两对局累加，每对的变化除以对手数。
+    """
+    names = list(ratings)
+    if len(names) < 2:
+        return dict(ratings)
+    new_ratings = dict(ratings)
+    for name in names:
+        for opponent in names:
+            if opponent == name:
+                continue
+            if name in winners and opponent in winners:
+                actual = 0.5
+            elif name in winners:
+                actual = 1.0
+            elif opponent in winners:
+                actual = 0.0
+            else:
+                actual = 0.5
+            change = k_factor * (actual - expected_score(ratings[name], ratings[opponent]))
+            new_ratings[name] += change / (len(names) - 1)
+    return new_ratings
+
+@dataclass
+class MatchTicket:
+    """配对队列中的一个排队者"""
+    key: Hashable  # 排队者标识（如房间号）
+    rating: float
+    enqueued_at: float  # 入队时刻（time.monotonic）
+    payload: object = None
+
+    def window(self, now: float) -> float:
+        """当前可接受的等级分差"""
+        waited = now - self.enqueued_at
+        return min(Config.WINDOW_BASE + Config.WINDOW_GROWTH * waited, Config.WINDOW_MAX)
+
+class MatchmakingQueue:
+    """按等级分分桶的配对队列"""
+    def __init__(self, bucket_width: int = Config.RATING_BUCKET):
+        self.bucket_width = bucket_width
+        self._buckets: Dict[int, OrderedDict] = {}  # 桶编号 -> {key: ticket}（按入队顺序）
+        self._bucket_ids: List[int] = []  # 非空桶编号（有序）
+        self._tickets: Dict[Hashable, MatchTicket] = {}
+        self.matched = 0  # 已配对的排队者数
+        self._waits: Deque[float] = deque(maxlen=Config.WAIT_SAMPLES)  # 最近的排队时间（秒）
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tickets
+
+    def _bucket_id(self, rating: float) -> int:
+        return int(rating // self.bucket_width)
+
+    def add(self, key: Hashable, rating: float, payload=None,
+            now: Optional[float] = None) -> MatchTicket:
+        """入队（已在队列中则保留原入队时刻，只更新等级分）"""
+        old = self._tickets.get(key)
+        if old:
+            self._discard(old)
+            enqueued_at = old.enqueued_at
+        else:
+            enqueued_at = time.monotonic() if now is None else now
+        ticket = MatchTicket(key, rating, enqueued_at, payload)
+        self._tickets[key] = ticket
+        bucket_id = self._bucket_id(rating)
+        bucket = self._buckets.get(bucket_id)
+        if bucket is None:
+            bucket = self._buckets[bucket_id] = OrderedDict()
+            bisect.insort(self._bucket_ids, bucket_id)
+        bucket[key] = ticket
+        return ticket
+
+    def _discard(self, ticket: MatchTicket):
+        del self._tickets[ticket.key]
+        bucket_id = self._bucket_id(ticket.rating)
+        bucket = self._buckets[bucket_id]
+        del bucket[ticket.key]
+        if not bucket:
+            del self._buckets[bucket_id]
+            del self._bucket_ids[bisect.bisect_left(self._bucket_ids, bucket_id)]
+
+    def remove(self, key: Hashable, matched: bool = False,
+               now: Optional[float] = None) -> Optional[MatchTicket]:
+        """出队；matched为True时记录排队时间"""
+        ticket = self._tickets.get(key)
+        if ticket is None:
+            return None
+        self._discard(ticket)
+        if matched:
+            self.matched += 1
+            self._waits.append((time.monotonic() if now is None else now) - ticket.enqueued_at)
+        return ticket
+
+    def _nearby(self, rating: float, max_diff: float) -> Iterator[MatchTicket]:
+        """按桶距离由近到远列出等级分差可能在max_diff以内的排队者"""
+        center = self._bucket_id(rating)
+        lowest = self._bucket_id(rating - max_diff)
+        highest = self._bucket_id(rating + max_diff)
+        right = bisect.bisect_left(self._bucket_ids, center)
+        left = right - 1
+        while True:
+            # 选择离中心更近的一侧
+            right_id = self._bucket_ids[right] if right < len(self._bucket_ids) else None
+            left_id = self._bucket_ids[left] if left >= 0 else None
+            if right_id is not None and right_id > highest:
+                right_id = None
+            if left_id is not None and left_id < lowest:
+                left_id = None
+            if right_id is None and left_id is None:
+                return
+            if left_id is None or (right_id is not None and right_id - center <= center - left_id):
+                bucket_id, right = right_id, right + 1
+            else:
+                bucket_id, left = left_id, left - 1
+            yield from self._buckets[bucket_id].values()
+
+    def find(self, rating: float, now: Optional[float] = None,
+             accept: Optional[Callable[[MatchTicket], bool]] = None,
+             window: float = 0.0) -> Optional[MatchTicket]:
+        """为等级分为rating的新来者找一个对手（不出队）
+
+        任一方的可接受范围覆盖等级分差即可配对，因此等待越久的排队者越容易被匹配；
+        window为新来者自己的可接受范围。
+        """
+        now = time.monotonic() if now is None else now
+        for ticket in self._nearby(rating, max(window, Config.WINDOW_MAX)):
+            if (abs(ticket.rating - rating) <= max(window, ticket.window(now)) and
+                    (accept is None or accept(ticket))):
+                return ticket
+        return None
+
+    def pairs(self, now: Optional[float] = None,
+              accept: Optional[Callable[[MatchTicket, MatchTicket], bool]] = None
+              ) -> List[tuple]:
+        """找出队列内部已可以配对的排队者（等待最久的优先），配对的双方出队"""
+        now = time.monotonic() if now is None else now
+        result = []
+        for ticket in list(self._tickets.values()):  # 字典保持入队顺序
+            if ticket.key not in self._tickets:
+                continue  # 本轮已被配对
+            opponent = self.find(
+                ticket.rating, now, window=ticket.window(now),
+                accept=lambda t: t.key != ticket.key and (accept is None or accept(ticket, t)))
+            if opponent is not None:
+                self.remove(ticket.key, matched=True, now=now)
+                self.remove(opponent.key, matched=True, now=now)
+                result.append((ticket, opponent))
+        return result
+
+    def metrics(self, now: Optional[float] = None) -> dict:
+        """排队人数、已配对人数和排队时间分布（秒）"""
+        now = time.monotonic() if now is None else now
+        waits = sorted(self._waits)
+        def percentile(p: float) -> float:
+            return waits[min(len(waits) - 1, int(len(waits) * p / 100))] if waits else 0.0
+        return {
+            'queued': len(self._tickets),
+            'matched': self.matched,
+            'longest_wait': max((now - t.enqueued_at for t in self._tickets.values()), default=0.0),
+            'wait_p50': percentile(50),
+            'wait_p99': percentile(99),
+        }
@@ -0,0 +1,176 @@
+"""Prometheus文本格式的运行指标
+
+指标只在事件循环线程中记录，计数就是普通的整数加法，不需要加锁；
+直方图按固定的桶边界二分查找后累加。需要在采集时才计算的值（房间数、排队人数等）
+用回调函数注册为仪表，平时没有任何开销。
+
+serve_metrics在本地端口上提供 GET /metrics，供Prometheus抓取或直接用curl查看。
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+import asyncio
+import bisect
+import time
+
+# 默认的耗时直方图桶边界（秒），覆盖从0.1毫秒到1秒
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0)
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class Counter:
+    """只增不减的计数，或采集时调用函数读取已有的计数"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        value = self.function() if self.function else self.value
+        return [f"{self.name} {_format_value(value)}"]
+
+class Gauge:
+    """可增可减的当前值，或采集时调用函数得到的值"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.function = function
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def samples(self) -> List[str]:
+        value = self.function() if self.function else self.value
+        return [f"{self.name} {_format_value(value)}"]
+
+class Histogram:
+    """按固定桶边界统计分布"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> 'Timer':
+        """用于with语句，记录代码块的耗时（秒）"""
+        return Timer(self)
+
+    def samples(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {repr(self.sum)}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+class Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Registry:
+    """一组指标，按注册顺序输出"""
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric  # 同名指标后注册的替换先注册的
+        return metric
+
+    def counter(self, name: str, help: str,
+                function: Optional[Callable[[], float]] = None) -> Counter:
+        return self._register(Counter(name, help, function))
+
+    def gauge(self, name: str, help: str,
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, help, function))
+
+    def histogram(self, name: str, help: str,
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        """Prometheus文本格式（0.0.4）"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:  # 回调出错时跳过该指标，不影响其他指标
+                print(f"采集指标 {metric.name} 时发生错误: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+async def monitor_loop_lag(histogram: Histogram, gauge: Gauge, interval: float = 0.5):
+    """定期sleep并测量实际唤醒比预期晚了多少，即事件循环被阻塞的时间"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        histogram.observe(lag)
+        gauge.set(lag)
+
+async def serve_metrics(registry: Registry, host: str, port: int) -> asyncio.AbstractServer:
+    """启动只提供 GET /metrics 的HTTP服务"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # 忽略请求头
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b'GET' and parts[1].split(b'?')[0] == b'/metrics':
+                status, body = '200 OK', registry.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(f"HTTP/1.1 {status}\r\n"
+                         f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode('ascii') + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,190 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import asyncio
+
+SLOW_CLOSE_CODE = 4002  # 接收过慢被服务器断开时的关闭码
+
+async def close_slow_connection(websocket):
+    try:
+        await websocket.close(code=SLOW_CLOSE_CODE, reason='接收过慢')
+    except Exception:
+        pass
+
+class SubscriberQueue:
+    """单个订阅者（观众）的有界发送队列
+
+    广播时只把帧放进队列（不等待网络），由独立的写任务负责发送。
+    队列满时丢弃最旧的帧，慢消费者只会跳过部分事件，不会拖慢对局；
+    累计丢弃过多则断开该连接。
+    """
+    def __init__(self, websocket, max_queue: int = 32, max_dropped: int = 256, codec=None):
+        self.websocket = websocket
+        self.codec = codec  # 连接协商出的消息编码
+        self.max_queue = max_queue
+        self.max_dropped = max_dropped
+        self.dropped = 0  # 累计丢弃的帧数
+        self.closed = False
+        self._frames: Deque = deque()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = asyncio.create_task(self._write_loop())
+
+    def offer(self, frame) -> bool:
+        """放入一帧（不阻塞），返回是否发生了丢弃"""
+        if self.closed:
+            return False
+        dropped = False
+        if len(self._frames) >= self.max_queue:
+            self._frames.popleft()
+            self.dropped += 1
+            dropped = True
+            if self.dropped >= self.max_dropped:
+                self.close(disconnect=True)
+                return True
+        self._frames.append(frame)
+        self._wakeup.set()
+        return dropped
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self._frames and not self.closed:
+                    await self.websocket.send(self._frames.popleft())
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # 发送失败说明连接已断开，停止写任务即可，连接的清理由处理函数负责
+            self.closed = True
+
+    def close(self, disconnect: bool = False):
+        """停止写任务；disconnect为True时同时断开连接"""
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.clear()
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+        if disconnect:
+            asyncio.create_task(close_slow_connection(self.websocket))
+
+class ConnectionQueue:
+    """单个玩家连接的发送队列
+
+    与观众不同，玩家的消息不能丢弃：所有发给玩家的消息都放进队列后立即返回，
+    由独立的写任务按顺序发送，房间的广播和轮次推进不再等待任何一个玩家的网络。
+    带合并键的消息（如 players_update 这类完整状态）入队时，队列中尚未发出的同键旧消息
+    作废，只发送最新的一条。
+
+    积压超过高水位时开始计时，在stall_timeout秒内降回低水位以下则恢复正常；
+    一直降不下来，或积压超过硬上限，说明对端接收过慢，断开该连接。
+    积压量按帧长度（字符数或字节数）估计。
+    """
+    coalesced_total = 0  # 所有连接累计被合并掉的消息数
+    slow_disconnects_total = 0  # 所有连接累计因接收过慢被断开的次数
+
+    def __init__(self, websocket, high_watermark: int = 64 * 1024, low_watermark: int = 16 * 1024,
+                 max_buffer: int = 1024 * 1024, stall_timeout: float = 10.0):
+        self.websocket = websocket
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.max_buffer = max_buffer
+        self.stall_timeout = stall_timeout
+        self.buffered = 0  # 队列中尚未发出的帧长度之和
+        self.closed = False
+        self._entries: Deque[List] = deque()  # [合并键, 帧]，帧为None表示已被合并作废
+        self._latest: Dict[str, List] = {}  # 合并键 -> 队列中该键最新的条目
+        self._close_request: Optional[Tuple[int, str]] = None
+        self._stall_timer: Optional[asyncio.TimerHandle] = None
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = asyncio.create_task(self._write_loop())
+
+    @property
+    def congested(self) -> bool:
+        return self._stall_timer is not None
+
+    def offer(self, frame, coalesce_key: Optional[str] = None):
+        """放入一帧（不阻塞）"""
+        if self.closed or self._close_request:
+            return
+        if coalesce_key is not None:
+            previous = self._latest.get(coalesce_key)
+            if previous is not None and previous[1] is not None:
+                self.buffered -= len(previous[1])
+                previous[1] = None
+                ConnectionQueue.coalesced_total += 1
+        entry = [coalesce_key, frame]
+        self._entries.append(entry)
+        if coalesce_key is not None:
+            self._latest[coalesce_key] = entry
+        self.buffered += len(frame)
+        self._wakeup.set()
+
+        if self.buffered > self.max_buffer:
+            self._disconnect()
+        elif self.buffered > self.high_watermark and self._stall_timer is None:
+            self._stall_timer = asyncio.get_running_loop().call_later(
+                self.stall_timeout, self._disconnect)
+
+    def close_connection(self, code: int = 1000, reason: str = ''):
+        """发完已入队的帧后关闭连接（不阻塞）"""
+        if not self.closed and not self._close_request:
+            self._close_request = (code, reason)
+            self._wakeup.set()
+
+    def _next_frame(self):
+        while self._entries:
+            entry = self._entries.popleft()
+            key, frame = entry
+            if frame is None:
+                continue
+            if key is not None and self._latest.get(key) is entry:
+                del self._latest[key]
+            self.buffered -= len(frame)
+            if self._stall_timer is not None and self.buffered <= self.low_watermark:
+                self._stall_timer.cancel()
+                self._stall_timer = None
+            return frame
+        return None
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                frame = self._next_frame()
+                while frame is not None and not self.closed:
+                    await self.websocket.send(frame)
+                    frame = self._next_frame()
+                if self._close_request and not self.closed:
+                    code, reason = self._close_request
+                    self.close()
+                    await self.websocket.close(code=code, reason=reason)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # 发送失败说明连接已断开，停止写任务即可，连接的清理由处理函数负责
+            self.closed = True
+
+    def _disconnect(self):
+        if self.closed:
+            return
+        ConnectionQueue.slow_disconnects_total += 1
+        self.close()
+        asyncio.create_task(close_slow_connection(self.websocket))
+
+    def close(self):
+        """停止写任务并丢弃未发出的帧（不关闭连接）"""
+        if self.closed:
+            return
+        self.closed = True
+        self._entries.clear()
+        self._latest.clear()
+        self.buffered = 0
+        if self._stall_timer is not None:
+            self._stall_timer.cancel()
+            self._stall_timer = None
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
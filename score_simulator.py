@@ -0,0 +1,141 @@
+"""离线计分模拟：在合成的对局上比较不同的计分参数
+
+两名虚拟玩家按各自的正确率和用时分布答题（用时为对数正态分布），一次生成一批对局的
+全部答题，再用scoring.score_rounds向量化结算。每组参数都在同一批随机答题上计算，
+参数之间的差异不受抽样波动影响。用于调整计分参数前评估强弱玩家的胜率、分差，
+以及特殊题目对胜负的影响：
+    python score_simulator.py new_scoring.json --matches 1000000
+
+参数文件的格式同服务器配置文件（server_config.json），叠加在默认配置上。需要NumPy。
+"""
+from dataclasses import dataclass
+from typing import List, Tuple
+import argparse
+import json
+import math
+import time
+
+from hot_reload import make_config
+import scoring
+from scoring import np
+from word_pk_server import Config
+
+@dataclass(frozen=True)
+class PlayerModel:
+    """虚拟玩家：正确率，以及用时的中位数（毫秒）和对数标准差"""
+    accuracy: float
+    median_time: float
+    spread: float = 0.5
+
+def parse_player(text: str) -> PlayerModel:
+    """解析命令行给出的“正确率,用时中位数[,对数标准差]”"""
+    try:
+        model = PlayerModel(*(float(part) for part in text.split(',')))
+    except (TypeError, ValueError):
+        raise argparse.ArgumentTypeError(f"应为 正确率,用时中位数[,对数标准差]，实际为 {text!r}")
+    if not 0 <= model.accuracy <= 1 or model.median_time <= 0 or model.spread < 0:
+        raise argparse.ArgumentTypeError(f"玩家参数超出范围: {text!r}")
+    return model
+
+@dataclass
+class Summary:
+    """一组参数的累计结果（玩家0为较强的一方）"""
+    matches: int = 0
+    strong_score: int = 0
+    weak_score: int = 0
+    strong_wins: int = 0
+    ties: int = 0
+    margin: int = 0
+    last_round_flips: int = 0  # 最后一轮改变了胜负（含变为平局或打破平局）的对局数
+
+    def add(self, totals, before_last):
+        diff = totals[:, 0] - totals[:, 1]
+        self.matches += len(totals)
+        self.strong_score += int(totals[:, 0].sum())
+        self.weak_score += int(totals[:, 1].sum())
+        self.strong_wins += int((diff > 0).sum())
+        self.ties += int((diff == 0).sum())
+        self.margin += int(np.abs(diff).sum())
+        self.last_round_flips += int(
+            (np.sign(diff) != np.sign(before_last[:, 0] - before_last[:, 1])).sum())
+
+def draw_answers(rng, players: Tuple[PlayerModel, PlayerModel], matches: int, rounds: int):
+    """生成一批对局的答题，返回(是否答对, 用时毫秒)，形状为(对局数, 回合数, 玩家数)；
+    用时未按超时截断，由各组参数自行处理"""
+    accuracy = np.array([p.accuracy for p in players])
+    log_median = np.array([math.log(p.median_time) for p in players])
+    spread = np.array([p.spread for p in players])
+    shape = (matches, rounds, len(players))
+    hits = rng.random(shape) < accuracy
+    # 服务器记录的用时是整数毫秒
+    times = np.floor(np.exp(log_median + spread * rng.standard_normal(shape)))
+    return hits, times
+
+def play(config: type, hits, times):
+    """按一组参数结算一批对局，返回每局双方的总分和最后一轮之前的得分"""
+    matches, rounds = len(hits), config.TOTAL_ROUNDS
+    # 截止时间（含宽限）之后才到的答案按未作答处理，用时不超过ANSWER_TIMEOUT
+    correct = hits[:, :rounds] & (times[:, :rounds] < config.ANSWER_TIMEOUT + config.ROUND_GRACE)
+    answer_time = np.minimum(times[:, :rounds], config.ANSWER_TIMEOUT)
+    round_no = np.tile(np.arange(1, rounds + 1), matches)
+    winner, score = scoring.score_rounds(config, round_no, correct.reshape(-1, 2),
+                                         answer_time.reshape(-1, 2))
+    points = np.zeros((matches * rounds, 2), dtype=np.int64)
+    scored = np.flatnonzero(winner >= 0)
+    points[scored, winner[scored]] = score[scored]
+    points = points.reshape(matches, rounds, 2)
+    totals = points.sum(axis=1)
+    return totals, totals - points[:, -1]
+
+def simulate(configs: List[Tuple[str, type]], players: Tuple[PlayerModel, PlayerModel],
+             matches: int, seed: int, chunk_size: int) -> List[Summary]:
+    rounds = max(config.TOTAL_ROUNDS for _, config in configs)
+    rng = np.random.default_rng(seed)
+    summaries = [Summary() for _ in configs]
+    done = 0
+    while done < matches:
+        count = min(chunk_size, matches - done)
+        hits, times = draw_answers(rng, players, count, rounds)
+        for summary, (_, config) in zip(summaries, configs):
+            summary.add(*play(config, hits, times))
+        done += count
+    return summaries
+
+def report(configs: List[Tuple[str, type]], summaries: List[Summary]):
+    for (name, config), s in zip(configs, summaries):
+        print(f"{name}（{config.TOTAL_ROUNDS} 回合）")
+        print(f"  平均得分  强方 {s.strong_score / s.matches:.1f}  弱方 {s.weak_score / s.matches:.1f}"
+              f"  平均分差 {s.margin / s.matches:.1f}")
+        print(f"  强方胜率 {s.strong_wins / s.matches:.2%}  平局 {s.ties / s.matches:.2%}"
+              f"  最后一轮改变胜负 {s.last_round_flips / s.matches:.2%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在合成对局上模拟并比较计分参数")
+    parser.add_argument('configs', nargs='*',
+                        help="参数文件（JSON，格式同服务器配置文件），与默认配置一起比较")
+    parser.add_argument('--matches', type=int, default=1_000_000, help="模拟的对局数")
+    parser.add_argument('--strong', type=parse_player, default=PlayerModel(0.85, 2500),
+                        help="较强玩家：正确率,用时中位数（毫秒）[,对数标准差]，默认0.85,2500")
+    parser.add_argument('--weak', type=parse_player, default=PlayerModel(0.75, 3500),
+                        help="较弱玩家，格式同上，默认0.75,3500")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--chunk', type=int, default=100_000, help="每批生成的对局数")
+    args = parser.parse_args()
+
+    if np is None:
+        parser.error("离线模拟需要安装NumPy")
+    configs = [('默认配置', Config)]
+    for path in args.configs:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        try:
+            configs.append((path, make_config(Config, Config.RELOADABLE, overrides)))
+        except ValueError as e:
+            parser.error(f"{path}: {e}")
+
+    started = time.perf_counter()
+    summaries = simulate(configs, (args.strong, args.weak), args.matches, args.seed, args.chunk)
+    elapsed = time.perf_counter() - started
+    print(f"模拟 {args.matches} 场对局 × {len(configs)} 组参数，用时 {elapsed:.2f} 秒"
+          f"（{args.matches * len(configs) / elapsed:.0f} 场/秒）")
+    report(configs, summaries)
@@ -0,0 +1,112 @@
+"""计分规则
+
+服务器和离线工具共用的纯函数，不依赖对局状态。配置参数从传入的配置类中读取
+（服务器的Config或热更新生成的子类），用到的项：
+    QUICK_ANSWER_TIME / QUICK_ANSWER_SCORE  快速答对的时间阈值和得分
+    SLOW_ANSWER_TIME / SLOW_ANSWER_SCORE    慢速答对的时间阈值和最低得分
+    BASE_SCORE / TIME_DIFF_MULTIPLIER / MAX_SCORE_DIFF  多人答对时按时间差计分
+    SPECIAL_NOS / TOTAL_ROUNDS              特殊题目的倍数
+
+每轮最多一名玩家得分：只有一人答对时按用时得分；多人答对时用时最短者按与第二名的
+时间差得分，并列最快则都不得分；无人答对时都不得分。
+
+score_rounds是批量形式：安装了NumPy时对整批回合向量化计算，用于离线模拟大量对局，
+结果与逐轮调用score_round完全相同（同样的浮点运算顺序和舍入方式）。
+"""
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖
+    np = None
+
+def answer_score(config: type, answer_time: float) -> float:
+    """只有一人答对时的得分（未乘倍数）：1秒内得满分，8秒以上得最低分，之间线性插值"""
+    if answer_time <= config.QUICK_ANSWER_TIME:
+        return config.QUICK_ANSWER_SCORE
+    elif answer_time >= config.SLOW_ANSWER_TIME:
+        return config.SLOW_ANSWER_SCORE
+    else:
+        return config.QUICK_ANSWER_SCORE - (
+            (answer_time - config.QUICK_ANSWER_TIME) /
+            (config.SLOW_ANSWER_TIME - config.QUICK_ANSWER_TIME)
+        ) * (config.QUICK_ANSWER_SCORE - config.SLOW_ANSWER_SCORE)
+
+def time_diff_score(config: type, fastest: float, second: float) -> float:
+    """多人答对时最快者的得分（未乘倍数），按与第二名的时间差（秒）计算并封顶"""
+    time_diff = (second - fastest) / 1000
+    return min(config.BASE_SCORE + time_diff * config.TIME_DIFF_MULTIPLIER,
+               config.BASE_SCORE + config.MAX_SCORE_DIFF)
+
+def round_multiplier(config: type, round_no: int) -> float:
+    """第round_no轮（从1开始）的分数倍数"""
+    current_round_zero_based = round_no - 1  # 转换为从0开始的轮数
+    for special_no, multiplier in config.SPECIAL_NOS:
+        # 如果是负数，从最后一题往前数
+        actual_round = special_no if special_no >= 0 else config.TOTAL_ROUNDS + special_no
+        if current_round_zero_based == actual_round:
+            return multiplier
+    return 1.0
+
+def round_multipliers(config: type) -> List[float]:
+    """每一轮的分数倍数"""
+    return [round_multiplier(config, round_no) for round_no in range(1, config.TOTAL_ROUNDS + 1)]
+
+def score_round(config: type, round_no: int,
+                answers: Sequence[Tuple[bool, float]]) -> Tuple[Optional[int], int]:
+    """结算一轮：answers为各玩家的(是否答对, 用时毫秒)，返回(得分玩家的序号, 得分)，
+    无人得分时序号为None、得分为0"""
+    correct = sorted((answer_time, i) for i, (is_correct, answer_time) in enumerate(answers)
+                     if is_correct)
+    if not correct:
+        return None, 0
+    multiplier = round_multiplier(config, round_no)
+    if len(correct) == 1:
+        return correct[0][1], round(answer_score(config, correct[0][0]) * multiplier)
+    if correct[0][0] == correct[1][0]:
+        return None, 0  # 用时相同，都不得分
+    return correct[0][1], round(time_diff_score(config, correct[0][0], correct[1][0]) * multiplier)
+
+def score_rounds(config: type, round_no, correct, answer_time):
+    """批量结算：correct和answer_time形状为(回合数, 玩家数)，round_no为每个回合的轮次
+    （数组或单个整数），返回(得分玩家的序号数组, 得分数组)，无人得分时序号为-1"""
+    if np is None:
+        if isinstance(round_no, int):
+            round_no = [round_no] * len(correct)
+        results = [score_round(config, r, list(zip(c, t)))
+                   for r, c, t in zip(round_no, correct, answer_time)]
+        return ([-1 if winner is None else winner for winner, _ in results],
+                [score for _, score in results])
+
+    correct = np.asarray(correct, dtype=bool)
+    answer_time = np.asarray(answer_time, dtype=np.float64)
+    rows = np.arange(len(correct))
+    # 答错的用时记为无穷大，按用时排序后前两名即为最快和第二快的答对者
+    masked = np.where(correct, answer_time, np.inf)
+    order = np.argsort(masked, axis=1, kind='stable')
+    fastest = masked[rows, order[:, 0]]
+    if masked.shape[1] > 1:
+        second = masked[rows, order[:, 1]]
+    else:
+        second = np.full(len(correct), np.inf)
+    correct_count = correct.sum(axis=1)
+
+    multipliers = np.asarray(round_multipliers(config), dtype=np.float64)
+    multiplier = multipliers[np.asarray(round_no) - 1]
+
+    # 两种算法都对整批计算再按答对人数选用，无人答对的行里出现的inf和nan不会被选用
+    with np.errstate(invalid='ignore', divide='ignore'):
+        single = np.where(fastest <= config.QUICK_ANSWER_TIME, config.QUICK_ANSWER_SCORE,
+                          np.where(fastest >= config.SLOW_ANSWER_TIME, config.SLOW_ANSWER_SCORE,
+                                   config.QUICK_ANSWER_SCORE - (
+                                       (fastest - config.QUICK_ANSWER_TIME) /
+                                       (config.SLOW_ANSWER_TIME - config.QUICK_ANSWER_TIME)
+                                   ) * (config.QUICK_ANSWER_SCORE - config.SLOW_ANSWER_SCORE)))
+        both = np.minimum(config.BASE_SCORE + (second - fastest) / 1000 * config.TIME_DIFF_MULTIPLIER,
+                          config.BASE_SCORE + config.MAX_SCORE_DIFF)
+    raw = np.where(correct_count == 1, single, both)
+    tie = (correct_count >= 2) & (fastest == second)
+    scored = (correct_count >= 1) & ~tie
+    score = np.where(scored, np.round(raw * multiplier), 0).astype(np.int64)
+    winner = np.where(scored, order[:, 0], -1)
+    return winner, score
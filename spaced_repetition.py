@@ -0,0 +1,218 @@
+"""单词测试的间隔重复调度（SM-2算法）
+
+每张卡片（单词）的复习状态保存在与词汇表等长的数组中：下次复习时刻、间隔（天）、
+难易系数、连续答对次数、遗忘次数。已学过的卡片按下次复习时刻放在最小堆里，
+取下一张到期卡片是O(1)查看堆顶加O(log n)出堆；状态变化后直接压入新条目，
+旧条目在出堆时按时刻不一致惰性丢弃。新卡片按随机步长遍历，不需要预先打乱整个列表。
+
+复习状态按用户保存为紧凑的二进制文件，只记录学过的卡片。
+文件在第一次取卡片时才读取，按卡片下标直接写回数组；词汇表变化时按单词重新对应。
+"""
+from array import array
+from typing import Callable, List, Optional, Tuple
+import heapq
+import math
+import os
+import random
+import re
+import struct
+import sys
+import time
+
+DEFAULT_STATE_DIR = 'review_state'
+
+# 状态文件：文件头 + 各字段数组 + 换行分隔的单词（用于词汇表变化后重新对应卡片）
+MAGIC = b'WPKR'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHII')  # magic, version, 保留, 卡片数, 单词区字节数
+FIELDS = (('index', 'I'), ('due', 'd'), ('interval', 'f'), ('ease', 'f'),
+          ('reps', 'H'), ('lapses', 'H'))
+
+class Config:
+    INITIAL_EASE = 2.5  # 新卡片的难易系数
+    MIN_EASE = 1.3
+    FIRST_INTERVAL = 1  # 第一次答对后的间隔（天）
+    SECOND_INTERVAL = 6  # 第二次答对后的间隔（天）
+    RELEARN_DELAY = 60  # 答错的卡片多少秒后再次出现
+    FAST_ANSWER = 3.0  # 多少秒内答对记为"轻松"（质量5）
+    SLOW_ANSWER = 10.0  # 超过多少秒答对记为"勉强"（质量3）
+
+DAY = 86400
+
+def answer_quality(correct: bool, seconds: float) -> int:
+    """把答题结果换算成SM-2的回忆质量（0-5）"""
+    if not correct:
+        return 1
+    if seconds <= Config.FAST_ANSWER:
+        return 5
+    if seconds >= Config.SLOW_ANSWER:
+        return 3
+    return 4
+
+def state_path(user: str, directory: str = DEFAULT_STATE_DIR) -> str:
+    """用户复习状态文件的路径"""
+    safe = re.sub(r'[^\w-]', '_', user) or 'default'
+    return os.path.join(directory, f'{safe}.bin')
+
+class ReviewScheduler:
+    """间隔重复调度器，卡片用词汇表下标表示"""
+    def __init__(self, card_count: int, key: Callable[[int], str],
+                 path: Optional[str] = None, rng: Optional[random.Random] = None):
+        self.card_count = card_count
+        self.key = key  # 下标 -> 单词，保存和加载时用来核对卡片
+        self.path = path
+        self.rng = rng or random.Random()
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        """第一次使用时才分配数组并读取保存的状态"""
+        if self._loaded:
+            return
+        self._loaded = True
+        n = self.card_count
+        self.due = array('d', bytes(8 * n))  # 下次复习时刻（time.time），0表示新卡片
+        self.interval = array('f', bytes(4 * n))
+        self.ease = array('f', [Config.INITIAL_EASE]) * n
+        self.reps = array('H', bytes(2 * n))
+        self.lapses = array('H', bytes(2 * n))
+        self._heap: List[Tuple[float, int]] = []
+
+        # 新卡片按随机起点和与卡片数互质的步长遍历
+        self._new_offset = self.rng.randrange(n) if n else 0
+        self._new_stride = self._coprime_stride(n)
+        self._new_cursor = 0
+
+        if self.path and os.path.exists(self.path):
+            self._load(self.path)
+        self._heap = [(self.due[i], i) for i in range(n) if self.due[i]]
+        heapq.heapify(self._heap)
+
+    def _coprime_stride(self, n: int) -> int:
+        if n <= 1:
+            return 1
+        stride = self.rng.randrange(1, n)
+        while math.gcd(stride, n) != 1:
+            stride += 1
+        return stride
+
+    def _load(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, _, count, words_size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            print(f"忽略无法识别的复习状态文件: {path}")
+            return
+        pos = HEADER.size
+        columns = {}
+        for name, code in FIELDS:
+            column = array(code)
+            size = column.itemsize * count
+            column.frombytes(data[pos:pos + size])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns[name] = column
+            pos += size
+        words = data[pos:pos + words_size].decode('utf-8').split('\n') if count else []
+
+        positions = None  # 词汇表变化后才需要的 单词 -> 下标 映射
+        for i in range(count):
+            index, word = columns['index'][i], words[i]
+            if index >= self.card_count or self.key(index) != word:
+                if positions is None:
+                    positions = {self.key(j): j for j in range(self.card_count)}
+                index = positions.get(word)
+                if index is None:
+                    continue  # 单词已从词汇表中删除
+            self.due[index] = columns['due'][i]
+            self.interval[index] = columns['interval'][i]
+            self.ease[index] = columns['ease'][i]
+            self.reps[index] = columns['reps'][i]
+            self.lapses[index] = columns['lapses'][i]
+
+    def save(self):
+        """写回学过的卡片（先写临时文件再替换，避免中途退出损坏状态）"""
+        if not self.path or not self._loaded:
+            return
+        learned = [i for i in range(self.card_count) if self.due[i]]
+        columns = {
+            'index': array('I', learned),
+            'due': array('d', (self.due[i] for i in learned)),
+            'interval': array('f', (self.interval[i] for i in learned)),
+            'ease': array('f', (self.ease[i] for i in learned)),
+            'reps': array('H', (self.reps[i] for i in learned)),
+            'lapses': array('H', (self.lapses[i] for i in learned)),
+        }
+        words = '\n'.join(self.key(i) for i in learned).encode('utf-8')
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(learned), len(words)))
+            for name, _ in FIELDS:
+                column = columns[name]
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                f.write(column.tobytes())
+            f.write(words)
+        os.replace(tmp, self.path)
+
+    def _pop_due(self, now: float, ahead: bool = False) -> Optional[int]:
+        """取出最早到期的卡片；ahead为True时即使未到期也取出"""
+        heap = self._heap
+        while heap:
+            due, index = heap[0]
+            if due != self.due[index]:
+                heapq.heappop(heap)  # 卡片已重新评分，丢弃旧条目
+                continue
+            if due > now and not ahead:
+                return None
+            heapq.heappop(heap)
+            return index
+        return None
+
+    def _next_new(self) -> Optional[int]:
+        while self._new_cursor < self.card_count:
+            index = (self._new_offset + self._new_cursor * self._new_stride) % self.card_count
+            self._new_cursor += 1
+            if not self.due[index]:
+                return index
+        return None
+
+    def next_card(self, now: Optional[float] = None) -> int:
+        """下一张卡片：优先到期复习，其次新卡片，全部学过时提前复习最早到期的"""
+        self._ensure_loaded()
+        now = time.time() if now is None else now
+        index = self._pop_due(now)
+        if index is None:
+            index = self._next_new()
+        if index is None:
+            index = self._pop_due(now, ahead=True)
+        if index is None:
+            raise ValueError("词汇表为空")
+        return index
+
+    def grade(self, index: int, quality: int, now: Optional[float] = None):
+        """按回忆质量（0-5）更新卡片状态并重新排入队列"""
+        self._ensure_loaded()
+        now = time.time() if now is None else now
+        if quality >= 3:
+            reps = self.reps[index]
+            if reps == 0:
+                interval = Config.FIRST_INTERVAL
+            elif reps == 1:
+                interval = Config.SECOND_INTERVAL
+            else:
+                interval = self.interval[index] * self.ease[index]
+            self.reps[index] = min(reps + 1, 0xFFFF)
+            self.interval[index] = interval
+            due = now + interval * DAY
+        else:
+            self.reps[index] = 0
+            self.interval[index] = 0
+            self.lapses[index] = min(self.lapses[index] + 1, 0xFFFF)
+            due = now + Config.RELEARN_DELAY
+        ease = self.ease[index] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        self.ease[index] = max(Config.MIN_EASE, ease)
+        self.due[index] = due
+        heapq.heappush(self._heap, (self.due[index], index))
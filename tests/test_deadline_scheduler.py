@@ -0,0 +1,37 @@
+import asyncio
+
+from deadline_scheduler import DeadlineScheduler
+
+def test_coroutine_callback_runs_and_errors_are_reported(capsys):
+    async def main():
+        scheduler = DeadlineScheduler()
+        done = asyncio.Event()
+
+        async def finish():
+            done.set()
+
+        async def fail():
+            raise RuntimeError("回调失败")
+
+        scheduler.schedule(0, fail)
+        scheduler.schedule(0.01, finish)
+        await asyncio.wait_for(done.wait(), 1)
+        await asyncio.sleep(0)
+        assert not scheduler._callbacks  # 结束的回调任务不再保留
+        scheduler.stop()
+
+    asyncio.run(main())
+    assert "截止时间回调发生错误: 回调失败" in capsys.readouterr().out
+
+def test_cancelled_deadline_not_called():
+    async def main():
+        scheduler = DeadlineScheduler()
+        called = []
+        handle = scheduler.schedule(0.01, called.append, 1)
+        scheduler.schedule(0.02, called.append, 2)
+        handle.cancel()
+        await asyncio.sleep(0.05)
+        scheduler.stop()
+        return called
+
+    assert asyncio.run(main()) == [2]
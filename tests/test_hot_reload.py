@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+import pytest
+
+from hot_reload import SnapshotSource, make_config
+from word_pk_server import Config
+
+def test_overrides_applied():
+    config = make_config(Config, Config.RELOADABLE, {'TOTAL_ROUNDS': 5, 'SPECIAL_NOS': [[-1, 2]]})
+    assert config.TOTAL_ROUNDS == 5
+    assert config.SPECIAL_NOS == [(-1, 2.0)]
+    assert Config.TOTAL_ROUNDS == 9
+
+@pytest.mark.parametrize('overrides', [
+    {'TOTAL_ROUNDS': 0},
+    {'ANSWER_TIMEOUT': -1000},
+    {'ROUND_GRACE': -1},
+    {'RESULT_DISPLAY_DELAY': -800},
+    {'MAX_DIFFICULTY': 256},
+    {'MIN_DIFFICULTY': 4, 'MAX_DIFFICULTY': 3},
+    {'QUICK_ANSWER_TIME': 9000},
+    {'SPECIAL_NOS': [[-1, 0]]},
+])
+def test_out_of_range_rejected(overrides):
+    with pytest.raises(ValueError):
+        make_config(Config, Config.RELOADABLE, overrides)
+
+def test_reload_keeps_snapshot_when_out_of_range(tmp_path):
+    path = tmp_path / 'server_config.json'
+    path.write_text(json.dumps({'TOTAL_ROUNDS': 3}), encoding='utf-8')
+    source = SnapshotSource(Config, Config.RELOADABLE, str(path))
+    assert source.current.config.TOTAL_ROUNDS == 3
+
+    # 其中一项超出范围时整个配置文件被拒绝，其他项也不生效
+    path.write_text(json.dumps({'TOTAL_ROUNDS': 5, 'ANSWER_TIMEOUT': 0}), encoding='utf-8')
+    source._config_stamp = None  # 修改时间可能与上次相同
+    assert not asyncio.run(source.reload())
+    assert source.current.version == 1
+    assert source.current.config.TOTAL_ROUNDS == 3
+    assert source.current.config.ANSWER_TIMEOUT == Config.ANSWER_TIMEOUT
@@ -0,0 +1,31 @@
+import zlib
+
+import pytest
+
+from wire_protocol import MAX_FRAME_SIZE, CompactCodec
+
+def deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-15)
+    return b'\x01' + compressor.compress(data) + compressor.flush()
+
+def test_round_trip():
+    codec = CompactCodec(deflate=True, min_deflate_size=0)
+    message = {'type': 'answer', 'answer': 2, 'time': 1234, 'name': '玩家' * 100}
+    assert codec.decode(codec.encode(message)) == message
+
+def test_rejects_oversized_compressed_frame():
+    # 几KB的压缩数据解压后超过上限
+    frame = deflate(b'\x00' * (MAX_FRAME_SIZE * 4))
+    assert len(frame) < 16 * 1024
+    with pytest.raises(ValueError):
+        CompactCodec(deflate=True).decode(frame)
+
+def test_rejects_truncated_compressed_frame():
+    codec = CompactCodec(deflate=True, min_deflate_size=0)
+    frame = codec.encode({'type': 'answer', 'name': 'x' * 500})
+    with pytest.raises(ValueError):
+        codec.decode(frame[:len(frame) // 2])
+
+def test_rejects_corrupt_compressed_frame():
+    with pytest.raises(ValueError):
+        CompactCodec(deflate=True).decode(b'\x01\xff\xff\xff\xff')
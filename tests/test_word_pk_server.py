@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from hot_reload import Snapshot, make_config
+from match_replay import NO_DELAYS, ReplayCodec, ReplayOutbox, ReplaySocket
+from vocabulary_index import VocabularyIndex
+from vocabulary_store import WordEntry
+from word_pk_server import Config, Player, WordPKGame, handle_answer, start_game
+from word_selector import WordSelector
+
+def make_entry(word: str, difficulty: int) -> WordEntry:
+    options = tuple((f"{word}{i}", f"n. {word}{i}") for i in range(3))
+    return WordEntry(word, f"n. {word}", (f"n. {word}",), {'uk': word, 'us': word},
+                     difficulty, options, options)
+
+def make_player(name: str, selector: WordSelector) -> Player:
+    player = Player(websocket=ReplaySocket(), name=name, codec=ReplayCodec(), ready=True,
+                    word_stats=selector.new_stats(), last_seen=time.monotonic())
+    player.outbox = ReplayOutbox()
+    return player
+
+def test_room_keeping_old_vocabulary_adopts_new_players_stats():
+    config = make_config(Config, Config.RELOADABLE, {'TOTAL_ROUNDS': 3, **NO_DELAYS})
+    old_index = VocabularyIndex([make_entry(f"easy{i}", 1) for i in range(30)] +
+                                [make_entry(f"hard{i}", 3) for i in range(30)])
+    old_selector = WordSelector(old_index)
+    # 热更新后的词汇表中没有难度3的单词，而且比原来的小
+    new_index = VocabularyIndex([make_entry(f"new{i}", 1) for i in range(5)])
+    new_selector = WordSelector(new_index)
+
+    async def play():
+        game = WordPKGame(room_id='r1', vocab_index=old_index, min_difficulty=3, max_difficulty=3,
+                          selector=old_selector, config=config)
+        before = make_player('before', old_selector)  # 热更新前加入
+        after = make_player('after', new_selector)  # 热更新后加入，统计属于新词汇表
+        for player in (before, after):
+            game.players[player.websocket] = player
+        game.use_snapshot(Snapshot(2, config, new_index, new_selector))
+        assert game.selector is old_selector  # 房间沿用原来的词汇表
+
+        game.game_in_progress = True
+        await start_game(game, seed=1)
+        word, index = game.current_word, game.current_index
+        for player in (before, after):
+            await handle_answer(game, player, {'answer': game.current_answer, 'time': 500},
+                                time.monotonic_ns())
+        return word, index, before, after
+
+    word, index, before, after = asyncio.run(play())
+    assert word.startswith('hard')
+    for player in (before, after):
+        assert player.word_stats.owner is old_selector
+        assert player.word_stats.attempts[index] == 1
+        assert player.word_stats.correct[index] == 1
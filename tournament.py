@@ -0,0 +1,343 @@
+"""锦标赛赛制：单败淘汰和瑞士制
+
+这里只负责赛程和排名，不涉及连接和房间：服务器（RoomManager）为start和report返回的
+每场比赛创建房间，对局结束后把结果交给report，再开始report返回的新比赛。
+同一时刻可以开始的比赛都会一起返回，由服务器在事件循环中并行进行。
+
+单败淘汰：开赛时按等级分排定种子，签表补足到2的幂，空出的签位由高种子轮空，
+前两号种子到决赛才会相遇。一场比赛决出胜者后立即填入下一轮的签位，相邻签位也已
+决出时下一场马上可以开始，不必等整轮结束。平局加赛，加赛达到上限仍平局时种子高者晋级。
+
+瑞士制：每轮按积分从高到低两两配对（同分时种子高者在前），尽量避开已交过手的对手；
+人数为奇数时排名最低且未轮空过的选手轮空并得分。一轮全部结束后才编排下一轮。
+排名依次比较积分、对手分（所有对手的积分之和，即Buchholz）和累计对局得分。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import itertools
+import math
+
+class Config:
+    WIN_POINTS = 1.0  # 瑞士制胜一场的积分
+    DRAW_POINTS = 0.5  # 平局的积分
+    BYE_POINTS = 1.0  # 轮空的积分
+    MAX_REPLAYS = 2  # 淘汰赛平局最多加赛的局数，仍平局时种子高者晋级
+    PAIRING_STEPS = 10000  # 瑞士制为避开重复对阵回溯配对的步数上限
+
+@dataclass(eq=False)
+class Entrant:
+    """参赛选手"""
+    name: str
+    rating: float
+    seed: int = 0  # 种子序号（从1开始，开赛时按等级分排定）
+    points: float = 0.0
+    wins: int = 0
+    draws: int = 0
+    losses: int = 0
+    byes: int = 0
+    score: int = 0  # 各局对局得分之和
+    opponents: List[str] = field(default_factory=list)
+    eliminated: Optional[int] = None  # 淘汰赛中被淘汰的轮次
+    withdrawn: bool = False  # 已主动退赛，不再安排比赛
+    player: object = None  # 当前的连接（由服务器维护），None表示暂时不在线
+
+@dataclass(eq=False)
+class Match:
+    """一场比赛；淘汰赛签位尚未决出时players中为None，瑞士制轮空时第二个位置为None"""
+    match_id: int
+    stage: int
+    table: int  # 本轮的台号（淘汰赛为签表上的位置），从1开始
+    players: List[Optional[str]]
+    winner: Optional[str] = None
+    scores: Dict[str, int] = field(default_factory=dict)  # 最近一局的比分
+    games: int = 0  # 已进行的局数（含加赛）
+    done: bool = False
+
+class Tournament:
+    """赛制的公共部分：报名、记录结果和排名"""
+    format = ''
+
+    def __init__(self, tournament_id: str, stages: Optional[int] = None,
+                 organizer: Optional[str] = None):
+        self.tournament_id = tournament_id
+        self.organizer = organizer  # 组织者的名字，只有组织者可以开赛
+        self.host = None  # 组织者当前的连接（由服务器维护）
+        self.entrants: Dict[str, Entrant] = {}  # 名字 -> 选手（按报名顺序）
+        self.matches: Dict[int, Match] = {}  # 已可以进行、尚未决出结果的比赛
+        self.stage = 0  # 当前轮次（最早一轮尚未全部结束的比赛），0表示尚未开赛
+        self.stages = stages  # 总轮数，为None时开赛时按人数确定
+        self.started = False
+        self.finished = False
+        self._match_ids = itertools.count(1)
+        self._unfinished: Dict[int, int] = {}  # 轮次 -> 尚未结束的比赛数
+
+    def add(self, name: str, rating: float, player=None) -> Entrant:
+        """报名（开赛后不能再报名）"""
+        if self.started:
+            raise ValueError("锦标赛已经开始")
+        if name in self.entrants:
+            raise ValueError(f"选手 {name} 已经报名")
+        entrant = self.entrants[name] = Entrant(name, rating, player=player)
+        return entrant
+
+    def withdraw(self, name: str):
+        """退赛：开赛前直接取消报名；开赛后不再安排比赛，已安排的比赛由服务器判负"""
+        if not self.started:
+            self.entrants.pop(name, None)
+        elif name in self.entrants:
+            self.entrants[name].withdrawn = True
+
+    def start(self) -> List[Match]:
+        """开赛：排定种子并返回第一批可以进行的比赛"""
+        if self.started:
+            raise ValueError("锦标赛已经开始")
+        if len(self.entrants) < 2:
+            raise ValueError("参赛人数不足")
+        # 等级分相同时先报名的种子在前（sorted是稳定排序）
+        ranked = sorted(self.entrants.values(), key=lambda e: -e.rating)
+        for seed, entrant in enumerate(ranked, 1):
+            entrant.seed = seed
+        self.started = True
+        return self._start(ranked)
+
+    def report(self, match: Match, winners: Iterable[str],
+               scores: Optional[Dict[str, int]] = None) -> List[Match]:
+        """记录一局的结果，返回因此可以进行的比赛（淘汰赛平局加赛时包括本场）
+
+        winners为胜者的名字，两人都在其中表示平局，都不在其中表示双方判负。
+        """
+        if self.matches.get(match.match_id) is not match:
+            return []  # 已经记录过结果
+        match.games += 1
+        match.scores = dict(scores or {})
+        for name, score in match.scores.items():
+            if name in self.entrants:
+                self.entrants[name].score += score
+        decided = self._decide(match, [name for name in match.players if name in winners])
+        if decided is None:
+            return [match]
+        del self.matches[match.match_id]
+        self._record(match, decided)
+        return self._completed(match)
+
+    def _open(self, match: Match) -> List[Match]:
+        """登记一场双方都已确定的比赛"""
+        self.matches[match.match_id] = match
+        return [match]
+
+    def _new_match(self, stage: int, table: int, players: List[Optional[str]]) -> Match:
+        self._unfinished[stage] = self._unfinished.get(stage, 0) + 1
+        return Match(next(self._match_ids), stage, table, players)
+
+    def _bye(self, match: Match, name: Optional[str]):
+        """轮空：name直接晋级（淘汰赛中可能为None，即两个签位都空出）"""
+        match.done = True
+        match.winner = name
+        if name is not None:
+            entrant = self.entrants[name]
+            entrant.byes += 1
+            entrant.points += Config.BYE_POINTS
+        self._finish_stage_match(match)
+
+    def _decide(self, match: Match, winners: List[str]) -> Optional[List[str]]:
+        """按本局的胜者决定比赛结果，返回None表示需要加赛"""
+        return winners
+
+    def _record(self, match: Match, winners: List[str]):
+        match.done = True
+        match.winner = winners[0] if len(winners) == 1 else None
+        first, second = match.players
+        for name, opponent in ((first, second), (second, first)):
+            entrant = self.entrants[name]
+            entrant.opponents.append(opponent)
+            if len(winners) == 2:
+                entrant.draws += 1
+                entrant.points += Config.DRAW_POINTS
+            elif name in winners:
+                entrant.wins += 1
+                entrant.points += Config.WIN_POINTS
+            else:
+                entrant.losses += 1
+        self._finish_stage_match(match)
+
+    def _finish_stage_match(self, match: Match):
+        self._unfinished[match.stage] -= 1
+        while self._unfinished.get(self.stage) == 0:
+            del self._unfinished[self.stage]
+            self.stage += 1
+
+    def _start(self, ranked: List[Entrant]) -> List[Match]:
+        raise NotImplementedError
+
+    def _completed(self, match: Match) -> List[Match]:
+        """一场比赛结束后，返回因此可以进行的比赛"""
+        raise NotImplementedError
+
+    def _rank_key(self, entrant: Entrant, buchholz: Dict[str, float]) -> tuple:
+        return (-entrant.points, -buchholz[entrant.name], -entrant.score, entrant.seed)
+
+    def standings(self) -> List[dict]:
+        """当前排名"""
+        buchholz = {e.name: sum(self.entrants[o].points for o in e.opponents if o is not None)
+                    for e in self.entrants.values()}
+        ranked = sorted(self.entrants.values(), key=lambda e: self._rank_key(e, buchholz))
+        return [{
+            'rank': rank,
+            'name': e.name,
+            'points': e.points,
+            'wins': e.wins,
+            'draws': e.draws,
+            'losses': e.losses,
+            'buchholz': buchholz[e.name],
+            'score': e.score,
+            'eliminated': e.eliminated,
+        } for rank, e in enumerate(ranked, 1)]
+
+def bracket_order(size: int) -> List[int]:
+    """签表上从上到下的种子序号（size为2的幂）：1号对最后一号，前两号种子分在两个半区"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [s for seed in order for s in (seed, total - seed)]
+    return order
+
+class SingleElimination(Tournament):
+    """单败淘汰"""
+    format = 'elimination'
+
+    def __init__(self, tournament_id: str, stages: Optional[int] = None,
+                 organizer: Optional[str] = None):
+        # 轮数由人数决定，忽略传入的stages
+        super().__init__(tournament_id, None, organizer)
+        self.bracket: List[List[Match]] = []  # 每轮的比赛，按签表位置排列
+        self._decided: Dict[int, int] = {}  # 比赛编号 -> 已决出的签位数
+
+    def _start(self, ranked: List[Entrant]) -> List[Match]:
+        size = 1 << (len(ranked) - 1).bit_length()
+        self.stages = size.bit_length() - 1
+        for stage in range(1, self.stages + 1):
+            self.bracket.append([self._new_match(stage, table, [None, None])
+                                 for table in range(1, (size >> stage) + 1)])
+        self.stage = 1
+        seeds = [ranked[seed - 1].name if seed <= len(ranked) else None
+                 for seed in bracket_order(size)]
+        ready = []
+        for match in self.bracket[0]:
+            match.players = seeds[2 * match.table - 2:2 * match.table]
+            ready += self._fill(match)
+        return ready
+
+    def _fill(self, match: Match) -> List[Match]:
+        """两个签位都已决出：开始比赛，或由在场的一方轮空晋级"""
+        present = [name for name in match.players if name is not None]
+        if len(present) == 2:
+            return self._open(match)
+        self._bye(match, present[0] if present else None)
+        return self._advance(match)
+
+    def _advance(self, match: Match) -> List[Match]:
+        """把胜者填入下一轮的签位"""
+        if match.stage == self.stages:
+            self.finished = True
+            return []
+        parent = self.bracket[match.stage][(match.table - 1) // 2]
+        parent.players[(match.table - 1) % 2] = match.winner
+        decided = self._decided.get(parent.match_id, 0) + 1
+        if decided < 2:
+            self._decided[parent.match_id] = decided
+            return []
+        self._decided.pop(parent.match_id, None)
+        return self._fill(parent)
+
+    def _decide(self, match: Match, winners: List[str]) -> Optional[List[str]]:
+        if len(winners) < 2:
+            return winners
+        if match.games <= Config.MAX_REPLAYS:
+            return None
+        return [min(winners, key=lambda name: self.entrants[name].seed)]
+
+    def _record(self, match: Match, winners: List[str]):
+        super()._record(match, winners)
+        for name in match.players:
+            if name != match.winner:
+                self.entrants[name].eliminated = match.stage
+
+    def _completed(self, match: Match) -> List[Match]:
+        return self._advance(match)
+
+    def _rank_key(self, entrant: Entrant, buchholz: Dict[str, float]) -> tuple:
+        # 淘汰得越晚名次越靠前，仍在赛中的选手（含冠军）排在最前
+        reached = self.stages + 1 if entrant.eliminated is None else entrant.eliminated
+        return (-reached, -entrant.wins, -entrant.score, entrant.seed)
+
+class Swiss(Tournament):
+    """瑞士制"""
+    format = 'swiss'
+
+    def _start(self, ranked: List[Entrant]) -> List[Match]:
+        if self.stages is None:
+            self.stages = max(1, math.ceil(math.log2(len(ranked))))
+        self.stage = 1
+        return self._pair_stage()
+
+    def _pair_stage(self) -> List[Match]:
+        """编排当前轮"""
+        active = sorted((e for e in self.entrants.values() if not e.withdrawn),
+                        key=lambda e: (-e.points, e.seed))
+        if len(active) < 2:
+            self.finished = True
+            return []
+        bye = None
+        if len(active) % 2:
+            # 排名最低且未轮空过的选手轮空（都轮空过时为排名最低者）
+            bye = next((e for e in reversed(active) if not e.byes), active[-1])
+            active.remove(bye)
+        ready = []
+        for table, (first, second) in enumerate(self._pairs(active), 1):
+            ready += self._open(self._new_match(self.stage, table, [first.name, second.name]))
+        if bye is not None:
+            self._bye(self._new_match(self.stage, len(ready) + 1, [bye.name, None]), bye.name)
+        return ready
+
+    @staticmethod
+    def _pairs(ranked: List[Entrant]) -> List[Tuple[Entrant, Entrant]]:
+        """按排名从高到低配对：每人与排名最近且尚未交过手的选手配对，排到后面无人可配时
+        回溯调整前面的配对；回溯超过步数上限仍找不到时允许重复对阵"""
+        faced = {e.name: set(e.opponents) for e in ranked}
+        budget = [Config.PAIRING_STEPS]
+
+        def search(unpaired: List[Entrant]) -> Optional[List[Tuple[Entrant, Entrant]]]:
+            if not unpaired:
+                return []
+            first, rest = unpaired[0], unpaired[1:]
+            for i, other in enumerate(rest):
+                if other.name in faced[first.name]:
+                    continue
+                budget[0] -= 1
+                if budget[0] < 0:
+                    return None
+                tail = search(rest[:i] + rest[i + 1:])
+                if tail is not None:
+                    return [(first, other)] + tail
+            return None
+
+        pairs = search(ranked)
+        if pairs is not None:
+            return pairs
+        unpaired = list(ranked)
+        pairs = []
+        while unpaired:
+            first = unpaired.pop(0)
+            index = next((i for i, e in enumerate(unpaired) if e.name not in faced[first.name]), 0)
+            pairs.append((first, unpaired.pop(index)))
+        return pairs
+
+    def _completed(self, match: Match) -> List[Match]:
+        if self.matches or self._unfinished:
+            return []  # 本轮还有比赛没有结束
+        if self.stage > self.stages:
+            self.finished = True
+            return []
+        return self._pair_stage()
+
+FORMATS = {cls.format: cls for cls in (SingleElimination, Swiss)}
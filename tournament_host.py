@@ -0,0 +1,129 @@
+"""锦标赛组织者：创建锦标赛，等待选手报名后开赛，输出每场结果和每轮排名
+
+用法：
+    python tournament_host.py --format swiss --rounds 5 --entrants 40
+
+选手在客户端的“锦标赛”一栏填写输出的锦标赛编号加入（机器人：word_pk_bot.py --tournament 编号）。
+报名人数达到 --entrants 或等待超过 --wait 秒（至少2人）后开赛，之后由服务器自动配对，
+同一轮的比赛并行进行，直到锦标赛结束。
+"""
+from typing import List, Optional
+import argparse
+import asyncio
+import json
+import time
+import websockets
+from tournament import FORMATS
+from wire_protocol import PROTOCOL_VERSION
+
+class Config:
+    DEFAULT_HOST = 'localhost'
+    DEFAULT_PORT = 8766
+    NAME = '组织者'
+    WAIT = 300  # 默认最长等待报名的时间（秒）
+    SHOW = 10  # 每轮结束时列出的名次数
+
+def format_row(row: dict, tournament_format: str, finished: bool) -> str:
+    record = f"胜{row['wins']} 平{row['draws']} 负{row['losses']}  对局得分 {row['score']}"
+    if tournament_format == 'elimination':
+        if row['eliminated'] is not None:
+            status = f"第 {row['eliminated']} 轮出局"
+        else:
+            status = "冠军" if finished else "仍在赛中"
+        return f"{row['rank']:>4}. {row['name']}  {status}  {record}"
+    return f"{row['rank']:>4}. {row['name']}  积分 {row['points']:g}  对手分 {row['buchholz']:g}  {record}"
+
+def print_standings(standings: List[dict], tournament_format: str, finished: bool = False,
+                    limit: Optional[int] = None):
+    for row in standings[:limit]:
+        print(format_row(row, tournament_format, finished))
+
+async def host(url: str, name: str, tournament_format: str, rounds: Optional[int],
+               entrants: Optional[int], wait: float, show: int, verbose: bool):
+    async with websockets.connect(url) as websocket:
+        async def send(message: dict):
+            await websocket.send(json.dumps(message))
+
+        await send({'type': 'hello', 'version': PROTOCOL_VERSION, 'name': name,
+                    'encodings': ['json']})
+        await websocket.recv()  # welcome
+        create = {'type': 'create_tournament', 'format': tournament_format}
+        if rounds:
+            create['rounds'] = rounds
+        await send(create)
+
+        tournament_id = None
+        registered = 0
+        started = False
+        deadline = time.monotonic() + wait
+        while True:
+            timeout = None if started or tournament_id is None else max(0.0, deadline - time.monotonic())
+            try:
+                message = json.loads(await asyncio.wait_for(websocket.recv(), timeout))
+            except asyncio.TimeoutError:
+                message = {'type': 'timeout'}
+            message_type = message['type']
+            start = message_type == 'timeout'
+
+            if message_type == 'tournament_created':
+                tournament_id = message['tournament_id']
+                print(f"锦标赛 {tournament_id} 已创建（{tournament_format}），等待选手报名...")
+
+            elif message_type == 'room_error':
+                print(f"错误：{message['message']}")
+                if tournament_id is None:
+                    return
+
+            elif message_type == 'tournament_update':
+                if message['state'] == 'registering':
+                    registered = message['entrants']
+                    if verbose:
+                        print(f"已报名 {registered} 人")
+                    start = bool(entrants) and registered >= entrants
+                elif message['state'] == 'running':
+                    print(f"第 {message['stage']}/{message['stages']} 轮进行中，当前排名：")
+                    print_standings(message['standings'], tournament_format, limit=show)
+                else:
+                    print(f"锦标赛 {tournament_id} 结束，最终排名：")
+                    print_standings(message['standings'], tournament_format, finished=True)
+                    return
+
+            elif message_type == 'tournament_result' and verbose:
+                players = ' vs '.join(message['players'])
+                scores = ' : '.join(str(message['scores'].get(p, '-')) for p in message['players'])
+                if not message['decided']:
+                    outcome = "平局，加赛"
+                elif message['winner']:
+                    outcome = f"{message['winner']} 胜"
+                else:
+                    outcome = "平局" if message['scores'] else "双方判负"
+                print(f"  第 {message['stage']} 轮 第 {message['table']} 台 {players}  {scores}  {outcome}")
+
+            if start and not started:
+                if registered < 2:
+                    print(f"报名人数不足（{registered} 人），继续等待")
+                    deadline = time.monotonic() + wait
+                    continue
+                print(f"{registered} 人报名，开赛")
+                started = True
+                await send({'type': 'start_tournament', 'tournament_id': tournament_id})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="创建并主持一场锦标赛")
+    parser.add_argument('--host', default=Config.DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=Config.DEFAULT_PORT)
+    parser.add_argument('--name', default=Config.NAME, help="组织者的名字")
+    parser.add_argument('--format', choices=list(FORMATS), default='swiss',
+                        help="赛制：瑞士制或单败淘汰")
+    parser.add_argument('--rounds', type=int, default=None,
+                        help="瑞士制的轮数，默认按人数取log2向上取整")
+    parser.add_argument('--entrants', type=int, default=None, help="报名达到该人数立即开赛")
+    parser.add_argument('--wait', type=float, default=Config.WAIT, help="最长等待报名的时间（秒）")
+    parser.add_argument('--show', type=int, default=Config.SHOW, help="每轮结束时列出的名次数")
+    parser.add_argument('--verbose', action='store_true', help="输出报名人数和每场比赛的结果")
+    args = parser.parse_args()
+    try:
+        asyncio.run(host(f'ws://{args.host}:{args.port}', args.name, args.format, args.rounds,
+                         args.entrants, args.wait, args.show, args.verbose))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,77 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+import random
+from vocabulary_store import DEFAULT_JSON_PATH, WordEntry, get_vocabulary
+
+class IndexedWord(NamedTuple):
+    """出题所需的单词数据（选项释义已预先提取）"""
+    word: str
+    meaning: str
+    meanings: Tuple[str, ...]
+    pronunciation: dict
+    difficulty: int
+    options1: Tuple[str, ...]  # 形近词释义
+    options2: Tuple[str, ...]  # 意近词释义
+
+class VocabularyIndex:
+    """词汇索引：加载时按难度分桶，出题时O(1)采样"""
+    def __init__(self, vocabulary: Iterable[WordEntry]):
+        words = [IndexedWord(
+            word=entry.word,
+            meaning=entry.meaning,
+            meanings=entry.meanings,
+            pronunciation=entry.pronunciation,
+            difficulty=entry.difficulty,
+            options1=tuple(meaning for _, meaning in entry.options1),
+            options2=tuple(meaning for _, meaning in entry.options2)
+        ) for entry in vocabulary]
+        # 按难度稳定排序，同一难度的单词连续存放
+        words.sort(key=lambda w: w.difficulty)
+        self.words: Tuple[IndexedWord, ...] = tuple(words)
+        self._difficulties = [w.difficulty for w in self.words]
+        self._ranges: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def bucket_sizes(self) -> Dict[int, int]:
+        """各难度的单词数量"""
+        sizes: Dict[int, int] = {}
+        for difficulty in self._difficulties:
+            sizes[difficulty] = sizes.get(difficulty, 0) + 1
+        return sizes
+
+    def bounds(self, min_difficulty: int, max_difficulty: int) -> Tuple[int, int]:
+        """返回难度在[min_difficulty, max_difficulty]内的单词下标区间"""
+        key = (min_difficulty, max_difficulty)
+        if key not in self._ranges:
+            start = bisect_left(self._difficulties, min_difficulty)
+            end = bisect_right(self._difficulties, max_difficulty)
+            self._ranges[key] = (start, max(start, end))
+        return self._ranges[key]
+
+    def count(self, min_difficulty: int, max_difficulty: int) -> int:
+        start, end = self.bounds(min_difficulty, max_difficulty)
+        return end - start
+
+    def sample_index(self, min_difficulty: int, max_difficulty: int,
+                     rng: Optional[random.Random] = None) -> int:
+        """随机抽取一个难度在指定区间内的单词，返回其下标；rng为None时使用全局随机数"""
+        start, end = self.bounds(min_difficulty, max_difficulty)
+        if start == end:
+            raise ValueError(f"没有难度在 {min_difficulty}-{max_difficulty} 之间的单词")
+        return (rng or random).randrange(start, end)
+
+    def sample(self, min_difficulty: int, max_difficulty: int) -> IndexedWord:
+        """随机抽取一个难度在指定区间内的单词"""
+        return self.words[self.sample_index(min_difficulty, max_difficulty)]
+
+_indexes: Dict[str, VocabularyIndex] = {}
+
+def get_vocabulary_index(path: str = DEFAULT_JSON_PATH) -> VocabularyIndex:
+    """获取进程内共享的词汇索引，同一词汇表只构建一次"""
+    index = _indexes.get(path)
+    if index is None:
+        index = VocabularyIndex(get_vocabulary(path))
+        _indexes[path] = index
+    return index
@@ -2,6 +2,9 @@ import tkinter as tk
 from tkinter import ttk
 import json
 import random
+import time
+from spaced_repetition import ReviewScheduler, answer_quality, state_path
+from vocabulary_store import get_vocabulary
 
 class VocabularyQuiz:
     def __init__(self, root):
@@ -15,19 +18,21 @@ class VocabularyQuiz:
         self.option_font = ("SimSun", 14)        # 选项用的字体
         self.info_font = ("SimSun", 12)          # 信息显示用的字体
         
-        # 加载词汇表和配置
-        with open('vocabulary.json', 'r', encoding='utf-8') as f:
-            self.vocabulary = json.load(f)
+        # 加载词汇表（只读共享）和配置
+        self.vocabulary = get_vocabulary()
         with open('config.json', 'r', encoding='utf-8') as f:
             self.config = json.load(f)
         
-        # 初始化时就打乱词汇顺序
-        random.shuffle(self.vocabulary)
+        # 间隔重复调度：复习状态按用户保存，第一次出题时才读取
+        self.scheduler = ReviewScheduler(len(self.vocabulary), self.vocabulary.word,
+                                         state_path(self.config.get('name', '')))
         
         # 初始化统计数据
         self.correct_count = 0
         self.wrong_count = 0
-        self.current_word_index = 0
+        self.current_card = None  # 当前题目在词汇表中的下标，答题后置为None
+        self.question_shown_at = 0.0
+        self.answers_since_save = 0
         self.current_options = []
         self.correct_answer = ""
         self.last_word = ""
@@ -44,6 +49,9 @@ class VocabularyQuiz:
         self.root.bind('2', lambda e: self.check_answer(1))
         self.root.bind('3', lambda e: self.check_answer(2))
         self.root.bind('4', lambda e: self.check_answer(3))
+        
+        # 关闭窗口时保存复习状态
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def create_widgets(self):
         # 创建主框架
@@ -87,20 +95,19 @@ class VocabularyQuiz:
         self.last_word_label.pack()
     
     def show_next_question(self):
-        if self.current_word_index >= len(self.vocabulary):
-            self.current_word_index = 0
-            random.shuffle(self.vocabulary)
-        
-        word_data = self.vocabulary[self.current_word_index]
-        self.word_label.config(text=word_data["word"])
+        # 优先出到期需要复习的单词
+        self.current_card = self.scheduler.next_card()
+        self.question_shown_at = time.monotonic()
+        word_data = self.vocabulary[self.current_card]
+        self.word_label.config(text=word_data.word)
         
         # 显示音标
         pron_type = self.config.get('pronunciation_type', 'uk')
-        pronunciation = word_data["pronunciation"][pron_type]
+        pronunciation = word_data.pronunciation[pron_type]
         self.pronunciation_label.config(text=f"/{pronunciation}/")
         
         # 获取正确答案
-        meanings = word_data["meanings"]
+        meanings = word_data.meanings
         if len(meanings) == 1:
             self.correct_answer = meanings[0]
         else:
@@ -108,8 +115,8 @@ class VocabularyQuiz:
             self.correct_answer = meanings[0] if random.random() < 0.75 else meanings[1]
         
         # 获取错误选项
-        options1 = [opt["meaning"] for opt in word_data["options1"]]
-        options2 = [opt["meaning"] for opt in word_data["options2"]]
+        options1 = [meaning for _, meaning in word_data.options1]
+        options2 = [meaning for _, meaning in word_data.options2]
         random.shuffle(options1)
         random.shuffle(options2)
         wrong_options = options1[:2] + [options2[0]]  # 从options1选两个，从options2选一个
@@ -123,10 +130,21 @@ class VocabularyQuiz:
             self.option_buttons[i].config(text=f"{i+1}. {option}", bg="SystemButtonFace")
     
     def check_answer(self, button_index):
+        if self.current_card is None:  # 本题已作答，等待下一题
+            return
         selected_answer = self.current_options[button_index]
         current_word = self.word_label.cget("text")
         
-        if selected_answer == self.correct_answer:
+        # 按答题结果和用时安排下次复习
+        is_correct = selected_answer == self.correct_answer
+        elapsed = time.monotonic() - self.question_shown_at
+        self.scheduler.grade(self.current_card, answer_quality(is_correct, elapsed))
+        self.answers_since_save += 1
+        if self.answers_since_save >= 20:
+            self.scheduler.save()
+            self.answers_since_save = 0
+        
+        if is_correct:
             self.correct_count += 1
             self.option_buttons[button_index].config(bg="light green")
         else:
@@ -145,9 +163,10 @@ class VocabularyQuiz:
         self.accuracy_label.config(text=f"正确率: {accuracy:.1f}%")
         
         # 保存当前题目信息，用于下一题显示
-        word_data = self.vocabulary[self.current_word_index]
+        word_data = self.vocabulary[self.current_card]
+        self.current_card = None
         self.last_word = current_word
-        self.last_answer = word_data["meaning"]  # 使用meaning字段作为答案显示
+        self.last_answer = word_data.meaning  # 使用meaning字段作为答案显示
         
         # 延迟显示下一题
         self.root.after(1000, self.next_question)
@@ -157,8 +176,11 @@ class VocabularyQuiz:
         if self.last_word:
             self.last_word_label.config(text=f"上一题: {self.last_word} = {self.last_answer}")
         
-        self.current_word_index += 1
         self.show_next_question()
+    
+    def on_closing(self):
+        self.scheduler.save()
+        self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,359 @@
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+DEFAULT_JSON_PATH = 'vocabulary.json'
+DEFAULT_BINARY_PATH = 'vocabulary.bin'
+MIN_OPTIONS = 2  # 出题时从options1、options2中各最多抽两个
+MAX_DIFFICULTY = 255  # 难度按一个字节保存
+
+# 二进制格式：文件头 + 字符串偏移表 + 字符串区 + 单词记录 + 列表区
+# 所有整数均为小端uint32，字符串按内容去重（驻留）后只存一份
+MAGIC = b'WPKV'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIII')  # magic, version, 保留, 字符串数, 字符串区字节数, 单词数, 列表区长度
+RECORD_FIELDS = 11  # word, meaning, uk, us, difficulty, meanings(起始, 个数), options1(起始, 个数), options2(起始, 个数)
+
+class WordEntry(NamedTuple):
+    """只读单词条目"""
+    word: str
+    meaning: str
+    meanings: Tuple[str, ...]
+    pronunciation: dict  # {'uk': ..., 'us': ...}，约定只读
+    difficulty: int
+    options1: Tuple[Tuple[str, str], ...]  # 形近词 (word, meaning)
+    options2: Tuple[Tuple[str, str], ...]  # 意近词 (word, meaning)
+
+def pack_vocabulary(vocabulary: List[dict]) -> bytes:
+    """把JSON词汇表打包成紧凑的二进制格式"""
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    records = array('I')
+    lists = array('I')
+    for entry in vocabulary:
+        pronunciation = entry.get('pronunciation', {})
+        meanings_start = len(lists)
+        lists.extend(intern(m) for m in entry['meanings'])
+        option_ranges = []
+        for key in ('options1', 'options2'):
+            start = len(lists)
+            for opt in entry.get(key, []):
+                if 'meaning' in opt:
+                    lists.append(intern(opt['word']))
+                    lists.append(intern(opt['meaning']))
+            option_ranges += [start, (len(lists) - start) // 2]
+        records.extend([
+            intern(entry['word']), intern(entry['meaning']),
+            intern(pronunciation.get('uk', '')), intern(pronunciation.get('us', '')),
+            entry.get('difficulty', 0),
+            meanings_start, len(entry['meanings']),
+            *option_ranges
+        ])
+
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = array('I', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    blob = b''.join(encoded)
+    # 字符串区补齐到4字节，保证后面的数组对齐
+    blob += b'\0' * (-len(blob) % 4)
+
+    if sys.byteorder != 'little':
+        for arr in (offsets, records, lists):
+            arr.byteswap()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(encoded), len(blob),
+                         len(vocabulary), len(lists))
+    return header + offsets.tobytes() + blob + records.tobytes() + lists.tobytes()
+
+class VocabularyStore:
+    """进程内共享的只读词汇表
+
+    数据以紧凑的二进制格式保存（可直接mmap文件，多个进程共享同一份页面），
+    条目在首次访问时才解码并缓存。
+    """
+    def __init__(self, buffer):
+        self._buffer = buffer  # bytes或mmap，需在整个生命周期内保持引用
+        view = memoryview(buffer)
+        magic, version, _, n_strings, blob_size, n_entries, n_lists = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("不是有效的词汇表二进制文件")
+
+        pos = HEADER.size
+        self._offsets = self._uint32_array(view[pos:pos + (n_strings + 1) * 4])
+        pos += (n_strings + 1) * 4
+        self._blob = view[pos:pos + blob_size]
+        pos += blob_size
+        self._records = self._uint32_array(view[pos:pos + n_entries * RECORD_FIELDS * 4])
+        pos += n_entries * RECORD_FIELDS * 4
+        self._lists = self._uint32_array(view[pos:pos + n_lists * 4])
+
+        self._strings: List[Optional[str]] = [None] * n_strings
+        self._entries: List[Optional[WordEntry]] = [None] * n_entries
+
+    @staticmethod
+    def _uint32_array(view: memoryview):
+        if sys.byteorder == 'little':
+            return view.cast('I')  # 零拷贝
+        arr = array('I', view.tobytes())
+        arr.byteswap()
+        return arr
+
+    @classmethod
+    def from_json(cls, path: str = DEFAULT_JSON_PATH) -> 'VocabularyStore':
+        """从JSON加载（校验并规范化，不写编译产物）"""
+        return cls(pack_vocabulary(load_checked(path)))
+
+    @classmethod
+    def from_binary(cls, path: str = DEFAULT_BINARY_PATH) -> 'VocabularyStore':
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, index: int) -> str:
+        text = self._strings[index]
+        if text is None:
+            text = str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+            self._strings[index] = text
+        return text
+
+    def _pairs(self, start: int, count: int) -> Tuple[Tuple[str, str], ...]:
+        lists = self._lists
+        return tuple((self._string(lists[i]), self._string(lists[i + 1]))
+                     for i in range(start, start + count * 2, 2))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def word(self, index: int) -> str:
+        """只解码单词本身，不构造完整条目"""
+        return self._string(self._records[index * RECORD_FIELDS])
+
+    def __getitem__(self, index: int) -> WordEntry:
+        entry = self._entries[index]
+        if entry is None:
+            base = index * RECORD_FIELDS
+            (word, meaning, uk, us, difficulty, meanings_start, meanings_count,
+             options1_start, options1_count, options2_start, options2_count
+             ) = self._records[base:base + RECORD_FIELDS]
+            entry = WordEntry(
+                word=self._string(word),
+                meaning=self._string(meaning),
+                meanings=tuple(self._string(i) for i in
+                               self._lists[meanings_start:meanings_start + meanings_count]),
+                pronunciation={'uk': self._string(uk), 'us': self._string(us)},
+                difficulty=difficulty,
+                options1=self._pairs(options1_start, options1_count),
+                options2=self._pairs(options2_start, options2_count)
+            )
+            self._entries[index] = entry
+        return entry
+
+    def __iter__(self) -> Iterator[WordEntry]:
+        for index in range(len(self)):
+            yield self[index]
+
+class VocabularyError(ValueError):
+    """词汇表校验失败"""
+    def __init__(self, errors: List[str]):
+        super().__init__("词汇表校验失败:\n" + "\n".join(errors))
+        self.errors = errors
+
+def check_vocabulary(vocabulary) -> Tuple[List[dict], List[str], List[str]]:
+    """校验并规范化词汇表，返回(规范化后的条目, 错误, 警告)
+
+    规范化：去掉重复的释义；去掉缺少字段、与单词本身相同、释义与可能的正确答案
+    （meanings的前两项）相同或与前面的选项重复的干扰项；重复的单词只保留第一个。
+    错误：缺少必填字段、难度无效、去重后干扰项不足MIN_OPTIONS个。
+    """
+    if not isinstance(vocabulary, list):
+        return [], ["顶层必须是单词条目的列表"], []
+    entries, errors, warnings = [], [], []
+    seen_words = set()
+    for position, entry in enumerate(vocabulary):
+        where = f"第{position + 1}个条目"
+        if not isinstance(entry, dict) or not isinstance(entry.get('word'), str) or not entry['word']:
+            errors.append(f"{where}: 缺少单词")
+            continue
+        word = entry['word']
+        where = f"{where}（{word}）"
+        if word in seen_words:
+            warnings.append(f"{where}: 单词重复，已忽略")
+            continue
+        seen_words.add(word)
+
+        meanings = entry.get('meanings')
+        if not isinstance(meanings, list) or not all(isinstance(m, str) and m for m in meanings):
+            errors.append(f"{where}: meanings必须是非空字符串列表")
+            continue
+        unique_meanings = list(dict.fromkeys(meanings))
+        if not unique_meanings:
+            errors.append(f"{where}: 没有释义")
+            continue
+        if len(unique_meanings) < len(meanings):
+            warnings.append(f"{where}: 去掉了重复的释义")
+        if not isinstance(entry.get('meaning'), str):
+            errors.append(f"{where}: 缺少meaning")
+            continue
+        difficulty = entry.get('difficulty', 0)
+        if not isinstance(difficulty, int) or isinstance(difficulty, bool) or \
+                not 0 <= difficulty <= MAX_DIFFICULTY:
+            errors.append(f"{where}: 难度无效: {difficulty!r}")
+            continue
+        pronunciation = entry.get('pronunciation', {})
+        if not isinstance(pronunciation, dict):
+            errors.append(f"{where}: pronunciation必须是对象")
+            continue
+
+        # 出题时正确答案可能是前两个释义之一，干扰项的释义不能与它们或彼此相同
+        used = set(unique_meanings[:2])
+        normalized = dict(entry, meanings=unique_meanings)
+        valid = True
+        for key in ('options1', 'options2'):
+            options = []
+            for opt in entry.get(key, []):
+                if not isinstance(opt, dict) or not isinstance(opt.get('word'), str) or \
+                        not isinstance(opt.get('meaning'), str):
+                    warnings.append(f"{where}: {key}中的选项缺少word或meaning，已去掉: {opt!r}")
+                elif opt['word'] == word:
+                    warnings.append(f"{where}: {key}中的选项与单词本身相同，已去掉")
+                elif opt['meaning'] in used:
+                    warnings.append(f"{where}: {key}中的选项释义重复，已去掉: {opt['meaning']}")
+                else:
+                    used.add(opt['meaning'])
+                    options.append({'word': opt['word'], 'meaning': opt['meaning']})
+            if len(options) < MIN_OPTIONS:
+                errors.append(f"{where}: {key}只有{len(options)}个可用的干扰项，至少需要{MIN_OPTIONS}个")
+                valid = False
+            normalized[key] = options
+        if valid:
+            entries.append(normalized)
+    return entries, errors, warnings
+
+def _manifest_path(dst: str) -> str:
+    return os.path.splitext(dst)[0] + '.manifest.json'
+
+def _entry_hashes(vocabulary: List[dict]) -> Dict[str, str]:
+    """单词 -> 条目内容哈希"""
+    hashes = {}
+    for entry in vocabulary:
+        if isinstance(entry, dict) and isinstance(entry.get('word'), str):
+            data = json.dumps(entry, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            hashes.setdefault(entry['word'], hashlib.blake2b(data, digest_size=8).hexdigest())
+    return hashes
+
+def source_hash(source) -> str:
+    """词汇表源文件的内容哈希，source为文件内容或路径"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            source = f.read()
+    return hashlib.blake2b(source, digest_size=16).hexdigest()
+
+def compile_vocabulary(src: str = DEFAULT_JSON_PATH, dst: str = DEFAULT_BINARY_PATH,
+                       force: bool = False, verbose: bool = True) -> bool:
+    """校验JSON词汇表并编译为二进制文件，返回是否重新编译
+
+    编译产物旁边保存清单（源文件和每个条目的内容哈希）：源文件内容没有变化时
+    （即使修改时间变了）不会重新编译；变化时报告新增、修改和删除的单词。
+    校验出错时抛出VocabularyError，不会写入编译产物。
+    """
+    manifest_path = _manifest_path(dst)
+    manifest = None
+    if os.path.exists(dst) and os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != FORMAT_VERSION or manifest.get('min_options') != MIN_OPTIONS:
+            manifest = None  # 编译规则变了，旧产物不能沿用
+    if manifest and not force and os.path.getmtime(dst) >= os.path.getmtime(src):
+        return False
+
+    with open(src, 'rb') as f:
+        source = f.read()
+    digest = source_hash(source)
+    if manifest and not force and manifest.get('source_hash') == digest:
+        os.utime(dst)  # 内容没变，只更新时间，下次直接走快速路径
+        return False
+
+    vocabulary = json.loads(source)
+    entries, errors, warnings = check_vocabulary(vocabulary)
+    if verbose:
+        for warning in warnings:
+            print(f"警告: {warning}")
+    if errors:
+        raise VocabularyError(errors)
+
+    hashes = _entry_hashes(vocabulary)
+    if verbose and manifest:
+        old = manifest.get('entries', {})
+        added = sum(1 for word in hashes if word not in old)
+        changed = sum(1 for word, h in hashes.items() if word in old and old[word] != h)
+        removed = sum(1 for word in old if word not in hashes)
+        print(f"新增 {added} 个、修改 {changed} 个、删除 {removed} 个单词")
+
+    data = pack_vocabulary(entries)
+    tmp = f"{dst}.{os.getpid()}.tmp"  # 多个进程可能同时编译
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, dst)
+    tmp = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'format_version': FORMAT_VERSION, 'min_options': MIN_OPTIONS,
+                   'source_hash': digest, 'entries': hashes}, f, ensure_ascii=False)
+    os.replace(tmp, manifest_path)
+    if verbose:
+        print(f"已编译 {src} -> {dst}（{len(entries)} 个单词，{len(warnings)} 条警告）")
+    return True
+
+def load_checked(path: str = DEFAULT_JSON_PATH) -> List[dict]:
+    """读取并校验JSON词汇表（不写编译产物）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        entries, errors, _ = check_vocabulary(json.load(f))
+    if errors:
+        raise VocabularyError(errors)
+    return entries
+
+def load_vocabulary(path: str = DEFAULT_JSON_PATH) -> VocabularyStore:
+    """加载词汇表（不使用进程内缓存）
+
+    先确保旁边的.bin编译产物是最新且校验过的（需要时重新编译），再mmap加载；
+    目录不可写时退回在内存中校验和打包。
+    """
+    binary_path = os.path.splitext(path)[0] + '.bin'
+    try:
+        compile_vocabulary(path, binary_path, verbose=False)
+        return VocabularyStore.from_binary(binary_path)
+    except OSError:
+        return VocabularyStore.from_json(path)
+
+_stores: Dict[str, VocabularyStore] = {}
+
+def get_vocabulary(path: str = DEFAULT_JSON_PATH) -> VocabularyStore:
+    """获取进程内共享的词汇表，同一路径只加载一次"""
+    store = _stores.get(path)
+    if store is None:
+        store = load_vocabulary(path)
+        _stores[path] = store
+    return store
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="校验词汇表并编译为二进制文件")
+    parser.add_argument('src', nargs='?', default=DEFAULT_JSON_PATH, help="JSON词汇表")
+    parser.add_argument('dst', nargs='?', help="编译产物（默认与JSON同名的.bin）")
+    parser.add_argument('--force', action='store_true', help="内容没有变化也重新编译")
+    args = parser.parse_args()
+    dst = args.dst or os.path.splitext(args.src)[0] + '.bin'
+    try:
+        if not compile_vocabulary(args.src, dst, force=args.force):
+            print(f"{dst} 已是最新")
+    except VocabularyError as e:
+        print(e)
+        sys.exit(1)
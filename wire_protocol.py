@@ -0,0 +1,237 @@
+"""客户端与服务器之间的消息编码
+
+连接建立后客户端先发送JSON握手帧：
+    {"type": "hello", "version": 1, "name": "...", "encodings": ["compact+deflate", "compact", "json"]}
+服务器从中选出第一个支持的编码，用JSON回复：
+    {"type": "welcome", "version": 1, "encoding": "compact+deflate"}
+之后双方都使用协商出的编码。旧客户端第一帧直接发送名字字符串，默认使用JSON。
+"""
+from typing import Dict, List, Optional, Tuple, Union
+import json
+import struct
+import zlib
+
+PROTOCOL_VERSION = 1
+MAX_FRAME_SIZE = 1024 * 1024  # 解压后帧的长度上限，与websockets默认的max_size相同
+
+Frame = Union[str, bytes]
+
+# 常用字段名的短标签（编码为1字节整数键）
+FIELD_TAGS = [
+    'type', 'round', 'word', 'options', 'scores', 'multiplier', 'pronunciation',
+    'meaning', 'answer', 'time', 'is_correct', 'both_correct', 'winner',
+    'score_added', 'correct_answer', 'wrong_answer', 'is_last_round', 'winners',
+    'is_tie', 'reason', 'reset_game', 'players', 'player', 'room_id',
+    'total_rounds', 'answer_timeout', 'message', 'uk', 'us', 'name',
+]
+# 常用消息类型的短标签
+TYPE_TAGS = [
+    'new_round', 'round_result', 'answer', 'answer_feedback', 'game_over',
+    'players_update', 'player_ready', 'ready', 'game_start', 'game_config',
+    'room_joined', 'room_list', 'room_error', 'disconnect', 'name_taken',
+]
+
+class Codec:
+    """消息编解码器"""
+    name = ''
+
+    def encode(self, message: dict) -> Frame:
+        raise NotImplementedError
+
+    def decode(self, frame: Frame) -> dict:
+        raise NotImplementedError
+
+class JsonCodec(Codec):
+    name = 'json'
+
+    def encode(self, message: dict) -> Frame:
+        return json.dumps(message)
+
+    def decode(self, frame: Frame) -> dict:
+        return json.loads(frame)
+
+class CompactCodec(Codec):
+    """紧凑二进制编码：CBOR子集 + 字段短标签，可选deflate压缩
+
+    帧的第一个字节为标志位：0表示未压缩，1表示deflate压缩。
+    """
+    def __init__(self, deflate: bool = False, min_deflate_size: int = 128):
+        self.deflate = deflate
+        self.min_deflate_size = min_deflate_size
+        self.name = 'compact+deflate' if deflate else 'compact'
+
+    def encode(self, message: dict) -> Frame:
+        out = bytearray()
+        _encode_item(out, message, top_level=True)
+        if self.deflate and len(out) >= self.min_deflate_size:
+            compressor = zlib.compressobj(wbits=-15)
+            return b'\x01' + compressor.compress(out) + compressor.flush()
+        return b'\x00' + out
+
+    def decode(self, frame: Frame) -> dict:
+        if isinstance(frame, str):
+            raise ValueError("紧凑编码只接受二进制帧")
+        data = frame[1:]
+        if frame[:1] == b'\x01':
+            # 限制解压后的长度：客户端的帧不可信，少量数据可能解压出数百MB
+            decompressor = zlib.decompressobj(wbits=-15)
+            try:
+                data = decompressor.decompress(data, MAX_FRAME_SIZE)
+            except zlib.error as e:
+                raise ValueError(f"无法解压的帧: {e}")
+            if decompressor.unconsumed_tail or not decompressor.eof:
+                raise ValueError(f"帧解压后超过 {MAX_FRAME_SIZE} 字节或不完整")
+        value, pos = _decode_item(memoryview(data), 0, top_level=True)
+        if pos != len(data):
+            raise ValueError("帧末尾有多余数据")
+        return value
+
+_FIELD_IDS = {name: i for i, name in enumerate(FIELD_TAGS)}
+_TYPE_IDS = {name: i for i, name in enumerate(TYPE_TAGS)}
+_FLOAT64 = struct.Struct('>d')
+
+def _encode_head(out: bytearray, major: int, value: int):
+    if value < 24:
+        out.append(major << 5 | value)
+    elif value < 0x100:
+        out += bytes((major << 5 | 24, value))
+    elif value < 0x10000:
+        out.append(major << 5 | 25)
+        out += value.to_bytes(2, 'big')
+    elif value < 0x100000000:
+        out.append(major << 5 | 26)
+        out += value.to_bytes(4, 'big')
+    else:
+        out.append(major << 5 | 27)
+        out += value.to_bytes(8, 'big')
+
+def _encode_item(out: bytearray, value, top_level: bool = False):
+    if value is None:
+        out.append(0xf6)
+    elif value is True:
+        out.append(0xf5)
+    elif value is False:
+        out.append(0xf4)
+    elif isinstance(value, int):
+        if value >= 0:
+            _encode_head(out, 0, value)
+        else:
+            _encode_head(out, 1, -1 - value)
+    elif isinstance(value, float):
+        out.append(0xfb)
+        out += _FLOAT64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        _encode_head(out, 3, len(data))
+        out += data
+    elif isinstance(value, bytes):
+        _encode_head(out, 2, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        _encode_head(out, 4, len(value))
+        for item in value:
+            _encode_item(out, item)
+    elif isinstance(value, dict):
+        _encode_head(out, 5, len(value))
+        for key, item in value.items():
+            # 已知字段名编码为整数标签，其他键（如玩家名）保持字符串
+            tag = _FIELD_IDS.get(key)
+            if tag is None:
+                _encode_item(out, key)
+            else:
+                _encode_head(out, 0, tag)
+            if top_level and key == 'type' and item in _TYPE_IDS:
+                _encode_head(out, 0, _TYPE_IDS[item])
+            else:
+                _encode_item(out, item)
+    else:
+        raise TypeError(f"无法编码的类型: {type(value).__name__}")
+
+def _decode_head(data: memoryview, pos: int) -> Tuple[int, int, int]:
+    initial = data[pos]
+    major, info = initial >> 5, initial & 0x1f
+    pos += 1
+    if info < 24:
+        return major, info, pos
+    if info in (24, 25, 26, 27):
+        size = 1 << (info - 24)
+        return major, int.from_bytes(data[pos:pos + size], 'big'), pos + size
+    if major == 7:
+        return major, info, pos
+    raise ValueError("不支持的编码")
+
+def _decode_item(data: memoryview, pos: int, top_level: bool = False):
+    if data[pos] == 0xfb:
+        return _FLOAT64.unpack_from(data, pos + 1)[0], pos + 9
+    major, value, pos = _decode_head(data, pos)
+    if major == 0:
+        return value, pos
+    if major == 1:
+        return -1 - value, pos
+    if major == 2:
+        return bytes(data[pos:pos + value]), pos + value
+    if major == 3:
+        return str(data[pos:pos + value], 'utf-8'), pos + value
+    if major == 4:
+        items = []
+        for _ in range(value):
+            item, pos = _decode_item(data, pos)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        result = {}
+        for _ in range(value):
+            key, pos = _decode_item(data, pos)
+            if isinstance(key, int):
+                key = FIELD_TAGS[key]
+            item, pos = _decode_item(data, pos)
+            if top_level and key == 'type' and isinstance(item, int):
+                item = TYPE_TAGS[item]
+            result[key] = item
+        return result, pos
+    if major == 7:
+        simple = {20: False, 21: True, 22: None}
+        if value in simple:
+            return simple[value], pos
+    raise ValueError("不支持的编码")
+
+JSON = JsonCodec()
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (
+    CompactCodec(deflate=True), CompactCodec(), JSON
+)}
+SUPPORTED_ENCODINGS = list(CODECS)
+
+def negotiate(encodings: List[str]) -> Codec:
+    """按客户端的偏好顺序选出第一个支持的编码"""
+    for name in encodings:
+        if name in CODECS:
+            return CODECS[name]
+    return JSON
+
+def parse_hello(frame: Frame) -> Tuple[str, Codec, Optional[dict]]:
+    """解析连接的第一帧，返回(名字, 编码, 握手消息)；旧客户端直接发送名字"""
+    if isinstance(frame, str) and frame.startswith('{'):
+        try:
+            hello = json.loads(frame)
+        except ValueError:
+            hello = None
+        if isinstance(hello, dict) and hello.get('type') == 'hello':
+            return str(hello.get('name', '')), negotiate(hello.get('encodings', [])), hello
+    if isinstance(frame, bytes):
+        frame = frame.decode('utf-8', 'replace')
+    return frame, JSON, None
+
+class EncodedMessage:
+    """同一条消息按编码各序列化一次，供广播时复用"""
+    __slots__ = ('message', '_frames')
+
+    def __init__(self, message: dict):
+        self.message = message
+        self._frames: Dict[str, Frame] = {}
+
+    def frame(self, codec: Codec) -> Frame:
+        frame = self._frames.get(codec.name)
+        if frame is None:
+            frame = codec.encode(self.message)
+            self._frames[codec.name] = frame
+        return frame
@@ -0,0 +1,263 @@
+"""无界面的机器人客户端，用于压力测试服务器
+
+用法：
+    python word_pk_bot.py --bots 100 --accuracy 0.8 --min-delay 300 --max-delay 2000
+
+--drop-rate 让机器人每轮以该概率直接断开连接（不发送关闭帧），再凭会话令牌重连回座位，
+用于测试断线重连。
+
+--tournament 让机器人报名参加指定的锦标赛（由tournament_host.py创建），
+此后的对局由服务器安排，锦标赛结束时退出。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+import argparse
+import asyncio
+import json
+import random
+import time
+import websockets
+from vocabulary_store import get_vocabulary
+from wire_protocol import CODECS, JSON, PROTOCOL_VERSION
+
+class Config:
+    DEFAULT_HOST = 'localhost'
+    DEFAULT_PORT = 8766
+    ACCURACY = 0.8  # 答对的概率
+    MIN_DELAY = 300  # 最短答题用时（毫秒）
+    MAX_DELAY = 2000  # 最长答题用时（毫秒）
+    DROP_RATE = 0.0  # 每轮直接断开连接的概率
+    RECONNECT_DELAY = 0.5  # 断开后等待多久重连（秒）
+    MAX_RECONNECTS = 3  # 连续重连失败超过该次数放弃
+
+@dataclass
+class BotStats:
+    """单个机器人的统计数据"""
+    games: int = 0
+    rounds: int = 0
+    wins: int = 0
+    round_latencies: List[float] = field(default_factory=list)  # new_round到round_result的间隔（毫秒）
+    errors: int = 0
+    drops: int = 0  # 主动断开的次数
+    resumes: int = 0  # 重连回座位的次数
+    standing: Optional[dict] = None  # 锦标赛结束时本人的排名
+
+class BotClient:
+    """与WordPKClient使用相同协议的机器人：发送名字和准备，按配置的正确率和延迟答题"""
+    def __init__(self, name: str, host: str = Config.DEFAULT_HOST, port: int = Config.DEFAULT_PORT,
+                 accuracy: float = Config.ACCURACY, min_delay: int = Config.MIN_DELAY,
+                 max_delay: int = Config.MAX_DELAY, games: int = 1,
+                 encoding: Optional[str] = None, drop_rate: float = Config.DROP_RATE,
+                 tournament: Optional[str] = None):
+        self.name = name
+        self.url = f'ws://{host}:{port}'
+        self.accuracy = accuracy
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.games = games
+        self.tournament = tournament  # 参加的锦标赛编号
+        # None表示像旧客户端一样直接发送名字（报名锦标赛需要握手消息，默认用JSON）
+        self.encoding = encoding or ('json' if tournament else None)
+        self.drop_rate = drop_rate
+        self.codec = JSON
+        self.session: Optional[str] = None  # 本局的会话令牌，对局外为None
+        self.stats = BotStats()
+        self.meanings = word_meanings()
+        self._round_started = 0.0
+        self._answer_task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        resume = None
+        failures = 0  # 连续失败的次数
+        try:
+            while True:
+                try:
+                    async with websockets.connect(self.url) as websocket:
+                        await self.handshake(websocket, resume)
+                        failures = 0
+                        async for raw_message in websocket:
+                            if await self.handle_message(websocket, self.codec.decode(raw_message)):
+                                return
+                    return
+                except (OSError, websockets.exceptions.WebSocketException):
+                    failures += 1
+                    if self.session is None or self.encoding is None or failures > Config.MAX_RECONNECTS:
+                        self.stats.errors += 1
+                        return
+                # 对局中连接意外断开：凭会话令牌重连回座位
+                if self._answer_task:
+                    self._answer_task.cancel()
+                resume = self.session
+                await asyncio.sleep(Config.RECONNECT_DELAY)
+        finally:
+            if self._answer_task:
+                self._answer_task.cancel()
+
+    async def handshake(self, websocket, resume: Optional[str] = None):
+        if self.encoding is None:
+            await websocket.send(self.name)
+            return
+        hello = {
+            'type': 'hello',
+            'version': PROTOCOL_VERSION,
+            'name': self.name,
+            'encodings': [self.encoding]
+        }
+        if resume:
+            hello['resume'] = resume
+        if self.tournament:
+            # 重连回座位失败时按此重新加入锦标赛
+            hello['tournament'] = self.tournament
+        await websocket.send(json.dumps(hello))
+        welcome = json.loads(await websocket.recv())
+        self.codec = CODECS.get(welcome.get('encoding'), JSON)
+
+    async def send_message(self, websocket, message: dict):
+        await websocket.send(self.codec.encode(message))
+
+    async def handle_message(self, websocket, message: dict) -> bool:
+        """处理一条服务器消息，返回True表示机器人结束"""
+        message_type = message['type']
+
+        if message_type == 'name_taken':
+            self.stats.errors += 1
+            return True
+
+        elif message_type == 'room_error' and self.tournament:
+            # 报名锦标赛失败
+            self.stats.errors += 1
+            return True
+
+        elif message_type == 'tournament_update':
+            if message['state'] == 'finished':
+                self.stats.standing = message.get('you')
+                await self.send_message(websocket, {'type': 'disconnect'})
+                return True
+
+        elif message_type == 'game_config':
+            if 'session' in message:
+                self.session = message['session']
+
+        elif message_type == 'resume_state':
+            self.stats.resumes += 1
+            if not message['in_progress']:
+                # 断开期间对局已经结束
+                self.session = None
+                return await self.finish_game(websocket)
+            # 本轮还没答题时继续答题
+            if message.get('question') and message.get('answer') is None:
+                self._round_started = time.perf_counter()
+                self._answer_task = asyncio.create_task(self.answer(websocket, message['question']))
+
+        elif message_type == 'resume_failed':
+            # 断开期间对局已经结束，服务器会重新为机器人配对
+            self.session = None
+            return await self.finish_game(websocket)
+
+        elif message_type == 'players_update':
+            if len(message['players']) == 2:
+                await self.send_message(websocket, {'type': 'ready'})
+
+        elif message_type == 'new_round':
+            if self.session and random.random() < self.drop_rate:
+                # 模拟网络中断：不发送关闭帧直接断开，之后凭会话令牌重连
+                self.stats.drops += 1
+                websocket.transport.abort()
+                return False
+            self._round_started = time.perf_counter()
+            self._answer_task = asyncio.create_task(self.answer(websocket, message))
+
+        elif message_type == 'round_result':
+            self.stats.rounds += 1
+            self.stats.round_latencies.append((time.perf_counter() - self._round_started) * 1000)
+
+        elif message_type == 'game_over':
+            self.session = None
+            if 'reason' in message:
+                # 对手断开，等待新的对手
+                return False
+            if self.name in message.get('winners', []) and not message.get('is_tie'):
+                self.stats.wins += 1
+            return await self.finish_game(websocket)
+
+        return False
+
+    async def finish_game(self, websocket) -> bool:
+        """一局结束：达到设定的局数时退出，否则准备下一局"""
+        self.stats.games += 1
+        if self.tournament:
+            return False  # 锦标赛的下一场由服务器安排
+        if self.stats.games >= self.games:
+            await self.send_message(websocket, {'type': 'disconnect'})
+            return True
+        await self.send_message(websocket, {'type': 'ready'})
+        return False
+
+    async def answer(self, websocket, message: dict):
+        delay = random.uniform(self.min_delay, self.max_delay)
+        await asyncio.sleep(delay / 1000)
+        correct = [opt for opt in message['options'] if opt in self.meanings.get(message['word'], ())]
+        wrong = [opt for opt in message['options'] if opt not in correct]
+        if correct and (random.random() < self.accuracy or not wrong):
+            answer = correct[0]
+        else:
+            answer = random.choice(wrong)
+        try:
+            await self.send_message(websocket, {
+                'type': 'answer',
+                'answer': answer,
+                'time': int(delay)
+            })
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+_word_meanings: Dict[str, Set[str]] = {}
+
+def word_meanings() -> Dict[str, Set[str]]:
+    """单词 -> 可作为正确答案的释义，所有机器人共享"""
+    if not _word_meanings:
+        for entry in get_vocabulary():
+            _word_meanings.setdefault(entry.word, set()).update(entry.meanings)
+    return _word_meanings
+
+async def run_bots(count: int, connect_rate: float = 200.0, **kwargs) -> List[BotClient]:
+    """启动count个机器人（每秒最多连接connect_rate个），等待全部结束"""
+    bots = [BotClient(f"bot{i}", **kwargs) for i in range(count)]
+    tasks = []
+    for bot in bots:
+        tasks.append(asyncio.create_task(bot.run()))
+        await asyncio.sleep(1 / connect_rate)
+    await asyncio.gather(*tasks)
+    return bots
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="单词PK机器人客户端")
+    parser.add_argument('--host', default=Config.DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=Config.DEFAULT_PORT)
+    parser.add_argument('--bots', type=int, default=2, help="机器人数量")
+    parser.add_argument('--games', type=int, default=1, help="每个机器人进行的对局数")
+    parser.add_argument('--accuracy', type=float, default=Config.ACCURACY)
+    parser.add_argument('--min-delay', type=int, default=Config.MIN_DELAY)
+    parser.add_argument('--max-delay', type=int, default=Config.MAX_DELAY)
+    parser.add_argument('--encoding', choices=list(CODECS), default=None)
+    parser.add_argument('--drop-rate', type=float, default=Config.DROP_RATE,
+                        help="每轮直接断开连接再重连的概率（需要--encoding）")
+    parser.add_argument('--tournament', default=None,
+                        help="报名参加的锦标赛编号，对局由服务器安排，锦标赛结束时退出")
+    args = parser.parse_args()
+    bots = asyncio.run(run_bots(
+        args.bots, host=args.host, port=args.port, games=args.games,
+        accuracy=args.accuracy, min_delay=args.min_delay, max_delay=args.max_delay,
+        encoding=args.encoding, drop_rate=args.drop_rate, tournament=args.tournament))
+    games = sum(bot.stats.games for bot in bots) // 2
+    errors = sum(bot.stats.errors for bot in bots)
+    print(f"完成对局 {games} 场，错误 {errors} 次")
+    if args.tournament:
+        standings = sorted((bot.stats.standing for bot in bots if bot.stats.standing),
+                           key=lambda row: row['rank'])
+        if standings:
+            print(f"锦标赛结束：{len(standings)} 个机器人收到最终排名，"
+                  f"最好名次 {standings[0]['rank']}（{standings[0]['name']}）")
+    if args.drop_rate:
+        print(f"断开 {sum(bot.stats.drops for bot in bots)} 次，"
+              f"重连回座位 {sum(bot.stats.resumes for bot in bots)} 次")
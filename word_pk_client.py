@@ -1,15 +1,23 @@
 import asyncio
+import concurrent.futures
 import json
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox
 import websockets
-from typing import Optional
+from typing import Callable, Coroutine, Optional
 import time
+from wire_protocol import JSON, PROTOCOL_VERSION, SUPPORTED_ENCODINGS, CODECS
 
 class Config:
     # 网络配置
     DEFAULT_HOST = 'localhost'
     DEFAULT_PORT = 8766
+    ENCODINGS = SUPPORTED_ENCODINGS  # 按偏好顺序提供给服务器的消息编码
+    RECONNECT_DELAY = 1.0  # 对局中连接断开后等待多久重连（秒）
+    MAX_RECONNECTS = 5  # 连续重连失败超过该次数放弃
+    EVENT_POLL_INTERVAL = 10  # 界面线程检查网络事件队列的间隔（毫秒）
     
     # UI配置
     WINDOW_SIZE = "1024x768"
@@ -18,11 +26,41 @@ class Config:
     INFO_FONT = ("SimSun", 14)
     RESULT_FONT = ("SimSun", 56, "bold")
     
-    # 显示延迟（秒）
+    # 显示延迟（秒），与服务器的GAME_START_DELAY、RESULT_DISPLAY_DELAY一致，服务器等待同样的时间后才发出题目
     GAME_START_DELAY = 0.3  # 游戏开始提示显示时间
     NEW_ROUND_DELAY = 0.8  # 新回合开始前的延迟
     RESULT_DISPLAY_DELAY = 0.8  # 显示答题结果的延迟
 
+class NetworkThread:
+    """在独立线程中运行asyncio事件循环，负责与服务器的全部网络I/O
+
+    收到的事件连同接收时刻放入线程安全队列，由界面线程用root.after定时取出。
+    网络线程不调用任何Tk接口：Tcl未以线程模式编译时，从其他线程调用Tk会出错或死锁。
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.events: queue.Queue = queue.Queue()  # (事件类型, 内容, 接收时刻)
+        self._thread = threading.Thread(target=self._run, name='network', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """界面线程调用：在网络线程中执行协程"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def post(self, kind: str, payload=None, received_at: Optional[float] = None):
+        """网络线程调用：把事件交给界面线程"""
+        if received_at is None:
+            received_at = time.monotonic()
+        self.events.put((kind, payload, received_at))
+    
+    def stop(self, timeout: float = 1.0):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
 class WordPKClient:
     def __init__(self, root):
         self.root = root
@@ -40,7 +78,16 @@ class WordPKClient:
         
         # WebSocket连接
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
+        self.codec = JSON  # 与服务器协商出的消息编码
         self.name = ""
+        self.server = None  # (host, port)，重连时使用
+        self.session = None  # 本局的会话令牌（随game_config下发），掉线后凭它重连回座位
+        self.reconnects = 0  # 连续重连的次数
+        
+        # 网络线程，收到的消息经队列交给界面线程
+        self.network = NetworkThread()
+        self.events_paused = False  # 正在展示提示或结果时暂缓处理后续消息
+        self.root.after(0, self.poll_events)
         
         # 游戏状态
         self.game_started = False
@@ -204,11 +251,12 @@ class WordPKClient:
         self.save_config()
         
         # 启动WebSocket连接
-        asyncio.create_task(self.connect_to_server())
+        self.server = (self.host_entry.get().strip(), port)
+        self.network.submit(self.connect_to_server(*self.server))
     
     def ready(self):
         if self.websocket:
-            asyncio.create_task(self.send_message({
+            self.network.submit(self.send_message({
                 'type': 'ready'
             }))
             self.ready_button.config(state='disabled')
@@ -217,7 +265,7 @@ class WordPKClient:
         if self.websocket and self.game_started and self.can_answer:
             # 计算答题用时（毫秒）
             answer_time = min(
-                int((time.time() - self.question_start_time) * 1000), 
+                int((time.monotonic() - self.question_start_time) * 1000), 
                 self.answer_timeout
             )
             
@@ -229,7 +277,7 @@ class WordPKClient:
             # 设置不可答题
             self.can_answer = False
             
-            asyncio.create_task(self.send_message({
+            self.network.submit(self.send_message({
                 'type': 'answer',
                 'answer': self.option_buttons[index].cget('text')[3:],
                 'time': answer_time
@@ -241,7 +289,7 @@ class WordPKClient:
     def timeout_answer(self):
         """处理答题超时"""
         if self.websocket and self.game_started:
-            asyncio.create_task(self.send_message({
+            self.network.submit(self.send_message({
                 'type': 'answer',
                 'answer': '',  # 空答案表示超时
                 'time': self.answer_timeout
@@ -251,22 +299,49 @@ class WordPKClient:
                 btn.config(state='disabled')
             self.status_label.config(text="答题超时！")
     
-    async def connect_to_server(self):
+    def reconnect(self):
+        """对局中连接断开：凭会话令牌重连回座位"""
+        if not self.running or self.session is None:
+            return
+        self.reconnects += 1
+        if self.reconnects > Config.MAX_RECONNECTS:
+            self.word_label.config(text="连接已断开", font=self.result_font)
+            self.status_label.config(text="无法重新连接到服务器")
+            return
+        self.status_label.config(text=f"连接中断，正在重连（第 {self.reconnects} 次）...")
+        self.network.submit(self.connect_to_server(*self.server, resume=self.session))
+    
+    async def connect_to_server(self, host: str, port: int, resume: Optional[str] = None):
+        """在网络线程中运行：连接服务器并开始接收消息；resume为重连时的会话令牌"""
         try:
-            host = self.host_entry.get().strip()
-            port = int(self.port_entry.get().strip())
             self.websocket = await websockets.connect(f'ws://{host}:{port}')
-            await self.websocket.send(self.name)
+            # 握手：发送名字和支持的编码，服务器选定编码后回复welcome
+            hello = {
+                'type': 'hello',
+                'version': PROTOCOL_VERSION,
+                'name': self.name,
+                'encodings': self.config.get('encodings', Config.ENCODINGS)
+            }
+            if resume:
+                hello['resume'] = resume
+            await self.websocket.send(json.dumps(hello))
+            welcome = json.loads(await self.websocket.recv())
+            self.codec = CODECS.get(welcome.get('encoding'), JSON)
             asyncio.create_task(self.receive_messages())
         except Exception as e:
-            self.login_error_label.config(text=str(e))
+            self.network.post('reconnect_error' if resume else 'connect_error', str(e))
             if self.websocket:
                 await self.websocket.close()
                 self.websocket = None
     
+    async def close_connection(self):
+        if self.websocket:
+            await self.websocket.close()
+            self.websocket = None
+    
     async def send_message(self, message: dict):
         if self.websocket:
-            await self.websocket.send(json.dumps(message))
+            await self.websocket.send(self.codec.encode(message))
     
     def get_player_display_name(self, player_name):
         """获取玩家显示名称"""
@@ -275,230 +350,327 @@ class WordPKClient:
         return "对方"
     
     async def receive_messages(self):
+        """在网络线程中运行：接收消息并记录到达时刻，交给界面线程处理"""
+        websocket = self.websocket
         try:
-            while True:
-                raw_message = await self.websocket.recv()
-                message = json.loads(raw_message)
-                message_type = message['type']
-                
-                if message_type == 'name_taken':
-                    self.login_error_label.config(text=message['message'])
-                    await self.websocket.close()
-                    self.websocket = None
-                    return
-                
-                elif message_type == 'game_config':
-                    # 保存总回合数和答题时间限制
-                    self.total_rounds = message['total_rounds']
-                    self.answer_timeout = message['answer_timeout']
-                
-                elif message_type == 'players_update':
-                    # 更新对手名字
-                    old_opponent = self.opponent_name
-                    other_players = [name for name in message['players'] if name != self.name]
-                    self.opponent_name = other_players[0] if other_players else None
-                    
-                    # 显示玩家名字
-                    if len(message['players']) == 2:
-                        self.players_label.config(
-                            text=f"{self.name} (你) vs {self.opponent_name}"
-                        )
-                        if not old_opponent and self.opponent_name:
-                            self.status_label.config(text=f"{self.opponent_name} 加入了游戏")
-                            # 重置游戏相关状态，准备新游戏
-                            self.game_started = False
-                            self.can_answer = False
-                            self.ready_button.config(state='normal')
-                            # 清空选项按钮
-                            for btn in self.option_buttons:
-                                btn.config(text="", state='normal', bg='SystemButtonFace')
-                    else:
-                        self.players_label.config(text="等待玩家加入...")
-                        if old_opponent:
-                            self.status_label.config(text=f"{old_opponent} 断开了连接")
-                    
-                    # 连接成功，切换到游戏界面
-                    if self.login_frame.winfo_ismapped():
-                        self.login_frame.pack_forget()
-                        self.game_frame.pack(expand=True, fill='both')
-                
-                elif message_type == 'player_ready':
-                    player_display = self.get_player_display_name(message['player'])
-                    self.status_label.config(
-                        text=f"{player_display} 已准备"
-                    )
-                
-                elif message_type == 'game_start':
-                    self.game_started = True
-                    self.word_label.config(text="游戏开始！", font=self.result_font)
-                    self.status_label.config(text="游戏开始！")
-                    # 等待一段时间后清除"游戏开始"提示
-                    await asyncio.sleep(Config.GAME_START_DELAY)
-                    if not self.running:  # 如果程序正在退出，不再更新UI
-                        return
-                    self.word_label.config(text="", font=self.word_font)
-                
-                elif message_type == 'answer_feedback':
-                    # 立即显示答题结果
-                    selected_answer = message['answer']
-                    is_correct = message['is_correct']
-                    
-                    # 只标记选中的答案
-                    for btn in self.option_buttons:
-                        if btn.cget('text')[3:] == selected_answer:
-                            btn.config(bg="light green" if is_correct else "pink")
-                            break
-                
-                elif message_type == 'round_result':
-                    if not self.running:  # 如果程序正在退出，不再更新UI
-                        return
-                    # 取消超时定时器
+            async for raw_message in websocket:
+                received_at = time.monotonic()
+                self.network.post('message', self.codec.decode(raw_message), received_at)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            self.network.post('error', str(e))
+            return
+        self.network.post('closed')
+    
+    def poll_events(self):
+        """在界面线程中定时取出网络事件"""
+        if not self.running:
+            return
+        self.drain_events()
+        self.root.after(Config.EVENT_POLL_INTERVAL, self.poll_events)
+    
+    def drain_events(self):
+        """在界面线程中取出网络事件并处理，暂停期间留在队列中"""
+        while self.running and not self.events_paused:
+            try:
+                kind, payload, received_at = self.network.events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == 'message':
+                self.handle_message(payload, received_at)
+            elif kind == 'connect_error':
+                self.login_error_label.config(text=payload)
+            elif kind == 'reconnect_error':
+                self.root.after(int(Config.RECONNECT_DELAY * 1000), self.reconnect)
+            elif kind == 'closed':
+                self.websocket = None
+                if self.session is not None:
+                    # 对局中断线，稍后凭会话令牌重连
+                    self.can_answer = False
+                    self.status_label.config(text="连接中断，正在重连...")
+                    self.root.after(int(Config.RECONNECT_DELAY * 1000), self.reconnect)
+                elif self.game_frame.winfo_ismapped():
+                    self.word_label.config(text="连接已断开", font=self.result_font)
+                    self.status_label.config(text="与服务器的连接已断开")
+            elif kind == 'error':
+                self.websocket = None
+                if self.game_frame.winfo_ismapped():
+                    self.word_label.config(text="发生错误", font=self.result_font)
+                    self.status_label.config(text=f"错误：{payload}")
+    
+    def pause_events(self, delay: float, on_resume: Optional[Callable] = None):
+        """展示提示期间暂缓处理后续消息，delay秒后先调用on_resume再继续"""
+        self.events_paused = True
+        self.root.after(int(delay * 1000), lambda: self.resume_events(on_resume))
+    
+    def resume_events(self, on_resume: Optional[Callable] = None):
+        if on_resume:
+            on_resume()
+        self.events_paused = False
+        self.drain_events()
+    
+    def show_question(self, question: dict, scores: dict, started_at: float):
+        """显示一轮的题目、比分并开始计时，started_at为本轮开始的时刻（time.monotonic）"""
+        # 设置可以答题
+        self.can_answer = True
+        
+        # 显示新的单词和选项
+        self.word_label.config(text=question['word'], font=self.word_font)
+        
+        # 显示音标（根据配置选择英式或美式）
+        pron_type = self.config.get('pronunciation_type', 'uk')
+        pronunciation = question['pronunciation'][pron_type]
+        self.pronunciation_label.config(text=f"/{pronunciation}/")
+        
+        # 更新上一个单词的显示
+        if hasattr(self, 'last_word') and hasattr(self, 'last_meaning'):
+            self.last_word_label.config(text=f"上一题：{self.last_word} - {self.last_meaning}")
+        
+        # 保存当前单词信息用于下一轮显示
+        self.last_word = question['word']
+        self.last_meaning = question['meaning']
+        
+        # 显示选项
+        for i, option in enumerate(question['options']):
+            self.option_buttons[i].config(
+                text=f"{i+1}. {option}",
+                state='normal',
+                bg='SystemButtonFace'
+            )
+        
+        # 显示回合数和倍数信息
+        round_text = f"第 {question['round']}/{self.total_rounds} 轮"
+        if question.get('multiplier', 1.0) > 1:
+            round_text += f" (得分×{question['multiplier']})"
+        self.status_label.config(text=round_text)
+        
+        # 更新比分
+        scores_text = f"{self.name}: {scores[self.name]}分 vs {self.opponent_name}: {scores[self.opponent_name]}分"
+        self.score_label.config(text=scores_text)
+        
+        # 从本轮开始的时刻计时，而不是界面处理的时刻
+        if self.answer_timer:
+            self.root.after_cancel(self.answer_timer)
+        self.question_start_time = started_at
+        remaining = self.answer_timeout - int((time.monotonic() - started_at) * 1000)
+        self.answer_timer = self.root.after(max(remaining, 0), self.timeout_answer)
+    
+    def handle_message(self, message: dict, received_at: float):
+        """处理一条服务器消息，received_at为网络线程收到消息的时刻（time.monotonic）
+
+        received_at用于重连后恢复计时（resume_state中的剩余时间从服务器发出时算起）；
+        新一轮的题目则从显示的时刻计时，见new_round。
+        """
+        message_type = message['type']
+        
+        if message_type == 'name_taken':
+            self.login_error_label.config(text=message['message'])
+            self.network.submit(self.close_connection())
+        
+        elif message_type == 'game_config':
+            # 保存总回合数和答题时间限制
+            self.total_rounds = message['total_rounds']
+            self.answer_timeout = message['answer_timeout']
+            if 'session' in message:
+                self.session = message['session']
+        
+        elif message_type == 'resume_state':
+            # 重连成功，按服务器发来的状态恢复对局
+            self.reconnects = 0
+            self.total_rounds = message['total_rounds']
+            self.answer_timeout = message['answer_timeout']
+            other_players = [name for name in message['players'] if name != self.name]
+            self.opponent_name = other_players[0] if other_players else None
+            self.game_started = message['in_progress']
+            if self.opponent_name:
+                self.players_label.config(text=f"{self.name} (你) vs {self.opponent_name}")
+            question = message.get('question')
+            if question:
+                # 按剩余时间倒推本轮开始的时刻，答题用时和超时都据此计算
+                started_at = received_at - (self.answer_timeout - message['remaining']) / 1000
+                self.show_question(question, message['scores'], started_at)
+                if message['answer'] is not None:
+                    # 断线前已经答过本轮
+                    self.can_answer = False
                     if self.answer_timer:
                         self.root.after_cancel(self.answer_timer)
                         self.answer_timer = None
-                        
-                    result_text = ""
-                    if message['both_correct']:
-                        if message['winner']:
-                            if message['winner'] == self.name:
-                                result_text = f"你更快！(+{message['score_added']}分)"
-                            else:
-                                result_text = f"对方更快！(对方+{message['score_added']}分)"
-                        else:
-                            result_text = "双方用时相同，均不得分"
-                    elif message['winner']:
-                        if message['winner'] == self.name:
-                            result_text = f"答对了！(+{message['score_added']}分)"
-                        else:
-                            result_text = f"对方答对了！(对方+{message['score_added']}分)"
-                    else:
-                        result_text = f"双方都答错了！正确答案是：{message['correct_answer']}"
-                    
-                    self.status_label.config(text=result_text)
-                    
-                    # 显示正确答案
                     for btn in self.option_buttons:
-                        if btn.cget('text')[3:] == message['correct_answer']:
-                            btn.config(bg="light green")
-                            break
-                    
-                    # 更新上一题信息
-                    self.last_word_label.config(
-                        text=f"上一题：{message['word']}"
-                    )
-                    
-                    # 等待显示结果
-                    await asyncio.sleep(Config.RESULT_DISPLAY_DELAY)
-                
-                elif message_type == 'new_round':
-                    # 设置可以答题
-                    self.can_answer = True
-                    
-                    # 显示新的单词和选项
-                    self.word_label.config(text=message['word'], font=self.word_font)
-                    
-                    # 显示音标（根据配置选择英式或美式）
-                    pron_type = self.config.get('pronunciation_type', 'uk')
-                    pronunciation = message['pronunciation'][pron_type]
-                    self.pronunciation_label.config(text=f"/{pronunciation}/")
-                    
-                    # 更新上一个单词的显示
-                    if hasattr(self, 'last_word') and hasattr(self, 'last_meaning'):
-                        self.last_word_label.config(text=f"上一题：{self.last_word} - {self.last_meaning}")
-                    
-                    # 保存当前单词信息用于下一轮显示
-                    self.last_word = message['word']
-                    self.last_meaning = message['meaning']
-                    
-                    # 显示选项
-                    for i, option in enumerate(message['options']):
-                        self.option_buttons[i].config(
-                            text=f"{i+1}. {option}",
-                            state='normal',
-                            bg='SystemButtonFace'
-                        )
-                    
-                    # 显示回合数和倍数信息
-                    round_text = f"第 {message['round']}/{self.total_rounds} 轮"
-                    if message.get('multiplier', 1.0) > 1:
-                        round_text += f" (得分×{message['multiplier']})"
-                    self.status_label.config(text=round_text)
-                    
-                    # 更新比分
-                    scores = message['scores']
-                    scores_text = f"{self.name}: {scores[self.name]}分 vs {self.opponent_name}: {scores[self.opponent_name]}分"
-                    self.score_label.config(text=scores_text)
-                    
-                    # 记录开始时间并设置超时
-                    self.question_start_time = time.time()
-                    self.answer_timer = self.root.after(self.answer_timeout, self.timeout_answer)
-                
-                elif message_type == 'wrong_answer':
-                    if not self.running:  # 如果程序正在退出，不再更新UI
-                        return
-                    if message['player'] == self.name:
-                        self.status_label.config(text="回答错误！")
-                
-                elif message_type == 'game_over':
-                    if not self.running:  # 如果程序正在退出，不再更新UI
-                        return
-                    scores = message['scores']
-                    
-                    # 检查是否因为对手断开连接而结束
-                    if 'reason' in message:
-                        was_game_in_progress = self.game_started  # 保存当前游戏状态
-                        if was_game_in_progress:  # 只在游戏已开始时显示"游戏结束"
-                            self.word_label.config(text="游戏结束", font=self.result_font)
-                            self.status_label.config(text=message['reason'])
-                        else:
-                            self.word_label.config(text="")
-                            # 如果游戏还没开始，就不显示"游戏结束"字样
-                            self.status_label.config(text=f"玩家 {self.opponent_name} 断开了连接")
-                        # 重置游戏状态
-                        self.reset_game_state()
-                        continue  # 继续等待新消息
-                    
-                    # 正常游戏结束时重置状态
+                        btn.config(state='disabled')
+                        if btn.cget('text')[3:] == message['answer']:
+                            btn.config(bg='light blue')
+            elif not self.game_started:
+                # 断线期间对局已结束
+                self.session = None
+                self.word_label.config(text="对局已结束", font=self.result_font)
+                self.ready_button.config(state='normal')
+            if message['away']:
+                self.status_label.config(text=f"已重连，{message['away'][0]} 暂时掉线")
+        
+        elif message_type == 'resume_failed':
+            self.session = None
+            self.reset_game_state()
+            self.word_label.config(text="", font=self.word_font)
+            self.status_label.config(text=f"重连失败：{message['message']}")
+        
+        elif message_type == 'player_away':
+            if message['player'] != self.name:
+                self.status_label.config(
+                    text=f"{message['player']} 网络中断，等待重连（最多 {message['grace'] // 1000} 秒）")
+        
+        elif message_type == 'player_back':
+            if message['player'] != self.name:
+                self.status_label.config(text=f"{message['player']} 已重连")
+        
+        elif message_type == 'players_update':
+            # 更新对手名字
+            old_opponent = self.opponent_name
+            other_players = [name for name in message['players'] if name != self.name]
+            self.opponent_name = other_players[0] if other_players else None
+            
+            # 显示玩家名字
+            if len(message['players']) == 2:
+                self.players_label.config(
+                    text=f"{self.name} (你) vs {self.opponent_name}"
+                )
+                if not old_opponent and self.opponent_name:
+                    self.status_label.config(text=f"{self.opponent_name} 加入了游戏")
+                    # 重置游戏相关状态，准备新游戏
                     self.game_started = False
-                    
-                    # 检查是否因为对手断开连接而结束
-                    if self.opponent_name and self.opponent_name in scores:
-                        scores_text = f"{self.name}: {scores[self.name]}分 vs {self.opponent_name}: {scores[self.opponent_name]}分"
-                    else:
-                        scores_text = f"{self.name}: {scores[self.name]}分"
-                    
-                    if message['is_tie']:
-                        self.word_label.config(text="平局！", font=self.result_font)
-                    else:
-                        winner = message['winners'][0]
-                        if winner == self.name:
-                            self.word_label.config(text="你赢了！", font=self.result_font)
-                        else:
-                            self.word_label.config(text="你输了！", font=self.result_font)
-                    
-                    self.status_label.config(text=f"最终比分：{scores_text}")
-                    
-                    # 重置准备按钮
+                    self.can_answer = False
                     self.ready_button.config(state='normal')
-                    # 清空选项和音标
+                    # 清空选项按钮
                     for btn in self.option_buttons:
-                        btn.config(text="")
-                    self.pronunciation_label.config(text="")
+                        btn.config(text="", state='normal', bg='SystemButtonFace')
+            else:
+                self.players_label.config(text="等待玩家加入...")
+                if old_opponent:
+                    self.status_label.config(text=f"{old_opponent} 断开了连接")
+            
+            # 连接成功，切换到游戏界面
+            if self.login_frame.winfo_ismapped():
+                self.login_frame.pack_forget()
+                self.game_frame.pack(expand=True, fill='both')
+        
+        elif message_type == 'player_ready':
+            player_display = self.get_player_display_name(message['player'])
+            self.status_label.config(
+                text=f"{player_display} 已准备"
+            )
         
-        except websockets.exceptions.ConnectionClosed:
-            if not self.running:  # 如果程序正在退出，不再更新UI
-                return
-            if self.game_frame.winfo_ismapped():
-                self.word_label.config(text="连接已断开", font=self.result_font)
-                self.status_label.config(text="与服务器的连接已断开")
-            self.websocket = None
-        except Exception as e:
-            if not self.running:
-                return
-            if self.game_frame.winfo_ismapped():
-                self.word_label.config(text="发生错误", font=self.result_font)
-                self.status_label.config(text=f"错误：{str(e)}")
-            self.websocket = None
+        elif message_type == 'game_start':
+            self.game_started = True
+            self.word_label.config(text="游戏开始！", font=self.result_font)
+            self.status_label.config(text="游戏开始！")
+            # 等待一段时间后清除"游戏开始"提示，期间暂缓显示第一轮
+            self.pause_events(Config.GAME_START_DELAY,
+                              lambda: self.word_label.config(text="", font=self.word_font))
+        
+        elif message_type == 'answer_feedback':
+            # 立即显示答题结果
+            selected_answer = message['answer']
+            is_correct = message['is_correct']
+            
+            # 只标记选中的答案
+            for btn in self.option_buttons:
+                if btn.cget('text')[3:] == selected_answer:
+                    btn.config(bg="light green" if is_correct else "pink")
+                    break
+        
+        elif message_type == 'round_result':
+            # 取消超时定时器
+            if self.answer_timer:
+                self.root.after_cancel(self.answer_timer)
+                self.answer_timer = None
+                
+            result_text = ""
+            if message['both_correct']:
+                if message['winner']:
+                    if message['winner'] == self.name:
+                        result_text = f"你更快！(+{message['score_added']}分)"
+                    else:
+                        result_text = f"对方更快！(对方+{message['score_added']}分)"
+                else:
+                    result_text = "双方用时相同，均不得分"
+            elif message['winner']:
+                if message['winner'] == self.name:
+                    result_text = f"答对了！(+{message['score_added']}分)"
+                else:
+                    result_text = f"对方答对了！(对方+{message['score_added']}分)"
+            else:
+                result_text = f"双方都答错了！正确答案是：{message['correct_answer']}"
+            
+            self.status_label.config(text=result_text)
+            
+            # 显示正确答案
+            for btn in self.option_buttons:
+                if btn.cget('text')[3:] == message['correct_answer']:
+                    btn.config(bg="light green")
+                    break
+            
+            # 更新上一题信息
+            self.last_word_label.config(
+                text=f"上一题：{message['word']}"
+            )
+            
+            # 等待显示结果
+            self.pause_events(Config.RESULT_DISPLAY_DELAY)
+        
+        elif message_type == 'new_round':
+            # 从题目显示的时刻而不是收到的时刻开始计时：题目可能在展示上一轮结果期间到达、
+            # 在队列中等待，这段时间玩家看不到题目，不应计入答题用时（服务器同样从发出题目时
+            # 计时，并且等待客户端展示完结果后才发出）
+            self.show_question(message, message['scores'], time.monotonic())
+        
+        elif message_type == 'wrong_answer':
+            if message['player'] == self.name:
+                self.status_label.config(text="回答错误！")
+        
+        elif message_type == 'game_over':
+            self.session = None
+            scores = message['scores']
+            
+            # 检查是否因为对手断开连接而结束
+            if 'reason' in message:
+                was_game_in_progress = self.game_started  # 保存当前游戏状态
+                if was_game_in_progress:  # 只在游戏已开始时显示"游戏结束"
+                    self.word_label.config(text="游戏结束", font=self.result_font)
+                    self.status_label.config(text=message['reason'])
+                else:
+                    self.word_label.config(text="")
+                    # 如果游戏还没开始，就不显示"游戏结束"字样
+                    self.status_label.config(text=f"玩家 {self.opponent_name} 断开了连接")
+                # 重置游戏状态
+                self.reset_game_state()
+                return  # 继续等待新消息
+            
+            # 正常游戏结束时重置状态
+            self.game_started = False
+            
+            # 检查是否因为对手断开连接而结束
+            if self.opponent_name and self.opponent_name in scores:
+                scores_text = f"{self.name}: {scores[self.name]}分 vs {self.opponent_name}: {scores[self.opponent_name]}分"
+            else:
+                scores_text = f"{self.name}: {scores[self.name]}分"
+            
+            if message['is_tie']:
+                self.word_label.config(text="平局！", font=self.result_font)
+            else:
+                winner = message['winners'][0]
+                if winner == self.name:
+                    self.word_label.config(text="你赢了！", font=self.result_font)
+                else:
+                    self.word_label.config(text="你输了！", font=self.result_font)
+            
+            self.status_label.config(text=f"最终比分：{scores_text}")
+            
+            # 重置准备按钮
+            self.ready_button.config(state='normal')
+            # 清空选项和音标
+            for btn in self.option_buttons:
+                btn.config(text="")
+            self.pronunciation_label.config(text="")
 
     def reset_game_state(self):
         """重置游戏状态"""
@@ -532,27 +704,29 @@ class WordPKClient:
         """处理窗口关闭事件"""
         self.running = False
         if self.websocket:
-            # 发送退出消息
-            asyncio.create_task(self.send_message({
-                'type': 'disconnect'
-            }))
-            # 关闭连接
-            asyncio.create_task(self.websocket.close())
+            # 发送退出消息并关闭连接
+            future = self.network.submit(self.disconnect())
+            try:
+                future.result(timeout=1)
+            except Exception:
+                pass
+        self.network.stop()
         self.root.quit()
         self.root.destroy()
+    
+    async def disconnect(self):
+        try:
+            await self.send_message({
+                'type': 'disconnect'
+            })
+        finally:
+            await self.close_connection()
 
-async def main():
+def main():
     root = tk.Tk()
-    client = WordPKClient(root)
-    
-    # 创建一个事件循环来处理tkinter的更新
-    while client.running:
-        root.update()
-        await asyncio.sleep(0.1)
-    
-    # 程序结束时确保WebSocket连接已关闭
-    if client.websocket:
-        await client.websocket.close()
+    WordPKClient(root)
+    # 界面线程运行Tk主循环，网络I/O在NetworkThread中进行
+    root.mainloop()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    main() 
\ No newline at end of file
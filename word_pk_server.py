@@ -1,16 +1,40 @@
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, Set
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+import argparse
 import asyncio
+import functools
+import itertools
 import json
+import os
 import random
+import secrets
 import websockets
 import time
+from cluster import (DEFAULT_BROKER_PATH, ClusterLink, RemoteConnection,
+                     pack_frame, run_cluster, unpack_frame)
+from deadline_scheduler import DeadlineHandle, DeadlineScheduler
+from hot_reload import Snapshot, SnapshotSource
+from match_log import DEFAULT_LOG_DIR, MatchLog, MatchRecorder
+from match_store import DEFAULT_DB_PATH, MatchStore
+from metrics import Registry, monitor_loop_lag, serve_metrics
+from matchmaking import Config as RatingConfig, MatchmakingQueue, update_ratings
+from outbound import ConnectionQueue, SubscriberQueue
+import scoring
+from tournament import FORMATS as TOURNAMENT_FORMATS, Match, Tournament
+from vocabulary_index import VocabularyIndex, get_vocabulary_index
+from vocabulary_store import MAX_DIFFICULTY as MAX_WORD_DIFFICULTY
+from word_selector import PlayerWordStats, WordSelector
+from wire_protocol import CODECS, JSON, PROTOCOL_VERSION, Codec, EncodedMessage, parse_hello
 
 class Config:
     # 游戏配置
     TOTAL_ROUNDS = 9  # 总回合数
-    MIN_DIFFICULTY = 1  # 最小题目难度
+    MIN_DIFFICULTY = 2  # 最小题目难度（含）
+    MAX_DIFFICULTY = 5  # 最大题目难度（含）
     ANSWER_TIMEOUT = 10000  # 答题超时时间（毫秒）
+    ROUND_GRACE = 1000  # 超时后等待客户端超时答案到达的宽限时间（毫秒）
+    RESUME_GRACE = 30000  # 对局中掉线的玩家保留座位等待重连的时间（毫秒），0表示掉线即结束对局
     SPECIAL_NOS = [(-1, 1.6)]  # 特殊题目配置：(题号, 倍数)，-1表示最后一题
     
     # 计分规则
@@ -24,8 +48,102 @@ class Config:
     TIME_DIFF_MULTIPLIER = 7  # 时间差分数乘数（每秒）
     MAX_SCORE_DIFF = 42  # 最大分数差值（BASE_SCORE + MAX_SCORE_DIFF = 最高可得分数）
     
+    # 计时配置
+    RTT_SMOOTHING = 0.25  # 往返时延指数平滑系数
+    TIMING_TOLERANCE = 100  # 客户端上报用时与服务器估计值允许的偏差（毫秒）
+    GAME_START_DELAY = 300  # 客户端显示开局提示的时间（毫秒），之后才发出第一题
+    RESULT_DISPLAY_DELAY = 800  # 客户端显示每轮结果的时间（毫秒），之后才发出下一题
+    
+    # 心跳配置
+    HEARTBEAT_INTERVAL = 5  # 心跳间隔（秒）
+    HEARTBEAT_TIMEOUT = 12  # 超过该时间没有收到任何消息或pong视为失联（秒）
+    
     # 网络配置
     DEFAULT_PORT = 8766
+    
+    # 房间配置
+    ROOM_CAPACITY = 2  # 每个房间的玩家数
+    
+    # 记录配置
+    LEADERBOARD_SIZE = 10  # 排行榜返回的玩家数
+    MATCH_LOG_DIR = DEFAULT_LOG_DIR  # 对局录制目录（供match_replay.py回放），每次启动新建一个文件
+    
+    # 配对配置
+    MATCH_SWEEP_INTERVAL = 1  # 检查排队者之间能否配对的间隔（秒）
+    QUEUE_STATS_INTERVAL = 60  # 输出配对队列统计的间隔（秒）
+    
+    # 观战配置
+    SPECTATOR_QUEUE_SIZE = 32  # 每个观众的发送队列长度，满时丢弃最旧的消息
+    SPECTATOR_MAX_DROPPED = 256  # 累计丢弃超过该数量的观众将被断开
+    
+    # 发送队列配置（玩家的消息不丢弃，积压按帧长度估计）
+    SEND_HIGH_WATERMARK = 64 * 1024  # 积压超过该长度开始计时
+    SEND_LOW_WATERMARK = 16 * 1024  # 积压降到该长度以下恢复正常
+    SEND_MAX_BUFFER = 1024 * 1024  # 积压超过该长度立即断开
+    SEND_STALL_TIMEOUT = 10  # 积压持续高于高水位超过该时间断开（秒）
+    COALESCE_TYPES = ('players_update', 'room_list', 'leaderboard',
+                      'tournament_update')  # 队列中只保留最新一条的完整状态消息
+    
+    # 锦标赛配置
+    TOURNAMENT_MATCH_DELAY = 5  # 比赛对阵确定后等待多久开赛（秒），留给选手查看上一局结果
+    TOURNAMENT_STANDINGS_SIZE = 20  # 锦标赛排名消息中列出的名次数
+    TOURNAMENT_MAX_ENTRANTS = 1024  # 每个锦标赛的参赛人数上限
+    
+    # 热更新配置：以下各项可在配置文件中覆盖，修改后新开始的对局生效
+    RELOADABLE = ('TOTAL_ROUNDS', 'MIN_DIFFICULTY', 'MAX_DIFFICULTY', 'ANSWER_TIMEOUT',
+                  'ROUND_GRACE', 'SPECIAL_NOS', 'QUICK_ANSWER_TIME', 'QUICK_ANSWER_SCORE',
+                  'SLOW_ANSWER_TIME', 'SLOW_ANSWER_SCORE', 'BASE_SCORE', 'TIME_DIFF_MULTIPLIER',
+                  'MAX_SCORE_DIFF', 'TIMING_TOLERANCE', 'RESUME_GRACE', 'GAME_START_DELAY',
+                  'RESULT_DISPLAY_DELAY')
+    # 热更新项的取值范围(最小值, 最大值)，含端点，None表示不限；超出范围时整个配置文件被拒绝
+    RELOADABLE_RANGES = {
+        'TOTAL_ROUNDS': (1, None),
+        'MIN_DIFFICULTY': (0, MAX_WORD_DIFFICULTY),
+        'MAX_DIFFICULTY': (0, MAX_WORD_DIFFICULTY),
+        'ANSWER_TIMEOUT': (1, None),
+        'ROUND_GRACE': (0, None),
+        'QUICK_ANSWER_TIME': (0, None),
+        'QUICK_ANSWER_SCORE': (0, None),
+        'SLOW_ANSWER_TIME': (0, None),
+        'SLOW_ANSWER_SCORE': (0, None),
+        'BASE_SCORE': (0, None),
+        'TIME_DIFF_MULTIPLIER': (0, None),
+        'MAX_SCORE_DIFF': (0, None),
+        'TIMING_TOLERANCE': (0, None),
+        'RESUME_GRACE': (0, None),
+        'GAME_START_DELAY': (0, None),
+        'RESULT_DISPLAY_DELAY': (0, None),
+    }
+    # 必须满足 前者 <= 后者 的热更新项
+    RELOADABLE_ORDER = (('MIN_DIFFICULTY', 'MAX_DIFFICULTY'), ('QUICK_ANSWER_TIME', 'SLOW_ANSWER_TIME'))
+    CONFIG_PATH = 'server_config.json'  # 默认配置文件（不存在时使用上面的默认值）
+    RELOAD_CHECK_INTERVAL = 2  # 检查配置文件和词汇表是否修改的间隔（秒）
+    
+    # 指标配置
+    METRICS_PORT = 9108  # 指标HTTP端口（多进程部署时依次加上工作进程编号），0表示不开启
+    LOOP_LAG_INTERVAL = 0.5  # 测量事件循环延迟的间隔（秒）
+
+# 运行指标：只在事件循环线程中记录，GET /metrics 输出
+metrics = Registry()
+connections_total = metrics.counter('wordpk_connections_total', "累计建立的玩家连接数")
+connected_players = metrics.gauge('wordpk_connected_players', "当前连接的玩家数（含观众）")
+matches_started_total = metrics.counter('wordpk_matches_started_total', "累计开始的对局数")
+matches_completed_total = metrics.counter('wordpk_matches_completed_total', "累计完整结束的对局数")
+matches_abandoned_total = metrics.counter('wordpk_matches_abandoned_total', "累计因玩家离开而中止的对局数")
+rounds_total = metrics.counter('wordpk_rounds_total', "累计发出的回合数")
+seats_held_total = metrics.counter('wordpk_seats_held_total', "累计为对局中掉线的玩家保留座位的次数")
+seats_resumed_total = metrics.counter('wordpk_seats_resumed_total', "累计重连回到座位的次数")
+answer_latency = metrics.histogram(
+    'wordpk_answer_latency_seconds', "new_round发出到收到答案的时间",
+    (0.25, 0.5, 1, 2, 3, 4, 5, 6, 8, 10, 12))
+round_processing = metrics.histogram('wordpk_round_processing_seconds', "处理一轮结果（计分、广播、记录）的耗时")
+broadcast_fanout = metrics.histogram('wordpk_broadcast_seconds', "一条消息放入房间内所有玩家和观众发送队列的耗时")
+loop_lag = metrics.histogram('wordpk_event_loop_lag_seconds', "事件循环定时唤醒的延迟")
+loop_lag_last = metrics.gauge('wordpk_event_loop_lag_last_seconds', "最近一次测量的事件循环延迟")
+metrics.counter('wordpk_send_coalesced_total', "发送队列中被更新的同类消息替换掉的消息数",
+                lambda: ConnectionQueue.coalesced_total)
+metrics.counter('wordpk_slow_disconnects_total', "因接收过慢被断开的玩家连接数",
+                lambda: ConnectionQueue.slow_disconnects_total)
 
 @dataclass
 class Player:
@@ -33,28 +151,84 @@ class Player:
     name: str
     score: int = 0
     ready: bool = False
+    codec: Codec = JSON  # 连接协商出的消息编码
+    rtt_ms: Optional[float] = None  # 平滑后的往返时延（毫秒）
+    last_seen: float = 0.0  # 最近一次收到消息或pong的时刻（time.monotonic）
+    rating: float = RatingConfig.INITIAL_RATING  # 等级分
+    word_stats: Optional[PlayerWordStats] = None  # 单词答题统计，用于自适应出题
+    outbox: Optional[ConnectionQueue] = None  # 发送队列，发给该玩家的消息都经由它发出
+    session: Optional[str] = None  # 会话令牌（开局时随game_config发出），掉线后凭它重连回座位
+    
+    def open_outbox(self):
+        """创建发送队列并启动写任务（需在事件循环中调用）"""
+        self.outbox = ConnectionQueue(self.websocket, Config.SEND_HIGH_WATERMARK,
+                                      Config.SEND_LOW_WATERMARK, Config.SEND_MAX_BUFFER,
+                                      Config.SEND_STALL_TIMEOUT)
+    
+    def update_rtt(self, sample_ms: float):
+        """用新的ping测量值更新往返时延估计"""
+        if self.rtt_ms is None:
+            self.rtt_ms = sample_ms
+        else:
+            self.rtt_ms += Config.RTT_SMOOTHING * (sample_ms - self.rtt_ms)
 
 class WordPKGame:
-    def __init__(self):
-        # 加载词汇表
-        with open('vocabulary.json', 'r', encoding='utf-8') as f:
-            self.vocabulary = json.load(f)
+    def __init__(self, room_id: str = '', public: bool = True,
+                 vocab_index: Optional[VocabularyIndex] = None,
+                 min_difficulty: Optional[int] = None,
+                 max_difficulty: Optional[int] = None,
+                 store: Optional[MatchStore] = None,
+                 selector: Optional[WordSelector] = None,
+                 config: Optional[type] = None,
+                 match_log: Optional[MatchLog] = None):
+        self.room_id = room_id
+        self.public = public  # 公开房间可被自动配对和房间列表看到
+        
+        # 对局使用的配置和词汇索引（热更新后的新版本在下一局开始时换用）
+        self.config = config or Config
+        self.vocab_index = vocab_index or get_vocabulary_index()
+        self.min_difficulty = self.config.MIN_DIFFICULTY if min_difficulty is None else min_difficulty
+        self.max_difficulty = self.config.MAX_DIFFICULTY if max_difficulty is None else max_difficulty
+        self.selector = selector  # 按双方答题记录选题，为None时在难度范围内均匀抽题
         
         self.players: Dict[str, Player] = {}  # websocket -> Player
+        self.spectators: Dict[object, SubscriberQueue] = {}  # websocket -> 观众发送队列
         self.current_word = None
+        self.current_index = None  # 当前单词在词汇索引中的下标
         self.current_answer = None
         self.round = 0
         self.game_in_progress = False
         self.answered_players: Dict[str, tuple] = {}  # websocket -> (answer, time)
-        self.round_timer = None  # 用于存储轮次超时任务
+        self.round_timer = None  # 本轮截止时间（DeadlineHandle）
+        self.pending_rounds: Deque[Tuple[dict, dict]] = deque()  # 预先生成的题目 (word_data, new_round消息)
+        self.round_sent_ns = 0  # 本轮new_round发出的时刻（time.monotonic_ns）
+        self.current_round: Optional[dict] = None  # 本轮的new_round消息，重连的玩家据此恢复题目（两轮之间为None）
+        self.held: Dict[object, Optional[DeadlineHandle]] = {}  # 掉线保留座位的玩家 websocket -> 保留到期的定时器
+        # 对局结束（含因玩家离开而中止）时的回调(比分, 胜者)，锦标赛据此推进赛程
+        self.on_result: Optional[Callable[[Dict[str, int], List[str]], None]] = None
+        
+        # 对局记录（为None时不记录）
+        self.store = store
+        self.match_id: Optional[str] = None
+        
+        # 每局的随机数由种子决定，按种子可以复现整局的题目和选项
+        self.seed: Optional[int] = None
+        self.rng = random.Random()  # 生成选项和补充题目用
+        self.match_log = match_log  # 对局录制（为None时不录制）
+        self.recorder: Optional[MatchRecorder] = None
     
     def reset_game(self):
         """重置游戏状态"""
         self.current_word = None
+        self.current_index = None
         self.current_answer = None
+        self.current_round = None
         self.round = 0
         self.game_in_progress = False
         self.answered_players.clear()
+        self.pending_rounds.clear()
+        self.match_id = None
+        self.recorder = None
         if self.round_timer:
             self.round_timer.cancel()
             self.round_timer = None
@@ -62,137 +236,382 @@ class WordPKGame:
             player.score = 0
             player.ready = False
     
-    def calculate_score(self, answer_time: int) -> int:
-        """根据答题时间计算得分"""
-        if answer_time <= Config.QUICK_ANSWER_TIME:
-            return Config.QUICK_ANSWER_SCORE
-        elif answer_time >= Config.SLOW_ANSWER_TIME:
-            return Config.SLOW_ANSWER_SCORE
-        else:
-            # 线性插值：1秒得120分，8秒得50分
-            return Config.QUICK_ANSWER_SCORE - (
-                (answer_time - Config.QUICK_ANSWER_TIME) / 
-                (Config.SLOW_ANSWER_TIME - Config.QUICK_ANSWER_TIME)
-            ) * (Config.QUICK_ANSWER_SCORE - Config.SLOW_ANSWER_SCORE)
-    
-    def get_random_word(self) -> dict:
-        """获取随机单词和选项"""
-        # 筛选难度大于1的题目
-        hard_words = [word for word in self.vocabulary if word.get('difficulty', 0) > Config.MIN_DIFFICULTY]
-        word_data = random.choice(hard_words)
+    def use_snapshot(self, snapshot: Snapshot):
+        """对局开始前换用最新的配置和词汇表，对局中途不再改变"""
+        if snapshot.vocab_index.count(self.min_difficulty, self.max_difficulty) == 0:
+            return  # 新词汇表中没有本房间难度范围的单词，沿用原来的版本
+        self.config = snapshot.config
+        self.vocab_index = snapshot.vocab_index
+        if self.selector is not None:
+            self.selector = snapshot.selector  # 玩家的单词统计在出题前转换（见prepare_rounds）
+    
+    def get_random_word(self, index: Optional[int] = None) -> dict:
+        """获取指定下标（默认随机）的单词和选项"""
+        # 未指定时从本房间难度范围内抽题
+        if index is None:
+            index = self.vocab_index.sample_index(self.min_difficulty, self.max_difficulty, self.rng)
+        word_data = self.vocab_index.words[index]
         
         # 从meanings中选择正确答案
-        if len(word_data['meanings']) == 1:
-            correct_answer = word_data['meanings'][0]
+        if len(word_data.meanings) == 1:
+            correct_answer = word_data.meanings[0]
         else:
             # 75%概率选第一个，25%概率选第二个
-            correct_answer = word_data['meanings'][0] if random.random() < 0.75 else word_data['meanings'][1]
+            correct_answer = word_data.meanings[0] if self.rng.random() < 0.75 else word_data.meanings[1]
         
-        num1 = 2 if random.random() < 0.5 else 1
+        num1 = 2 if self.rng.random() < 0.5 else 1
         # 从options1中选择1-2个错误选项
-        wrong_options1 = random.sample([opt['meaning'] for opt in word_data['options1']], num1)
+        wrong_options1 = self.rng.sample(word_data.options1, num1)
         # 从options2中选择2-1个错误选项
-        wrong_options2 = random.sample([opt['meaning'] for opt in word_data['options2']], 3 - num1)
+        wrong_options2 = self.rng.sample(word_data.options2, 3 - num1)
         
         # 组合所有选项并打乱
         all_options = [correct_answer] + wrong_options1 + wrong_options2
-        random.shuffle(all_options)
+        self.rng.shuffle(all_options)
         
         return {
-            'word': word_data['word'],
+            'index': index,
+            'word': word_data.word,
             'options': all_options,
             'correct_answer': correct_answer,
-            'meaning': word_data['meaning'],
-            'pronunciation': word_data['pronunciation']
+            'meaning': word_data.meaning,
+            'pronunciation': word_data.pronunciation
         }
     
+    async def remove_player(self, websocket):
+        """将玩家移出房间（不关闭连接）"""
+        if websocket not in self.players:
+            return
+        player = self.players[websocket]
+        timer = self.held.pop(websocket, None)
+        if timer:
+            timer.cancel()
+        
+        # 如果游戏正在进行，先结束游戏，留下的玩家获胜
+        result = None
+        if self.game_in_progress:
+            result = ({p.name: p.score for p in self.players.values()},
+                      [p.name for ws, p in self.players.items() if ws != websocket])
+            self.game_in_progress = False
+            # 记录未完成的对局
+            matches_abandoned_total.inc()
+            if self.recorder:
+                self.recorder.left(player.name)
+            self.finish_recording(completed=False)
+            if self.store and self.match_id:
+                self.store.end_match(self.match_id, {p.name: p.score for p in self.players.values()},
+                                     [], self.round - 1, completed=False)
+                self.match_id = None
+            # 取消当前轮次的定时器
+            if self.round_timer:
+                self.round_timer.cancel()
+                self.round_timer = None
+            
+            # 重置所有游戏相关状态
+            self.current_word = None
+            self.current_answer = None
+            self.current_round = None
+            self.round = 0
+            self.answered_players.clear()
+            
+            # 重置所有玩家状态
+            for p in self.players.values():
+                p.score = 0
+                p.ready = False
+        
+        # 获取其他玩家（在删除当前玩家之前）
+        other_players = {ws: p for ws, p in self.players.items() if ws != websocket}
+        
+        # 通知其他玩家有玩家离开并重置他们的游戏状态
+        if other_players:
+            # 发送game_over消息给其他玩家
+            game_over = EncodedMessage({
+                'type': 'game_over',
+                'reason': f"玩家 {player.name} 断开连接，游戏结束",
+                'scores': {p.name: p.score for p in other_players.values()},
+                'reset_game': True
+            })
+            for subscriber in self.spectators.values():
+                subscriber.offer(game_over.frame(subscriber.codec))
+            for p in other_players.values():
+                p.outbox.offer(game_over.frame(p.codec))
+        
+        # 删除玩家
+        del self.players[websocket]
+        
+        # 更新玩家列表
+        if other_players:
+            # 使用broadcast_message发送players_update消息
+            broadcast_message(self, {
+                'type': 'players_update',
+                'players': [p.name for p in self.players.values()]
+            })
+        
+        if result and self.on_result:
+            self.on_result(*result)
+    
     async def handle_player_disconnect(self, websocket):
         """处理玩家断开连接"""
         if websocket in self.players:
             player = self.players[websocket]
             print(f"玩家 {player.name} 断开连接")
             
-            # 如果游戏正在进行，先结束游戏
-            if self.game_in_progress:
-                self.game_in_progress = False
-                # 取消当前轮次的定时器
-                if self.round_timer:
-                    self.round_timer.cancel()
-                    self.round_timer = None
-                
-                # 重置所有游戏相关状态
-                self.current_word = None
-                self.current_answer = None
-                self.round = 0
-                self.answered_players.clear()
-                
-                # 重置所有玩家状态
-                for p in self.players.values():
-                    p.score = 0
-                    p.ready = False
-            
-            # 获取其他玩家（在删除当前玩家之前）
-            other_players = {ws: p for ws, p in self.players.items() if ws != websocket}
-            
-            # 通知其他玩家有玩家离开并重置他们的游戏状态
-            if other_players:
-                # 发送game_over消息给其他玩家
-                game_over_message = {
-                    'type': 'game_over',
-                    'reason': f"玩家 {player.name} 断开连接，游戏结束",
-                    'scores': {p.name: p.score for p in other_players.values()},
-                    'reset_game': True
-                }
-                for p in other_players.values():
-                    try:
-                        await p.websocket.send(json.dumps(game_over_message))
-                    except websockets.exceptions.ConnectionClosed:
-                        pass
-            
-            # 删除玩家
-            del self.players[websocket]
-            
-            # 更新玩家列表
-            if other_players:
-                # 使用broadcast_message发送players_update消息
-                await broadcast_message(self, {
-                    'type': 'players_update',
-                    'players': [p.name for p in self.players.values()]
-                })
+            await self.remove_player(websocket)
             
             try:
                 await websocket.close()
             except:
                 pass  # 忽略关闭连接时的错误
 
+    async def hold_seat(self, websocket, timer: Optional[DeadlineHandle] = None):
+        """玩家掉线时保留其座位，重连前的各轮按未作答处理；timer为保留到期的定时器"""
+        player = self.players[websocket]
+        self.held[websocket] = timer
+        if self.recorder:
+            self.recorder.held(player.name)
+        broadcast_message(self, {
+            'type': 'player_away',
+            'player': player.name,
+            'grace': self.config.RESUME_GRACE
+        })
+        # 其余玩家都已答题时不必等到本轮截止
+        if self.game_in_progress and self.all_answered():
+            if self.round_timer:
+                self.round_timer.cancel()
+                self.round_timer = None
+            await process_round_result(self)
+    
+    def resume_seat(self, websocket):
+        """掉线的玩家已换用新连接（player.websocket）：座位和本轮答案转到新连接，
+        向该玩家发送当前对局状态"""
+        player = self.players[websocket]
+        timer = self.held.pop(websocket, None)
+        if timer:
+            timer.cancel()
+        # 保持玩家的先后顺序不变
+        self.players = {(p.websocket if ws is websocket else ws): p for ws, p in self.players.items()}
+        if websocket in self.answered_players:
+            self.answered_players[player.websocket] = self.answered_players.pop(websocket)
+        if self.recorder:
+            self.recorder.resumed(player.name)
+        send_message(player, {'type': 'resume_state', **self.resume_state(player)})
+        broadcast_message(self, {
+            'type': 'player_back',
+            'player': player.name
+        })
+    
+    def resume_state(self, player: Player) -> dict:
+        """重连的玩家看到的对局状态：比分、当前回合的题目、剩余答题时间和自己本轮的答案"""
+        state = {**self.snapshot(), 'answer_timeout': self.config.ANSWER_TIMEOUT,
+                 'away': [p.name for ws, p in self.players.items() if ws in self.held]}
+        if self.game_in_progress and self.current_round:
+            elapsed = (time.monotonic_ns() - self.round_sent_ns) // 1_000_000
+            answer = self.answered_players.get(player.websocket)
+            state['question'] = {key: value for key, value in self.current_round.items()
+                                 if key not in ('type', 'scores')}
+            state['remaining'] = max(0, self.config.ANSWER_TIMEOUT - elapsed)
+            state['answer'] = answer[0] if answer else None
+        return state
+    
+    def add_spectator(self, websocket, codec: Codec = JSON) -> SubscriberQueue:
+        """添加只读观众"""
+        subscriber = SubscriberQueue(websocket, Config.SPECTATOR_QUEUE_SIZE,
+                                     Config.SPECTATOR_MAX_DROPPED, codec)
+        self.spectators[websocket] = subscriber
+        return subscriber
+    
+    def remove_spectator(self, websocket):
+        subscriber = self.spectators.pop(websocket, None)
+        if subscriber:
+            subscriber.close()
+    
+    def snapshot(self) -> dict:
+        """观众加入时看到的房间状态"""
+        return {
+            'room_id': self.room_id,
+            'players': [p.name for p in self.players.values()],
+            'ready_players': [p.name for p in self.players.values() if p.ready],
+            'scores': {p.name: p.score for p in self.players.values()},
+            'round': self.round,
+            'total_rounds': self.config.TOTAL_ROUNDS,
+            'in_progress': self.game_in_progress
+        }
+    
+    def is_full(self) -> bool:
+        return len(self.players) >= Config.ROOM_CAPACITY
+    
+    def has_player_named(self, name: str) -> bool:
+        return any(p.name == name for p in self.players.values())
+    
+    def all_answered(self) -> bool:
+        """在线的玩家都已答题（至少有一人答题，掉线保留座位的玩家不等待）"""
+        return bool(self.answered_players) and all(
+            ws in self.answered_players or ws in self.held for ws in self.players)
+    
     def all_players_ready(self) -> bool:
-        return len(self.players) == 2 and all(p.ready for p in self.players.values())
-    
-    def get_round_multiplier(self) -> float:
-        """获取当前回合的分数倍数"""
-        current_round_zero_based = self.round - 1  # 转换为从0开始的轮数
-        for round_no, multiplier in Config.SPECIAL_NOS:
-            # 如果是负数，从最后一题往前数
-            actual_round = round_no if round_no >= 0 else Config.TOTAL_ROUNDS + round_no
-            if current_round_zero_based == actual_round:
-                return multiplier
-        return 1.0
+        return len(self.players) == Config.ROOM_CAPACITY and all(p.ready for p in self.players.values())
+    
+    def answer_time(self, player: Player, client_time, arrival_ns: int) -> int:
+        """以服务器计时为准计算答题用时（毫秒）
+        
+        服务器观测到的用时包含一次往返网络时延，减去平滑后的RTT即为估计用时。
+        客户端上报的用时只有落在[估计值 - 容差, 服务器观测值]内才被采用，
+        否则使用服务器的估计值。
+        """
+        elapsed = (arrival_ns - self.round_sent_ns) / 1_000_000
+        estimated = max(0.0, elapsed - (player.rtt_ms or 0.0))
+        if (isinstance(client_time, (int, float)) and
+                estimated - self.config.TIMING_TOLERANCE <= client_time <= elapsed):
+            answer_time = client_time
+        else:
+            answer_time = estimated
+        return min(int(answer_time), self.config.ANSWER_TIMEOUT)
+    
+    def build_round(self, round_no: int, index: Optional[int] = None) -> Tuple[dict, dict]:
+        """生成一轮的题目和new_round消息（比分在发送时填入）"""
+        word_data = self.get_random_word(index)
+        return word_data, {
+            'type': 'new_round',
+            'round': round_no,
+            'word': word_data['word'],
+            'options': word_data['options'],
+            'multiplier': self.get_round_multiplier(round_no),  # 添加倍数信息
+            'pronunciation': word_data['pronunciation'],
+            'meaning': word_data['meaning']
+        }
+    
+    def prepare_rounds(self, seed: Optional[int] = None):
+        """对局开始时一次性生成所有回合的题目，进入下一轮时只需取出发送
+        
+        选词和生成选项各用一个由种子派生的随机数，种子相同、选出的单词相同时选项也相同
+        （回放时单词按录制结果给出，不依赖选词的随机数）。seed为None时随机生成。
+        """
+        self.seed = random.getrandbits(64) if seed is None else seed
+        word_rng = random.Random(self.seed << 1)
+        self.rng = random.Random(self.seed << 1 | 1)
+        self.pending_rounds.clear()
+        if self.selector:
+            # 玩家的单词统计可能来自其他词汇表版本（如房间沿用旧词汇表时新加入的玩家），
+            # 先按单词转换到本房间选题器的下标，之后出题和记录答题都用这一版本
+            for player in self.players.values():
+                if player.word_stats:
+                    player.word_stats = self.selector.adopt(player.word_stats)
+            # 按双方的答题记录一次性选出整场对局的单词
+            stats = [p.word_stats for p in self.players.values() if p.word_stats]
+            indices = self.selector.choose(stats, self.min_difficulty, self.max_difficulty,
+                                           self.config.TOTAL_ROUNDS, word_rng)
+        else:
+            indices = [self.vocab_index.sample_index(self.min_difficulty, self.max_difficulty, word_rng)
+                       for _ in range(self.config.TOTAL_ROUNDS)]
+        for round_no, index in enumerate(indices, 1):
+            self.pending_rounds.append(self.build_round(round_no, index))
+    
+    def start_recording(self):
+        """题目生成后开始录制本局"""
+        if self.match_log is None:
+            return
+        players = list(self.players.values())
+        self.recorder = MatchRecorder(
+            self.seed, self.room_id, [p.name for p in players], [p.rating for p in players],
+            [word_data['word'] for word_data, _ in self.pending_rounds],
+            {key: getattr(self.config, key) for key in Config.RELOADABLE},
+            self.min_difficulty, self.max_difficulty)
+    
+    def finish_recording(self, completed: bool):
+        """结束录制并写入对局录制文件"""
+        if self.recorder is not None:
+            self.match_log.write(self.recorder.finish(completed))
+            self.recorder = None
+    
+    def get_round_multiplier(self, round_no: Optional[int] = None) -> float:
+        """获取指定回合（默认当前回合）的分数倍数"""
+        return scoring.round_multiplier(self.config, self.round if round_no is None else round_no)
+
+async def measure_rtt(player: Player, timeout: float = 2.0):
+    """发送ping并用monotonic时钟测量往返时延"""
+    try:
+        start = time.monotonic_ns()
+        pong_waiter = await player.websocket.ping()
+        await asyncio.wait_for(pong_waiter, timeout=timeout)
+        player.update_rtt((time.monotonic_ns() - start) / 1_000_000)
+        player.last_seen = time.monotonic()
+    except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+        pass
+
+async def measure_all_rtts(game: WordPKGame):
+    """并发测量房间内所有玩家的往返时延"""
+    await asyncio.gather(*(measure_rtt(p) for p in list(game.players.values())))
 
-async def broadcast_message(game: WordPKGame, message: dict):
+def coalesce_key(message: dict) -> Optional[str]:
+    """完整状态消息按类型合并，队列中未发出的旧消息被新消息替换"""
+    return message['type'] if message['type'] in Config.COALESCE_TYPES else None
+
+def send_message(player: Player, message: dict):
+    """按连接协商的编码把单条消息放入玩家的发送队列（不等待网络）"""
+    player.outbox.offer(player.codec.encode(message), coalesce_key(message))
+
+def broadcast_message(game: WordPKGame, message: dict):
     """向所有玩家广播消息"""
-    if game.players:
-        try:
-            # 创建所有发送任务
-            tasks = [player.websocket.send(json.dumps(message))
-                    for player in game.players.values()]
-            # 等待所有任务完成
-            await asyncio.gather(*tasks, return_exceptions=True)
-        except websockets.exceptions.ConnectionClosed:
-            pass  # 忽略发送消息时的连接关闭错误
+    # 每种编码只序列化一次，使用相同编码的接收者共用同一帧
+    broadcast_encoded(game, EncodedMessage(message))
+
+def broadcast_encoded(game: WordPKGame, encoded: EncodedMessage):
+    """把已序列化的消息放入所有玩家和观众的发送队列
+
+    只入队不等待，慢玩家和慢观众都不会拖慢房间的其他人和轮次推进。
+    """
+    with broadcast_fanout.time():
+        if game.recorder is not None:
+            game.recorder.sent(encoded.message)
+        for subscriber in game.spectators.values():
+            subscriber.offer(encoded.frame(subscriber.codec))
+        key = coalesce_key(encoded.message)
+        for player in game.players.values():
+            player.outbox.offer(encoded.frame(player.codec), key)
+
+async def start_game(game: WordPKGame, seed: Optional[int] = None):
+    """开始游戏，seed为None时随机生成本局的种子"""
+    matches_started_total.inc()
+    game.prepare_rounds(seed)
+    game.start_recording()
+    # 本局的配置可能因热更新与玩家连接时收到的不同，开局前重新发送
+    config_message = {
+        'type': 'game_config',
+        'total_rounds': game.config.TOTAL_ROUNDS,
+        'answer_timeout': game.config.ANSWER_TIMEOUT
+    }
+    if game.recorder:
+        game.recorder.sent(config_message)
+    # 每名玩家附带各自的会话令牌（以房间号开头，多进程部署时据此找到房间所在的进程）
+    for player in game.players.values():
+        player.session = f"{game.room_id}.{secrets.token_urlsafe(16)}"
+        send_message(player, {**config_message, 'session': player.session})
+    if game.store:
+        game.match_id = game.store.begin_match(
+            game.room_id, [p.name for p in game.players.values()],
+            game.min_difficulty, game.max_difficulty)
+    await measure_all_rtts(game)
+    broadcast_message(game, {'type': 'game_start'})
+    await advance_round(game, game.config.GAME_START_DELAY)
+
+async def advance_round(game: WordPKGame, delay: int):
+    """进入下一轮；还有题目时先等待delay毫秒（客户端显示开局提示或上一轮结果的时间）
+    
+    题目在等待之后才发出，答题用时从发出时算起，不包含客户端暂缓显示题目的时间。
+    等待期间不接受答案。
+    """
+    game.current_round = None
+    game.answered_players.clear()
+    if delay <= 0 or game.round >= game.config.TOTAL_ROUNDS:
+        await next_round(game)
+        return
+    game.round_timer = deadlines.schedule(delay / 1000, handle_round_delay, game, game.round)
 
-async def start_game(game: WordPKGame):
-    """开始游戏"""
-    await broadcast_message(game, {'type': 'game_start'})
+async def handle_round_delay(game: WordPKGame, round_no: int):
+    """两轮之间的等待结束，发出下一轮的题目"""
+    if not game.game_in_progress or game.round != round_no:
+        return
+    game.round_timer = None
     await next_round(game)
 
 async def next_round(game: WordPKGame):
@@ -200,91 +619,87 @@ async def next_round(game: WordPKGame):
     game.answered_players.clear()
     game.round += 1
     
-    if game.round <= Config.TOTAL_ROUNDS:
-        word_data = game.get_random_word()
+    if game.round <= game.config.TOTAL_ROUNDS:
+        # 取出预先生成的题目
+        if game.pending_rounds:
+            word_data, message = game.pending_rounds.popleft()
+        else:
+            word_data, message = game.build_round(game.round)
         game.current_word = word_data['word']
+        game.current_index = word_data['index']
         game.current_answer = word_data['correct_answer']
         
-        # 设置轮次超时检查
-        game.round_timer = asyncio.create_task(check_round_timeout(game))
-        
-        # 获取当前回合的倍数
-        multiplier = game.get_round_multiplier()
+        # 登记本轮截止时间：答题时限加宽限时间
+        game.round_timer = deadlines.schedule(
+            (game.config.ANSWER_TIMEOUT + game.config.ROUND_GRACE) / 1000,
+            handle_round_deadline, game, game.round)
         
-        await broadcast_message(game, {
-            'type': 'new_round',
-            'round': game.round,
-            'word': word_data['word'],
-            'options': word_data['options'],
-            'scores': {p.name: p.score for p in game.players.values()},
-            'multiplier': multiplier,  # 添加倍数信息
-            'pronunciation': word_data['pronunciation'],
-            'meaning': word_data['meaning']
-        })
+        message['scores'] = {p.name: p.score for p in game.players.values()}
+        game.current_round = message
+        rounds_total.inc()
+        broadcast_message(game, message)
+        game.round_sent_ns = time.monotonic_ns()
     else:
         # 游戏结束
         scores = {p.name: p.score for p in game.players.values()}
         max_score = max(scores.values())
         winners = [name for name, score in scores.items() if score == max_score]
         
-        await broadcast_message(game, {
+        matches_completed_total.inc()
+        # 按对局结果更新等级分
+        ratings = update_ratings({p.name: p.rating for p in game.players.values()}, winners)
+        for p in game.players.values():
+            p.rating = ratings[p.name]
+        if game.store and game.match_id:
+            game.store.end_match(game.match_id, scores, winners, game.config.TOTAL_ROUNDS,
+                                 ratings=ratings)
+        
+        broadcast_message(game, {
             'type': 'game_over',
             'scores': scores,
             'winners': winners,
-            'is_tie': len(winners) > 1
+            'is_tie': len(winners) > 1,
+            'ratings': {name: round(rating) for name, rating in ratings.items()}
         })
+        game.finish_recording(completed=True)
         game.reset_game()
+        if game.on_result:
+            game.on_result(scores, winners)
 
 async def process_round_result(game: WordPKGame):
     """处理本轮结果并计算分数"""
-    correct_players = []  # [(player, time), ...]
-    wrong_players = []    # [(player, answer, time), ...]
+    started = time.perf_counter()
+    answered = []       # [(player, answer, time), ...]
+    wrong_players = []  # [(player, answer, time), ...]
     
     # 分类答题结果
-    for ws, (answer, time) in game.answered_players.items():
-        player = game.players[ws]
-        if answer == game.current_answer:
-            correct_players.append((player, time))
-        else:
-            wrong_players.append((player, answer, time))
-    
-    # 获取当前回合的倍数
-    multiplier = game.get_round_multiplier()
-    
-    # 计算得分
-    if len(correct_players) == 2:  # 双方都答对
-        # 按时间排序
-        correct_players.sort(key=lambda x: x[1])
-        if correct_players[0][1] == correct_players[1][1]:
-            # 用时相同，都不得分
-            score_added = 0
-            winner = None
-        else:
-            # 计算时间差（秒）
-            time_diff = (correct_players[1][1] - correct_players[0][1]) / 1000
-            score_added = round(min(
-                Config.BASE_SCORE + time_diff * Config.TIME_DIFF_MULTIPLIER,
-                Config.BASE_SCORE + Config.MAX_SCORE_DIFF
-            ) * multiplier)  # 应用倍数
-            winner = correct_players[0][0]
-            winner.score += score_added
-        
-        await broadcast_message(game, {
+    for ws, (answer, answer_time) in game.answered_players.items():
+        answered.append((game.players[ws], answer, answer_time))
+        if answer != game.current_answer:
+            wrong_players.append(answered[-1])
+    correct_count = len(answered) - len(wrong_players)
+    
+    # 计算得分（倍数按当前回合计入）
+    winner_index, score_added = scoring.score_round(
+        game.config, game.round,
+        [(answer == game.current_answer, answer_time) for _, answer, answer_time in answered])
+    winner = answered[winner_index][0] if winner_index is not None else None
+    if winner:
+        winner.score += score_added
+    
+    if correct_count >= 2:  # 双方都答对，用时相同时都不得分
+        broadcast_message(game, {
             'type': 'round_result',
             'both_correct': True,
             'winner': winner.name if winner else None,
             'score_added': score_added,
             'correct_answer': game.current_answer,
             'word': game.current_word,
-            'is_last_round': game.round == Config.TOTAL_ROUNDS
+            'is_last_round': game.round == game.config.TOTAL_ROUNDS
         })
     
-    elif len(correct_players) == 1:  # 只有一人答对
-        winner = correct_players[0][0]
-        score_added = round(game.calculate_score(correct_players[0][1]) * multiplier)  # 应用倍数
-        winner.score += score_added
-        
-        await broadcast_message(game, {
+    elif correct_count == 1:  # 只有一人答对
+        broadcast_message(game, {
             'type': 'round_result',
             'both_correct': False,
             'winner': winner.name,
@@ -292,125 +707,962 @@ async def process_round_result(game: WordPKGame):
             'correct_answer': game.current_answer,
             'wrong_answer': wrong_players[0][1] if wrong_players else None,
             'word': game.current_word,
-            'is_last_round': game.round == Config.TOTAL_ROUNDS
+            'is_last_round': game.round == game.config.TOTAL_ROUNDS
         })
     
     else:  # 都答错或超时
-        await broadcast_message(game, {
+        broadcast_message(game, {
             'type': 'round_result',
             'both_correct': False,
             'winner': None,
             'correct_answer': game.current_answer,
             'word': game.current_word,
-            'is_last_round': game.round == Config.TOTAL_ROUNDS
+            'is_last_round': game.round == game.config.TOTAL_ROUNDS
         })
     
-    # 进入下一轮
-    await next_round(game)
+    # 更新出题用的单词统计
+    difficulty = game.vocab_index.words[game.current_index].difficulty
+    for ws, player in game.players.items():
+        if player.word_stats:
+            answer, answer_time = game.answered_players.get(ws, (None, None))
+            player.word_stats.record(game.current_index, difficulty,
+                                     answer == game.current_answer, answer_time)
+    
+    # 记录本轮每名玩家的答题情况（只入队，不等待写盘）
+    if game.store and game.match_id:
+        answers = []
+        for ws, player in game.players.items():
+            answer, answer_time = game.answered_players.get(ws, (None, None))
+            answers.append((player.name, answer, answer == game.current_answer, answer_time,
+                            score_added if player is winner else 0))
+        game.store.record_round(game.match_id, game.round, game.current_word, answers)
+    round_processing.observe(time.perf_counter() - started)
+    
+    # 客户端显示本轮结果之后再进入下一轮
+    await advance_round(game, game.config.RESULT_DISPLAY_DELAY)
 
-async def check_round_timeout(game: WordPKGame):
-    """检查轮次是否超时"""
-    await asyncio.sleep(20)  # 等待20秒
-    if game.game_in_progress:
-        disconnected_players = []
-        # 检查是否有玩家未答题
-        for ws in game.players:
-            if ws not in game.answered_players:
-                try:
-                    # 尝试发送一个ping消息
-                    pong_waiter = await ws.ping()
-                    try:
-                        await asyncio.wait_for(pong_waiter, timeout=1.0)
-                    except asyncio.TimeoutError:
-                        # 如果1秒内没有收到pong响应，认为客户端已断开
-                        disconnected_players.append(ws)
-                        continue
-                except websockets.exceptions.ConnectionClosed:
-                    disconnected_players.append(ws)
-                    continue
-                # 如果客户端还在线，添加超时答案
-                game.answered_players[ws] = ('', 10000)
-        
-        # 处理断开连接的玩家
-        for ws in disconnected_players:
+async def handle_answer(game: WordPKGame, player: Player, data: dict, arrival_ns: int):
+    """处理玩家的答案，arrival_ns为收到答案的时刻（time.monotonic_ns）"""
+    websocket = player.websocket
+    if (not game.game_in_progress or game.current_round is None or
+            websocket in game.answered_players):
+        return  # 两轮之间（题目尚未发出）的答案同样忽略
+    answer = data['answer']
+    answer_latency.observe((arrival_ns - game.round_sent_ns) / 1_000_000_000)
+    answer_time = game.answer_time(player, data.get('time'), arrival_ns)
+    game.answered_players[websocket] = (answer, answer_time)
+    if game.recorder:
+        game.recorder.received(player.name, data, player.rtt_ms, arrival_ns,
+                               arrival_ns - game.round_sent_ns)
+    
+    # 只向答题玩家发送答题反馈
+    feedback = {
+        'type': 'answer_feedback',
+        'answer': answer,
+        'is_correct': answer == game.current_answer
+    }
+    if game.recorder:
+        game.recorder.sent(feedback, player.name)
+    send_message(player, feedback)
+    
+    # 如果所有在线玩家都已答题，进入下一轮
+    if game.all_answered():
+        # 取消轮次超时定时器
+        if game.round_timer:
+            game.round_timer.cancel()
+            game.round_timer = None
+        await process_round_result(game)
+
+# 所有房间共用的轮次截止时间调度器
+deadlines = DeadlineScheduler()
+
+async def handle_round_deadline(game: WordPKGame, round_no: int):
+    """本轮截止时间到达：在线但未答题的玩家记为超时，失联的玩家断开
+    
+    开启了座位保留时，失联的玩家本轮同样记为超时，只关闭其连接，
+    由连接的清理流程保留座位等待重连。
+    """
+    if not game.game_in_progress or game.round != round_no:
+        return
+    game.round_timer = None
+    
+    # 是否在线由心跳判断，这里不再逐个ping
+    stale_before = time.monotonic() - Config.HEARTBEAT_TIMEOUT
+    disconnected_players = []
+    for ws, player in game.players.items():
+        if ws not in game.answered_players:
+            if ws not in game.held and player.last_seen < stale_before:
+                disconnected_players.append(ws)
+                if game.config.RESUME_GRACE > 0:
+                    game.answered_players[ws] = ('', game.config.ANSWER_TIMEOUT)
+            else:
+                game.answered_players[ws] = ('', game.config.ANSWER_TIMEOUT)
+    if game.recorder:
+        game.recorder.deadline([game.players[ws].name for ws in disconnected_players])
+    
+    # 处理断开连接的玩家
+    for ws in disconnected_players:
+        if game.config.RESUME_GRACE > 0:
+            asyncio.create_task(ws.close())  # 不等待关闭握手，失联的连接可能要等到超时
+        else:
             await game.handle_player_disconnect(ws)
+    
+    # 如果对局仍在进行，处理本轮结果
+    if game.game_in_progress and game.players:
+        await process_round_result(game)
+
+class RoomManager:
+    """房间管理器：在一个事件循环中同时承载多个对战房间"""
+    def __init__(self, room_prefix: str = '', store: Optional[MatchStore] = None,
+                 config_path: Optional[str] = None, match_log: Optional[MatchLog] = None):
+        # 配置和词汇表快照（词汇索引、自适应选题器），由所有房间共享，可热更新
+        self.snapshots = SnapshotSource(Config, Config.RELOADABLE, config_path)
+        self.store = store  # 对局记录库，由所有房间共享
+        self.match_log = match_log  # 对局录制，由所有房间共享
+        self.match_queue = MatchmakingQueue()  # 等待房间按房主等级分排队
+        self.room_prefix = room_prefix  # 多进程部署时用工作进程编号区分房间号
+        self.rooms: Dict[str, WordPKGame] = {}  # room_id -> 房间
+        self.waiting_rooms: Dict[str, WordPKGame] = {}  # 等待对手的公开房间（按加入顺序）
+        self.player_rooms: Dict[object, WordPKGame] = {}  # websocket -> 所在房间
+        self.spectator_rooms: Dict[object, WordPKGame] = {}  # websocket -> 观战房间
+        self._room_ids = itertools.count(1)
+        
+        # 多进程部署时的跨进程配对状态
+        self.cluster: Optional[ClusterLink] = None
+        self.relays: Dict[object, Tuple[int, str, Player]] = {}  # 本进程的连接 -> (房间所在进程, 转发链路, 玩家)
+        self.relay_sockets: Dict[str, object] = {}  # 转发链路 -> 本进程的连接
+        self.remotes: Dict[str, RemoteConnection] = {}  # 转发链路 -> 其他进程玩家的代理连接
+        
+        # 锦标赛：赛程由tournament模块编排，每场比赛在一个非公开房间中进行
+        self.tournaments: Dict[str, Tournament] = {}  # 锦标赛编号 -> 锦标赛
+        self.tournament_players: Dict[object, Tuple[Tournament, Player]] = {}  # websocket -> (锦标赛, 玩家)，含组织者
+        self._tournament_ids = itertools.count(1)
+    
+    @property
+    def snapshot(self) -> Snapshot:
+        """当前最新的配置和词汇表"""
+        return self.snapshots.current
+    
+    def create_room(self, public: bool = True,
+                    min_difficulty: Optional[int] = None,
+                    max_difficulty: Optional[int] = None) -> WordPKGame:
+        """创建新房间"""
+        room_id = f"{self.room_prefix}{next(self._room_ids)}"
+        snapshot = self.snapshot
+        room = WordPKGame(room_id=room_id, public=public, vocab_index=snapshot.vocab_index,
+                          min_difficulty=min_difficulty, max_difficulty=max_difficulty,
+                          store=self.store, selector=snapshot.selector, config=snapshot.config,
+                          match_log=self.match_log)
+        self.rooms[room_id] = room
+        return room
+    
+    def refresh_room(self, room: WordPKGame):
+        """根据房间当前人数更新等待队列，空房间直接回收"""
+        was_waiting = room.room_id in self.waiting_rooms
+        if room.players and len(room.held) == len(room.players):
+            # 对手已离开，只剩保留座位的掉线玩家，不再等待其重连
+            for websocket in list(room.held):
+                asyncio.create_task(self.expire_seat(room, websocket))
+        if not room.players:
+            self.rooms.pop(room.room_id, None)
+            self.waiting_rooms.pop(room.room_id, None)
+            if room.round_timer:
+                room.round_timer.cancel()
+                room.round_timer = None
+            # 房间解散，通知观众
+            room_closed = EncodedMessage({'type': 'room_closed', 'room_id': room.room_id})
+            for websocket, subscriber in room.spectators.items():
+                subscriber.offer(room_closed.frame(subscriber.codec))
+                self.spectator_rooms.pop(websocket, None)
+            room.spectators.clear()
+        elif room.public and not room.is_full() and not room.game_in_progress and not room.held:
+            self.waiting_rooms.setdefault(room.room_id, room)
+        else:
+            self.waiting_rooms.pop(room.room_id, None)
+        
+        # 同步配对队列：等待中的房间按唯一玩家的等级分排队，满员即视为配对成功
+        if room.room_id in self.waiting_rooms:
+            player = next(iter(room.players.values()))
+            self.match_queue.add(room.room_id, player.rating, room)
+        else:
+            self.match_queue.remove(room.room_id, matched=room.is_full())
+        
+        # 通知代理本进程的等待房间变化，以便与其他进程的玩家配对
+        is_waiting = room.room_id in self.waiting_rooms
+        if self.cluster and is_waiting:
+            remote = next(iter(room.players))
+            if isinstance(remote, RemoteConnection):
+                # 转发来的玩家不能再次转发，不参与跨进程等待，退回其所在进程重新配对
+                is_waiting = False
+                asyncio.create_task(self.bounce_remote(room, remote))
+        if self.cluster and is_waiting != was_waiting:
+            self.cluster.send({'op': 'wait' if is_waiting else 'cancel', 'room_id': room.room_id})
+    
+    def find_waiting_room(self, name: str,
+                          rating: float = RatingConfig.INITIAL_RATING) -> WordPKGame:
+        """自动配对：加入等级分相近的等待房间，没有则新建一个继续排队"""
+        ticket = self.match_queue.find(
+            rating, accept=lambda t: not t.payload.has_player_named(name))
+        if ticket is not None:
+            return ticket.payload
+        return self.create_room()
+    
+    def list_rooms(self) -> List[dict]:
+        """返回所有公开房间的概要信息"""
+        return [{
+            'room_id': room.room_id,
+            'players': [p.name for p in room.players.values()],
+            'in_progress': room.game_in_progress,
+            'min_difficulty': room.min_difficulty,
+            'max_difficulty': room.max_difficulty,
+            'spectators': len(room.spectators)
+        } for room in self.rooms.values() if room.public]
+    
+    def get_room(self, websocket) -> Optional[WordPKGame]:
+        return self.player_rooms.get(websocket)
+    
+    async def join_room(self, player: Player, room: WordPKGame):
+        """让玩家加入指定房间并同步房间状态"""
+        websocket = player.websocket
+        player.score = 0
+        player.ready = False
+        room.players[websocket] = player
+        self.player_rooms[websocket] = room
+        self.refresh_room(room)
+        
+        send_message(player, {
+            'type': 'room_joined',
+            'room_id': room.room_id
+        })
+        
+        # 通知房间内所有玩家有新玩家加入
+        broadcast_message(room, {
+            'type': 'players_update',
+            'players': [p.name for p in room.players.values()]
+        })
+        
+        # 通知新玩家已准备的玩家状态
+        for p in room.players.values():
+            if p.ready:
+                send_message(player, {
+                    'type': 'player_ready',
+                    'player': p.name
+                })
+    
+    async def leave_room(self, websocket) -> Optional[Player]:
+        """让玩家离开当前房间（不关闭连接）"""
+        room = self.player_rooms.pop(websocket, None)
+        if room is None:
+            return None
+        player = room.players.get(websocket)
+        await room.remove_player(websocket)
+        self.refresh_room(room)
+        return player
+    
+    async def spectate(self, websocket, room: WordPKGame, codec: Codec = JSON):
+        """以观众身份进入房间，只接收事件不参与答题"""
+        self.stop_spectating(websocket)
+        self.spectator_rooms[websocket] = room
+        room.add_spectator(websocket, codec).offer(codec.encode({
+            'type': 'spectate_joined',
+            **room.snapshot()
+        }))
+    
+    def stop_spectating(self, websocket):
+        room = self.spectator_rooms.pop(websocket, None)
+        if room:
+            room.remove_spectator(websocket)
+    
+    async def matchmaking(self):
+        """定期让可接受范围已放宽到彼此的排队者配对，并输出排队统计"""
+        last_stats = time.monotonic()
+        while True:
+            await asyncio.sleep(Config.MATCH_SWEEP_INTERVAL)
+            pairs = self.match_queue.pairs(
+                accept=lambda a, b: not b.payload.has_player_named(
+                    next(iter(a.payload.players.values())).name))
+            for host, guest in pairs:
+                # 后排队的玩家并入先排队的房间
+                await self.merge_rooms(host.payload, guest.payload)
+            
+            now = time.monotonic()
+            if now - last_stats >= Config.QUEUE_STATS_INTERVAL:
+                last_stats = now
+                stats = self.match_queue.metrics(now)
+                if stats['queued'] or stats['matched']:
+                    print(f"配对队列：排队 {stats['queued']} 人，累计配对 {stats['matched']} 人，"
+                          f"排队时间 p50 {stats['wait_p50']:.1f}s / p99 {stats['wait_p99']:.1f}s，"
+                          f"当前最长 {stats['longest_wait']:.1f}s")
+    
+    async def merge_rooms(self, host: WordPKGame, guest: WordPKGame):
+        """把guest房间的唯一玩家移到host房间"""
+        if len(guest.players) != 1 or guest.game_in_progress:
+            return
+        websocket, player = next(iter(guest.players.items()))
+        await self.leave_room(websocket)
+        if host.is_full() or host.game_in_progress or not host.players:
+            host = self.find_waiting_room(player.name, player.rating)
+        await self.join_room(player, host)
+    
+    async def heartbeat(self):
+        """定期并发ping所有玩家，更新在线状态和往返时延"""
+        while True:
+            await asyncio.sleep(Config.HEARTBEAT_INTERVAL)
+            players = [room.players[ws] for ws, room in self.player_rooms.items()
+                       if ws in room.players]
+            await asyncio.gather(*(measure_rtt(p, timeout=Config.HEARTBEAT_INTERVAL)
+                                   for p in players))
+    
+    async def accept_offer(self, offer: dict):
+        """代理为本进程等待中的玩家找到了其他进程的房间：把玩家转过去，本进程只转发帧"""
+        room = self.rooms.get(offer['room_id'])
+        websocket = next(iter(room.players), None) if room else None
+        if (websocket is None or len(room.players) != 1 or room.game_in_progress or
+                isinstance(websocket, RemoteConnection)):
+            self.cluster.send({'op': 'decline', 'host_worker': offer['host_worker'],
+                               'host_room': offer['host_room']})
+            return
+        player = room.players[websocket]
+        
+        # 离开本地房间（房间随之回收）
+        await self.leave_room(websocket)
+        self.relay_player(player, offer['host_worker'], host_room=offer['host_room'])
+    
+    def relay_player(self, player: Player, worker: int, **attach):
+        """把玩家转到其他进程，本进程此后只转发该连接的帧"""
+        link_id = self.cluster.new_link_id()
+        self.relays[player.websocket] = (worker, link_id, player)
+        self.relay_sockets[link_id] = player.websocket
+        self.cluster.relay(worker, {
+            'kind': 'attach',
+            'link': link_id,
+            'name': player.name,
+            'rating': player.rating,
+            'codec': player.codec.name,
+            **attach
+        })
+    
+    async def bounce_remote(self, room: WordPKGame, remote: RemoteConnection):
+        """把独自等待的转发玩家退回其所在进程"""
+        if list(room.players) != [remote] or room.game_in_progress:
+            return  # 期间已有本地玩家加入
+        await self.leave_room(remote)
+        self.cluster.relay(remote.worker, {'kind': 'bounce', 'link': remote.link_id})
+        remote.feed_closed()
+    
+    async def hold_seat(self, room: WordPKGame, websocket) -> bool:
+        """对局中掉线的玩家保留座位等待重连，返回是否保留"""
+        player = room.players.get(websocket)
+        if (player is None or player.session is None or not room.game_in_progress or
+                room.config.RESUME_GRACE <= 0):
+            return False
+        timer = deadlines.schedule(room.config.RESUME_GRACE / 1000, self.expire_seat, room, websocket)
+        seats_held_total.inc()
+        print(f"玩家 {player.name} 掉线，保留座位 {room.config.RESUME_GRACE / 1000:g} 秒等待重连")
+        await room.hold_seat(websocket, timer)
+        return True
+    
+    async def expire_seat(self, room: WordPKGame, websocket):
+        """保留到期仍未重连：按断开处理，结束对局"""
+        if websocket not in room.held:
+            return
+        self.drop_tournament_player(websocket)
+        await room.handle_player_disconnect(websocket)
+        self.refresh_room(room)
+    
+    def find_seat(self, token: str) -> Tuple[Optional[WordPKGame], object]:
+        """按会话令牌找到本进程中的房间和座位（玩家当前的连接）"""
+        room = self.rooms.get(token.partition('.')[0])
+        if room is not None:
+            for websocket, player in room.players.items():
+                if player.session == token:
+                    return room, websocket
+        return None, None
+    
+    @staticmethod
+    def owner_worker(key: str) -> Optional[int]:
+        """房间号、锦标赛编号或会话令牌所属的工作进程（多进程部署时编号以工作进程编号开头）"""
+        prefix, separator, _ = key.partition('.')[0].partition('-')
+        return int(prefix) if separator and prefix.isdigit() else None
+    
+    async def resume_seat(self, player: Player, token: str, **attach) -> Optional[Player]:
+        """新连接凭会话令牌回到原来的座位，返回此后代表该连接的玩家，座位不存在时返回None
+        
+        player是为新连接创建的玩家（已打开发送队列）。座位在其他进程时把连接转过去
+        （attach随转接消息一起发送），由房间所在进程恢复；旧连接尚未被发现断开时由新连接
+        接管座位。
+        """
+        room, websocket = self.find_seat(token)
+        if room is None:
+            worker = self.owner_worker(token)
+            if self.cluster and worker is not None and worker != self.cluster.worker_id:
+                self.relay_player(player, worker, resume=token, **attach)
+                return player
+            return None
+        seat = room.players[websocket]
+        if seat.name != player.name or room.config.RESUME_GRACE <= 0:
+            return None
+        if websocket not in room.held:
+            # 服务器还没发现旧连接断开：新连接直接接管座位，旧连接的清理流程不再处理该座位
+            self.player_rooms.pop(websocket, None)
+            asyncio.create_task(websocket.close())
+        seat.websocket, seat.codec, seat.outbox = player.websocket, player.codec, player.outbox
+        seat.last_seen = player.last_seen
+        seat.rtt_ms = None  # 网络路径可能已改变，重新测量
+        self.player_rooms[seat.websocket] = room
+        entry = self.tournament_players.pop(websocket, None)
+        if entry is not None:
+            self.tournament_players[seat.websocket] = entry
+        room.resume_seat(websocket)
+        seats_resumed_total.inc()
+        print(f"玩家 {seat.name} 已重连回房间 {room.room_id}")
+        asyncio.create_task(measure_rtt(seat))
+        return seat
+    
+    async def create_tournament(self, organizer: Player, format: str,
+                                stages: Optional[int] = None) -> Tournament:
+        """创建锦标赛；组织者不参赛，负责开赛并收到每场比赛的结果"""
+        tournament_id = f"{self.room_prefix}t{next(self._tournament_ids)}"
+        tournament = TOURNAMENT_FORMATS[format](tournament_id, stages, organizer=organizer.name)
+        tournament.host = organizer
+        self.tournaments[tournament_id] = tournament
+        self.tournament_players[organizer.websocket] = (tournament, organizer)
+        await self.leave_room(organizer.websocket)  # 组织者不再参与自动配对
+        print(f"玩家 {organizer.name} 创建了锦标赛 {tournament_id}（{format}）")
+        return tournament
+    
+    async def join_tournament(self, player: Player, tournament_id: str) -> Optional[str]:
+        """报名参加锦标赛，返回错误信息，成功时返回None
         
-        # 如果还有玩家在线，处理本轮结果
-        if len(game.players) > 0:
-            await process_round_result(game)
+        开赛后掉线的选手可以凭名字重新加入，之后的比赛照常进行。锦标赛在其他进程时
+        把连接转过去，由锦标赛所在进程处理。
+        """
+        websocket = player.websocket
+        tournament = self.tournaments.get(tournament_id)
+        if tournament is None:
+            worker = self.owner_worker(tournament_id)
+            if (self.cluster and worker is not None and worker != self.cluster.worker_id and
+                    not isinstance(websocket, RemoteConnection) and
+                    websocket not in self.tournament_players):
+                await self.leave_room(websocket)
+                self.relay_player(player, worker, tournament=tournament_id)
+                return None
+            return '锦标赛不存在'
+        entry = self.tournament_players.get(websocket)
+        if entry is not None and entry[0] is not tournament:
+            return '已经加入了其他锦标赛'
+        entrant = tournament.entrants.get(player.name)
+        if entrant is not None:
+            if entrant.player is player:
+                return '已经加入了该锦标赛'
+            if entrant.player is not None:
+                return '该名字已被使用，请使用其他名字'
+            if entrant.withdrawn:
+                return '已经退出了该锦标赛'
+            entrant.player = player  # 掉线后重新加入
+        elif tournament.started:
+            return '锦标赛已经开始'
+        elif len(tournament.entrants) >= Config.TOURNAMENT_MAX_ENTRANTS:
+            return '锦标赛人数已满'
+        else:
+            tournament.add(player.name, player.rating, player)
+        # 报名后不再参与自动配对，由赛程安排每场比赛
+        self.stop_spectating(websocket)
+        await self.leave_room(websocket)
+        self.tournament_players[websocket] = (tournament, player)
+        send_message(player, {
+            'type': 'tournament_joined',
+            'tournament_id': tournament.tournament_id,
+            'format': tournament.format,
+            'entrants': len(tournament.entrants),
+            'started': tournament.started
+        })
+        if tournament.host and not tournament.started:
+            send_message(tournament.host, self.tournament_update(tournament, []))
+        return None
+    
+    def start_tournament(self, player: Player, tournament_id: str) -> Optional[str]:
+        """组织者开赛，返回错误信息，成功时返回None"""
+        tournament = self.tournaments.get(tournament_id)
+        if tournament is None:
+            return '锦标赛不存在'
+        if player.name != tournament.organizer or tournament.host not in (None, player):
+            return '只有组织者可以开赛'
+        try:
+            ready = tournament.start()
+        except ValueError as e:
+            return str(e)
+        print(f"锦标赛 {tournament_id} 开赛：{len(tournament.entrants)} 名选手，共 {tournament.stages} 轮")
+        self.notify_tournament(tournament)
+        for match in ready:
+            self.schedule_match(tournament, match)
+        return None
+    
+    async def leave_tournament(self, player: Player) -> Optional[str]:
+        """退出锦标赛（开赛后视为退赛，之后的比赛判负），返回错误信息，成功时返回None"""
+        websocket = player.websocket
+        entry = self.tournament_players.get(websocket)
+        if entry is None:
+            return '没有参加锦标赛'
+        room = self.get_room(websocket)
+        if room and room.game_in_progress:
+            return '对局进行中，无法退出锦标赛'
+        tournament = entry[0]
+        del self.tournament_players[websocket]
+        if tournament.host is player:
+            tournament.host = None
+        entrant = tournament.entrants.get(player.name)
+        if entrant is not None and entrant.player is player:
+            entrant.player = None
+            tournament.withdraw(player.name)
+            if tournament.host and not tournament.started:
+                send_message(tournament.host, self.tournament_update(tournament, []))
+        send_message(player, {'type': 'tournament_left', 'tournament_id': tournament.tournament_id})
+        return None
+    
+    def drop_tournament_player(self, websocket):
+        """连接断开：组织者和选手标记为不在线（选手可重新加入），开赛前的选手取消报名"""
+        entry = self.tournament_players.pop(websocket, None)
+        if entry is None:
+            return
+        tournament, player = entry
+        if tournament.host is player:
+            tournament.host = None
+        entrant = tournament.entrants.get(player.name)
+        if entrant is not None and entrant.player is player:
+            entrant.player = None
+            if not tournament.started:
+                tournament.withdraw(player.name)
+                if tournament.host:
+                    send_message(tournament.host, self.tournament_update(tournament, []))
+    
+    def in_tournament(self, websocket) -> bool:
+        """是否是还有比赛要进行的锦标赛选手（不能自行更换房间）"""
+        entry = self.tournament_players.get(websocket)
+        if entry is None:
+            return False
+        tournament, player = entry
+        entrant = tournament.entrants.get(player.name)
+        return entrant is not None and entrant.player is player and entrant.eliminated is None
+    
+    def tournament_update(self, tournament: Tournament, standings: List[dict]) -> dict:
+        """锦标赛的进度和排名（前TOURNAMENT_STANDINGS_SIZE名）"""
+        if tournament.finished:
+            state = 'finished'
+        else:
+            state = 'running' if tournament.started else 'registering'
+        return {
+            'type': 'tournament_update',
+            'tournament_id': tournament.tournament_id,
+            'format': tournament.format,
+            'state': state,
+            'stage': min(tournament.stage, tournament.stages or 0),
+            'stages': tournament.stages,
+            'entrants': len(tournament.entrants),
+            'standings': standings[:Config.TOURNAMENT_STANDINGS_SIZE]
+        }
+    
+    def notify_tournament(self, tournament: Tournament) -> List[dict]:
+        """向组织者和所有在线选手发送进度和排名，选手各自附带本人的名次；返回完整排名
+        
+        锦标赛结束时组织者收到完整排名。
+        """
+        standings = tournament.standings()
+        message = self.tournament_update(tournament, standings)
+        if tournament.host:
+            send_message(tournament.host,
+                         {**message, 'standings': standings} if tournament.finished else message)
+        rows = {row['name']: row for row in standings}
+        for entrant in tournament.entrants.values():
+            if entrant.player is not None:
+                send_message(entrant.player, {**message, 'you': rows[entrant.name]})
+        return standings
+    
+    def schedule_match(self, tournament: Tournament, match: Match):
+        """通知双方本场的对手，TOURNAMENT_MATCH_DELAY秒后开赛"""
+        for name, opponent in zip(match.players, reversed(match.players)):
+            player = tournament.entrants[name].player
+            if player is not None:
+                send_message(player, {
+                    'type': 'tournament_match',
+                    'tournament_id': tournament.tournament_id,
+                    'stage': match.stage,
+                    'table': match.table,
+                    'opponent': opponent,
+                    'game': match.games + 1,  # 大于1表示平局后的加赛
+                    'delay': Config.TOURNAMENT_MATCH_DELAY
+                })
+        deadlines.schedule(Config.TOURNAMENT_MATCH_DELAY, self.start_match, tournament, match)
+    
+    async def start_match(self, tournament: Tournament, match: Match):
+        """为一场比赛创建非公开房间并直接开始对局；不在线或已退赛的选手判负"""
+        if self.tournaments.get(tournament.tournament_id) is not tournament or match.done:
+            return
+        present = [tournament.entrants[name] for name in match.players]
+        present = [e for e in present if e.player is not None and not e.withdrawn]
+        if len(present) < 2:
+            await self.finish_match(tournament, match, None, {}, [e.name for e in present])
+            return
+        room = self.create_room(public=False)
+        for entrant in present:
+            player = entrant.player
+            self.stop_spectating(player.websocket)
+            await self.leave_room(player.websocket)
+            await self.join_room(player, room)
+            player.ready = True
+        room.on_result = functools.partial(self.match_finished, tournament, match, room)
+        room.game_in_progress = True
+        self.refresh_room(room)
+        await start_game(room)
+    
+    def match_finished(self, tournament: Tournament, match: Match, room: WordPKGame,
+                       scores: Dict[str, int], winners: List[str]):
+        """比赛房间的对局结束（WordPKGame.on_result回调）"""
+        room.on_result = None
+        asyncio.create_task(self.finish_match(tournament, match, room, scores, winners))
+    
+    async def finish_match(self, tournament: Tournament, match: Match, room: Optional[WordPKGame],
+                           scores: Dict[str, int], winners: List[str]):
+        """回收比赛房间，记录结果并安排因此可以开始的比赛"""
+        if room is not None:
+            for websocket in list(room.players):
+                if websocket in room.held:
+                    # 掉线未归的选手不再保留座位，之后按不在线处理（可重新加入锦标赛）
+                    self.drop_tournament_player(websocket)
+                    await room.remove_player(websocket)
+                else:
+                    await self.leave_room(websocket)
+            self.refresh_room(room)
+        
+        stage = tournament.stage
+        ready = tournament.report(match, winners, scores)
+        result = {
+            'type': 'tournament_result',
+            'tournament_id': tournament.tournament_id,
+            'stage': match.stage,
+            'table': match.table,
+            'players': match.players,
+            'winner': match.winner,
+            'scores': scores,
+            'decided': match.done  # False表示淘汰赛平局，需要加赛
+        }
+        recipients = [tournament.entrants[name].player for name in match.players]
+        for player in recipients + [tournament.host]:
+            if player is not None:
+                send_message(player, result)
+        for next_match in ready:
+            self.schedule_match(tournament, next_match)
+        
+        if tournament.finished:
+            standings = self.notify_tournament(tournament)
+            del self.tournaments[tournament.tournament_id]
+            for websocket, entry in list(self.tournament_players.items()):
+                if entry[0] is tournament:
+                    del self.tournament_players[websocket]
+            print(f"锦标赛 {tournament.tournament_id} 结束，冠军：{standings[0]['name']}")
+        elif tournament.stage != stage:
+            self.notify_tournament(tournament)
+            print(f"锦标赛 {tournament.tournament_id} 第 {stage} 轮结束")
+    
+    async def answer_remote_ping(self, websocket, host_worker: int, link_id: str, ping_id: int):
+        """替房间所在进程ping本进程持有的真实连接"""
+        try:
+            pong_waiter = await websocket.ping()
+            await asyncio.wait_for(pong_waiter, timeout=Config.HEARTBEAT_INTERVAL)
+        except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+            return
+        self.cluster.relay(host_worker, {'kind': 'pong', 'link': link_id, 'id': ping_id})
+    
+    def register_metrics(self, registry: Registry):
+        """注册采集时才计算的房间和配对队列指标"""
+        queue = self.match_queue
+        registry.gauge('wordpk_rooms', "当前房间数", lambda: len(self.rooms))
+        registry.gauge('wordpk_waiting_rooms', "等待对手的公开房间数", lambda: len(self.waiting_rooms))
+        registry.gauge('wordpk_active_matches', "进行中的对局数",
+                       lambda: sum(room.game_in_progress for room in self.rooms.values()))
+        registry.gauge('wordpk_spectators', "当前观众数", lambda: len(self.spectator_rooms))
+        registry.gauge('wordpk_queued_players', "配对队列中的排队人数", lambda: len(queue))
+        registry.counter('wordpk_matchmaking_matched_total', "配对队列累计配对成功的人数",
+                         lambda: queue.matched)
+        registry.gauge('wordpk_matchmaking_wait_p50_seconds', "最近配对成功者排队时间的中位数",
+                       lambda: queue.metrics()['wait_p50'])
+        registry.gauge('wordpk_matchmaking_wait_p99_seconds', "最近配对成功者排队时间的p99",
+                       lambda: queue.metrics()['wait_p99'])
+        registry.gauge('wordpk_matchmaking_longest_wait_seconds', "当前排队最久者已等待的时间",
+                       lambda: queue.metrics()['longest_wait'])
+        registry.gauge('wordpk_tournaments', "报名中和进行中的锦标赛数", lambda: len(self.tournaments))
+        registry.gauge('wordpk_held_seats', "保留中等待重连的座位数",
+                       lambda: sum(len(room.held) for room in self.rooms.values()))
+        registry.gauge('wordpk_pending_deadlines', "已登记的轮次截止时间数", lambda: len(deadlines))
+        registry.gauge('wordpk_snapshot_version', "当前配置和词汇表的版本号",
+                       lambda: self.snapshot.version)
+    
+    async def release(self, websocket, hold: bool = True):
+        """连接结束时清理玩家所在房间；hold为True时对局中掉线的玩家保留座位等待重连"""
+        self.stop_spectating(websocket)
+        relay = self.relays.pop(websocket, None)
+        if relay is not None:
+            # 通知房间所在进程该玩家已断开
+            self.relay_sockets.pop(relay[1], None)
+            self.cluster.relay(relay[0], {'kind': 'closed', 'link': relay[1]})
+        if isinstance(websocket, RemoteConnection):
+            self.remotes.pop(websocket.link_id, None)
+        room = self.player_rooms.pop(websocket, None)
+        if room is not None and hold and await self.hold_seat(room, websocket):
+            return  # 座位保留期间仍是锦标赛的选手
+        self.drop_tournament_player(websocket)
+        if room is None:
+            return
+        await room.handle_player_disconnect(websocket)
+        self.refresh_room(room)
 
-async def main():
-    game = WordPKGame()
+async def main(worker_id: Optional[int] = None, broker_path: Optional[str] = None,
+               db_path: Optional[str] = DEFAULT_DB_PATH,
+               config_path: Optional[str] = Config.CONFIG_PATH,
+               metrics_port: int = Config.METRICS_PORT,
+               match_log_dir: Optional[str] = Config.MATCH_LOG_DIR):
+    match_log = None
+    if match_log_dir:
+        # 每次启动（每个工作进程）写入各自的文件
+        match_log = MatchLog(os.path.join(
+            match_log_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{worker_id or 0}.wpkl"))
+    manager = RoomManager(room_prefix=f"{worker_id}-" if worker_id is not None else '',
+                          store=MatchStore(db_path) if db_path else None,
+                          config_path=config_path, match_log=match_log)
+    manager.register_metrics(metrics)
+    
+    def send_room_error(player: Player, message: str):
+        send_message(player, {
+            'type': 'room_error',
+            'message': message
+        })
+    
+    resume_failed = {'type': 'resume_failed', 'message': '对局已结束或座位已失效'}
+    
+    def refuse_attach(player: Player, message: dict):
+        """不接收其他进程转来的玩家：先转发说明原因的消息，再退回原进程重新配对"""
+        remote = player.websocket
+        manager.remotes.pop(remote.link_id, None)
+        player.outbox.close()
+        manager.cluster.relay(remote.worker, {'kind': 'frame', 'link': remote.link_id,
+                                              **pack_frame(player.codec.encode(message))})
+        manager.cluster.relay(remote.worker, {'kind': 'bounce', 'link': remote.link_id})
     
     async def handle_client(websocket):
+        connections_total.inc()
+        connected_players.inc()
         try:
-            # 检查是否已有两个玩家
-            if len(game.players) >= 2:
-                try:
-                    await websocket.send(json.dumps({
-                        'type': 'name_taken',
-                        'message': '游戏房间已满，请稍后再试'
-                    }))
-                    await websocket.close(code=4000, reason='游戏房间已满')
-                except:
-                    pass
-                return
-            
-            # 等待客户端发送名字
+            await accept_client(websocket)
+        finally:
+            connected_players.dec()
+    
+    async def accept_client(websocket):
+        try:
+            # 等待客户端发送握手消息（旧客户端直接发送名字）
             try:
-                name = await websocket.recv()
+                name, codec, hello = parse_hello(await websocket.recv())
             except websockets.exceptions.ConnectionClosed:
                 return
             
-            # 检查是否有同名玩家
-            if any(p.name == name for p in game.players.values()):
+            if hello is not None:
+                # 握手消息本身总是使用JSON回复
                 await websocket.send(json.dumps({
-                    'type': 'name_taken',
-                    'message': '该名字已被使用，请使用其他名字'
+                    'type': 'welcome',
+                    'version': PROTOCOL_VERSION,
+                    'encoding': codec.name
                 }))
-                await websocket.close(code=4001, reason='名字已被使用')
-                return
-            
-            player = Player(websocket=websocket, name=name)
-            game.players[websocket] = player
             
+            player = Player(websocket=websocket, name=name, codec=codec,
+                            last_seen=time.monotonic())
+            player.open_outbox()  # 之后发给该玩家的消息都经由发送队列
+            if hello and hello.get('resume'):
+                # 断线重连：凭会话令牌回到保留的座位，失败时按新连接处理
+                # 锦标赛编号随转接一起发送，房间所在进程恢复失败时可直接重新加入锦标赛
+                attach = {'tournament': str(hello['tournament'])} if hello.get('tournament') else {}
+                resumed = await manager.resume_seat(player, str(hello['resume']), **attach)
+                if resumed is not None:
+                    await serve_player(resumed, None)
+                    return
+                send_message(player, resume_failed)
+            if manager.store:
+                # 读取已保存的等级分（在线程中查询，不阻塞事件循环）
+                rating = await asyncio.get_running_loop().run_in_executor(
+                    None, manager.store.get_rating, name)
+                if rating is not None:
+                    player.rating = rating
+                history = await asyncio.get_running_loop().run_in_executor(
+                    None, manager.store.word_history, name)
+                player.word_stats = manager.snapshot.selector.new_stats(history)
+            else:
+                player.word_stats = manager.snapshot.selector.new_stats()
             print(f"玩家 {name} 已连接")
             
             # 发送游戏配置信息
-            await websocket.send(json.dumps({
+            config = manager.snapshot.config
+            send_message(player, {
                 'type': 'game_config',
-                'total_rounds': Config.TOTAL_ROUNDS,
-                'answer_timeout': Config.ANSWER_TIMEOUT
-            }))
-            
-            # 通知所有玩家有新玩家加入
-            player_names = [p.name for p in game.players.values()]
-            await broadcast_message(game, {
-                'type': 'players_update',
-                'players': player_names
+                'total_rounds': config.TOTAL_ROUNDS,
+                'answer_timeout': config.ANSWER_TIMEOUT
             })
-            
-            # 通知新玩家已准备的玩家状态
-            ready_players = [p.name for p in game.players.values() if p.ready]
-            for ready_player in ready_players:
-                await websocket.send(json.dumps({
-                    'type': 'player_ready',
-                    'player': ready_player
-                }))
+        except websockets.exceptions.ConnectionClosed:
+            return
+        
+        spectate_room = manager.rooms.get(str(hello.get('spectate'))) if hello else None
+        if spectate_room is not None:
+            # 直接以观众身份进入，不占用座位
+            await manager.spectate(websocket, spectate_room, codec)
+            await serve_player(player, None)
+        elif hello and hello.get('tournament'):
+            # 参加锦标赛：不自动配对，由赛程安排每场比赛；报名失败时按普通连接配对
+            error = await manager.join_tournament(player, str(hello['tournament']))
+            if error:
+                send_room_error(player, error)
+            await serve_player(player, manager.find_waiting_room(name, player.rating) if error else None)
+        else:
+            # 自动配对到等待中的房间
+            await serve_player(player, manager.find_waiting_room(name, player.rating))
+    
+    async def serve_player(player: Player, room: Optional[WordPKGame]):
+        """玩家的主消息循环；room不为空时先加入该房间"""
+        websocket = player.websocket
+        codec = player.codec
+        outbox = player.outbox  # 重连后座位换用新连接的发送队列，这里只关闭本连接的
+        try:
+            if room is not None:
+                if room.is_full() or room.game_in_progress:
+                    # 任务启动前房间已被其他玩家占满
+                    room = manager.find_waiting_room(player.name, player.rating)
+                await manager.join_room(player, room)
             
             # 主消息循环
             async for message in websocket:
-                data = json.loads(message)
+                arrival_ns = time.monotonic_ns()  # 收到消息的时刻，用于服务器计时
+                player.last_seen = arrival_ns / 1_000_000_000
+                
+                relay = manager.relays.get(websocket)
+                if relay is not None:
+                    # 玩家已转到其他进程的房间，原样转发
+                    manager.cluster.relay(relay[0], {'kind': 'frame', 'link': relay[1],
+                                                     **pack_frame(message)})
+                    continue
+                
+                data = codec.decode(message)
+                game = manager.get_room(websocket)
                 
                 if data['type'] == 'disconnect':
                     # 收到客户端的退出消息
                     print(f"收到玩家 {player.name} 的退出消息")
-                    await game.handle_player_disconnect(websocket)
+                    await manager.release(websocket, hold=False)
                     return
                 
+                elif data['type'] == 'list_rooms':
+                    send_message(player, {
+                        'type': 'room_list',
+                        'rooms': manager.list_rooms()
+                    })
+                
+                elif data['type'] == 'leaderboard':
+                    # 查询在线程中执行，不阻塞事件循环
+                    players = []
+                    if manager.store:
+                        players = await asyncio.get_running_loop().run_in_executor(
+                            None, manager.store.leaderboard, Config.LEADERBOARD_SIZE)
+                    send_message(player, {
+                        'type': 'leaderboard',
+                        'players': players
+                    })
+                
+                elif data['type'] == 'spectate':
+                    # 对局进行中不能离开去观战
+                    if game and game.game_in_progress:
+                        send_room_error(player, '对局进行中，无法更换房间')
+                        continue
+                    target = manager.rooms.get(str(data.get('room_id')))
+                    if target is None:
+                        send_room_error(player, '房间不存在')
+                        continue
+                    await manager.leave_room(websocket)
+                    if target.room_id not in manager.rooms:
+                        send_room_error(player, '房间已解散')
+                        continue
+                    await manager.spectate(websocket, target, codec)
+                
+                elif data['type'] == 'create_tournament':
+                    tournament_format = data.get('format', 'swiss')
+                    rounds = data.get('rounds')
+                    if game and game.game_in_progress:
+                        send_room_error(player, '对局进行中，无法创建锦标赛')
+                    elif tournament_format not in TOURNAMENT_FORMATS:
+                        send_room_error(player, '不支持的赛制')
+                    elif rounds is not None and (not isinstance(rounds, int) or rounds < 1):
+                        send_room_error(player, '轮数必须是正整数')
+                    elif websocket in manager.tournament_players:
+                        send_room_error(player, '已经加入了锦标赛')
+                    else:
+                        tournament = await manager.create_tournament(player, tournament_format, rounds)
+                        send_message(player, {
+                            'type': 'tournament_created',
+                            'tournament_id': tournament.tournament_id,
+                            'format': tournament_format
+                        })
+                
+                elif data['type'] in ('join_tournament', 'start_tournament', 'leave_tournament'):
+                    if data['type'] == 'join_tournament':
+                        if game and game.game_in_progress:
+                            send_room_error(player, '对局进行中，无法加入锦标赛')
+                            continue
+                        error = await manager.join_tournament(player, str(data.get('tournament_id')))
+                    elif data['type'] == 'start_tournament':
+                        error = manager.start_tournament(player, str(data.get('tournament_id')))
+                    else:
+                        error = await manager.leave_tournament(player)
+                    if error:
+                        send_room_error(player, error)
+                
+                elif data['type'] in ('create_room', 'join_room'):
+                    # 对局进行中不能更换房间
+                    if game and game.game_in_progress:
+                        send_room_error(player, '对局进行中，无法更换房间')
+                        continue
+                    if manager.in_tournament(websocket):
+                        send_room_error(player, '正在参加锦标赛，无法更换房间')
+                        continue
+                    
+                    if data['type'] == 'create_room':
+                        snapshot = manager.snapshot
+                        min_difficulty = int(data.get('min_difficulty', snapshot.config.MIN_DIFFICULTY))
+                        max_difficulty = int(data.get('max_difficulty', snapshot.config.MAX_DIFFICULTY))
+                        if snapshot.vocab_index.count(min_difficulty, max_difficulty) == 0:
+                            send_room_error(player, '该难度范围内没有题目')
+                            continue
+                        target = manager.create_room(public=data.get('public', True),
+                                                     min_difficulty=min_difficulty,
+                                                     max_difficulty=max_difficulty)
+                    else:
+                        target = manager.rooms.get(str(data.get('room_id')))
+                        if target is None:
+                            send_room_error(player, '房间不存在')
+                            continue
+                        if target is game:
+                            continue
+                        if target.is_full() or target.game_in_progress:
+                            send_room_error(player, '游戏房间已满，请稍后再试')
+                            continue
+                        if target.has_player_named(player.name):
+                            send_room_error(player, '该名字已被使用，请使用其他名字')
+                            continue
+                    
+                    manager.stop_spectating(websocket)
+                    await manager.leave_room(websocket)
+                    await manager.join_room(player, target)
+                
+                elif game is None:
+                    # 观众不能准备或答题
+                    continue
+                
                 elif data['type'] == 'ready':
                     player.ready = True
-                    await broadcast_message(game, {
+                    broadcast_message(game, {
                         'type': 'player_ready',
                         'player': player.name
                     })
@@ -418,42 +1670,160 @@ async def main():
                     # 检查是否所有玩家都准备好了
                     if game.all_players_ready() and not game.game_in_progress:
                         game.game_in_progress = True
+                        game.use_snapshot(manager.snapshot)  # 新对局使用最新的配置和词汇表
+                        manager.refresh_room(game)
                         asyncio.create_task(start_game(game))
                 
                 elif data['type'] == 'answer':
-                    if game.game_in_progress and websocket not in game.answered_players:
-                        answer = data['answer']
-                        answer_time = data['time']
-                        game.answered_players[websocket] = (answer, answer_time)
-                        
-                        try:
-                            # 只向答题玩家发送答题反馈
-                            await websocket.send(json.dumps({
-                                'type': 'answer_feedback',
-                                'answer': answer,
-                                'is_correct': answer == game.current_answer
-                            }))
-                        except websockets.exceptions.ConnectionClosed:
-                            await game.handle_player_disconnect(websocket)
-                            return
-                        
-                        # 如果所有玩家都已答题，进入下一轮
-                        if len(game.answered_players) == len(game.players):
-                            # 取消轮次超时定时器
-                            if game.round_timer:
-                                game.round_timer.cancel()
-                                game.round_timer = None
-                            await process_round_result(game)
+                    await handle_answer(game, player, data, arrival_ns)
         
         except websockets.exceptions.ConnectionClosed:
-            await game.handle_player_disconnect(websocket)
+            pass
         except Exception as e:
             print(f"处理客户端消息时发生错误: {e}")
-            await game.handle_player_disconnect(websocket)
+        finally:
+            await manager.release(websocket)
+            outbox.close()
+    
+    async def on_cluster_message(message: dict):
+        """处理代理发来的消息"""
+        if message['op'] == 'offer':
+            await manager.accept_offer(message)
+            return
+        if message['op'] != 'relay':
+            return
+        
+        kind, link_id = message['kind'], message['link']
+        remote = manager.remotes.get(link_id)
+        websocket = manager.relay_sockets.get(link_id)
+        
+        if kind == 'attach':
+            # 其他进程的玩家转入本进程的房间
+            remote = RemoteConnection(manager.cluster, message['from'], link_id)
+            manager.remotes[link_id] = remote
+            player = Player(websocket=remote, name=message['name'],
+                            codec=CODECS.get(message['codec'], JSON),
+                            rating=message.get('rating', RatingConfig.INITIAL_RATING),
+                            word_stats=manager.snapshot.selector.new_stats(),
+                            last_seen=time.monotonic())
+            player.open_outbox()
+            if 'resume' in message:
+                resumed = await manager.resume_seat(player, message['resume'])
+                if resumed is not None:
+                    asyncio.create_task(serve_player(resumed, None))
+                    return
+                if 'tournament' not in message:
+                    refuse_attach(player, resume_failed)
+                    return
+                # 锦标赛选手回不到座位时在本进程重新加入锦标赛
+                send_message(player, resume_failed)
+            if 'tournament' in message:
+                error = await manager.join_tournament(player, message['tournament'])
+                if error is None:
+                    asyncio.create_task(serve_player(player, None))
+                else:
+                    refuse_attach(player, {'type': 'room_error', 'message': error})
+                return
+            room = manager.waiting_rooms.get(message['host_room'])
+            if room is None or room.has_player_named(player.name):
+                # 原房间已不再等待，换一个本进程的等待房间，没有则退回
+                room = next((r for r in manager.waiting_rooms.values()
+                             if not r.has_player_named(player.name)), None)
+            if room is None:
+                manager.remotes.pop(link_id, None)
+                manager.cluster.relay(message['from'], {'kind': 'bounce', 'link': link_id})
+                return
+            asyncio.create_task(serve_player(player, room))
+        elif kind == 'frame':
+            if remote is not None:
+                remote.feed(unpack_frame(message))
+            elif websocket is not None:
+                # 放入玩家的发送队列，慢连接不会阻塞与代理之间的链路
+                manager.relays[websocket][2].outbox.offer(unpack_frame(message))
+        elif kind == 'closed' and remote is not None:
+            remote.feed_closed()
+        elif kind == 'pong' and remote is not None:
+            remote.resolve_pong(message['id'])
+        elif kind == 'ping' and websocket is not None:
+            asyncio.create_task(manager.answer_remote_ping(
+                websocket, message['from'], link_id, message['id']))
+        elif kind == 'bounce' and websocket is not None:
+            # 被退回的玩家重新在本进程配对
+            _, _, player = manager.relays.pop(websocket)
+            manager.relay_sockets.pop(link_id, None)
+            await manager.join_room(player, manager.find_waiting_room(player.name, player.rating))
+        elif kind == 'close' and websocket is not None:
+            # 先发完已转发来的帧再关闭
+            manager.relays[websocket][2].outbox.close_connection(message['code'], message['reason'])
     
-    async with websockets.serve(handle_client, "localhost", Config.DEFAULT_PORT):
-        print("服务器已启动：ws://localhost:8766")
-        await asyncio.Future()  # 运行到被中断
+    if broker_path:
+        manager.cluster = ClusterLink(worker_id, broker_path, on_cluster_message)
+        await manager.cluster.connect()
+    
+    heartbeat_task = asyncio.create_task(manager.heartbeat())
+    matchmaking_task = asyncio.create_task(manager.matchmaking())
+    reload_task = asyncio.create_task(manager.snapshots.watch(Config.RELOAD_CHECK_INTERVAL))
+    lag_task = asyncio.create_task(monitor_loop_lag(loop_lag, loop_lag_last, Config.LOOP_LAG_INTERVAL))
+    metrics_server = None
+    if metrics_port:
+        # 多进程部署时每个工作进程使用各自的端口
+        metrics_port += worker_id or 0
+        metrics_server = await serve_metrics(metrics, 'localhost', metrics_port)
+        print(f"指标：http://localhost:{metrics_port}/metrics")
+    try:
+        # 多进程部署时各工作进程通过SO_REUSEPORT共享同一端口
+        async with websockets.serve(handle_client, "localhost", Config.DEFAULT_PORT,
+                                    reuse_port=broker_path is not None):
+            if worker_id is None:
+                print("服务器已启动：ws://localhost:8766")
+            else:
+                print(f"工作进程 {worker_id} 已启动：ws://localhost:{Config.DEFAULT_PORT}")
+            await asyncio.Future()  # 运行到被中断
+    finally:
+        heartbeat_task.cancel()
+        matchmaking_task.cancel()
+        reload_task.cancel()
+        lag_task.cancel()
+        if metrics_server:
+            metrics_server.close()
+        deadlines.stop()
+        if manager.cluster:
+            manager.cluster.close()
+        if manager.store:
+            manager.store.close()  # 提交尚未写入的记录
+        if match_log:
+            match_log.close()
+
+def run_worker(worker_id: int, broker_path: str, db_path: Optional[str] = DEFAULT_DB_PATH,
+               config_path: Optional[str] = Config.CONFIG_PATH,
+               metrics_port: int = Config.METRICS_PORT,
+               match_log_dir: Optional[str] = Config.MATCH_LOG_DIR):
+    """工作进程入口"""
+    try:
+        asyncio.run(main(worker_id, broker_path, db_path, config_path, metrics_port, match_log_dir))
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="单词PK服务器")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="工作进程数，大于1时各进程共享端口并可跨进程配对")
+    parser.add_argument('--broker', default=DEFAULT_BROKER_PATH,
+                        help="跨进程配对代理的Unix套接字路径")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH,
+                        help="对局记录数据库路径，传入空字符串则不记录")
+    parser.add_argument('--config', default=Config.CONFIG_PATH,
+                        help="可热更新的配置文件（JSON，覆盖Config中的对局和计分配置）")
+    parser.add_argument('--metrics-port', type=int, default=Config.METRICS_PORT,
+                        help="指标HTTP端口（多进程时依次加上工作进程编号），0表示不开启")
+    parser.add_argument('--match-log', default=Config.MATCH_LOG_DIR,
+                        help="对局录制目录（供match_replay.py回放），传入空字符串则不录制")
+    args = parser.parse_args()
+    if args.workers > 1:
+        run_cluster(args.workers, functools.partial(run_worker, db_path=args.db,
+                                                    config_path=args.config,
+                                                    metrics_port=args.metrics_port,
+                                                    match_log_dir=args.match_log), args.broker)
+    else:
+        asyncio.run(main(db_path=args.db, config_path=args.config,
+                         metrics_port=args.metrics_port, match_log_dir=args.match_log))
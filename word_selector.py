@@ -0,0 +1,191 @@
+"""按玩家答题记录自适应出题
+
+每名玩家的单词统计保存在与词汇索引等长的紧凑数组中（array模块，每个单词12字节）：
+答题次数、答对次数（各2字节）、答对用时总和，以及最近一次见到该单词时的题目序号（各4字节）。
+
+出题分两步：
+1. 选难度：按双方在各难度上的（平滑后的）正确率，优先选择双方正确率接近、
+   且平均正确率接近目标值的难度，让对局保持胶着；
+2. 选单词：难度权重平摊到该难度的每个单词上，排除任一玩家最近见过的单词，
+   已被反复答对的单词降低权重，然后按权重一次性不放回地抽出整场对局的题目。
+
+安装了NumPy时权重计算和抽样是向量化的（直接在数组缓冲区上建立视图，不复制），
+否则退回纯Python实现，结果分布相同。
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import random
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖
+    np = None
+
+from vocabulary_index import VocabularyIndex
+
+class Config:
+    RECENT_WINDOW = 300  # 同一玩家在最近多少道题内不会再遇到同一单词
+    TARGET_ACCURACY = 0.7  # 希望双方平均正确率接近的值
+    TARGET_SCALE = 0.25  # 平均正确率偏离目标值的容忍度
+    GAP_SCALE = 0.15  # 双方正确率差距的容忍度
+    LEVEL_FLOOR = 0.05  # 每个难度至少保留的相对权重，避免题目过于单一
+    PRIOR_WEIGHT = 5  # 先验正确率相当于多少次答题
+    # 没有答题记录时各难度的先验正确率
+    PRIOR_ACCURACY = {1: 0.95, 2: 0.9, 3: 0.8, 4: 0.7, 5: 0.6}
+    DEFAULT_PRIOR = 0.75
+
+class PlayerWordStats:
+    """单个玩家的单词统计（下标与词汇索引一致）"""
+    def __init__(self, size: int):
+        self.attempts = array('H', bytes(2 * size))  # 答题次数
+        self.correct = array('H', bytes(2 * size))  # 答对次数
+        self.correct_time = array('I', bytes(4 * size))  # 答对用时总和（毫秒）
+        self.seen = array('I', bytes(4 * size))  # 最近一次出现时的题目序号，0表示没见过
+        self.sequence = 0  # 已出过的题目数
+        self.level_attempts: Dict[int, int] = {}  # 难度 -> 答题次数
+        self.level_correct: Dict[int, int] = {}  # 难度 -> 答对次数
+        self.owner: Optional['WordSelector'] = None  # 下标所对应的选题器（词汇表版本）
+
+    def mark_seen(self, index: int):
+        self.sequence += 1
+        self.seen[index] = self.sequence
+
+    def record(self, index: int, difficulty: int, correct: bool, time_ms: Optional[int] = None):
+        """记录一次答题结果"""
+        if self.attempts[index] < 0xFFFF:
+            self.attempts[index] += 1
+            if correct:
+                self.correct[index] += 1
+                if time_ms is not None:
+                    self.correct_time[index] = min(self.correct_time[index] + time_ms, 0xFFFFFFFF)
+        self.level_attempts[difficulty] = self.level_attempts.get(difficulty, 0) + 1
+        if correct:
+            self.level_correct[difficulty] = self.level_correct.get(difficulty, 0) + 1
+
+    def level_accuracy(self, difficulty: int) -> float:
+        """该难度上平滑后的正确率"""
+        prior = Config.PRIOR_ACCURACY.get(difficulty, Config.DEFAULT_PRIOR)
+        attempts = self.level_attempts.get(difficulty, 0)
+        correct = self.level_correct.get(difficulty, 0)
+        return (correct + prior * Config.PRIOR_WEIGHT) / (attempts + Config.PRIOR_WEIGHT)
+
+    def is_recent(self, index: int) -> bool:
+        return self.seen[index] > 0 and self.sequence - self.seen[index] < Config.RECENT_WINDOW
+
+class WordSelector:
+    """为一场对局挑选题目"""
+    def __init__(self, vocab_index: VocabularyIndex, rng: Optional[random.Random] = None):
+        self.vocab_index = vocab_index
+        self.difficulties = array('B', (w.difficulty for w in vocab_index.words))
+        self.positions = {w.word: i for i, w in enumerate(vocab_index.words)}
+        self.rng = rng or random.Random()
+        self._np_rng = np.random.default_rng() if np is not None else None
+
+    def new_stats(self, history: Iterable[Tuple[str, int, int, int]] = ()) -> PlayerWordStats:
+        """创建玩家统计，history为已保存的(单词, 答题次数, 答对次数, 答对用时总和)，
+        按最近一次作答的先后排列，据此恢复最近见过的单词"""
+        stats = PlayerWordStats(len(self.difficulties))
+        stats.owner = self
+        for word, attempts, correct, correct_time in history:
+            index = self.positions.get(word)
+            if index is None:
+                continue  # 单词已从词汇表中删除
+            difficulty = self.difficulties[index]
+            stats.attempts[index] = min(attempts, 0xFFFF)
+            stats.correct[index] = min(correct, 0xFFFF)
+            stats.correct_time[index] = min(correct_time or 0, 0xFFFFFFFF)
+            stats.level_attempts[difficulty] = stats.level_attempts.get(difficulty, 0) + attempts
+            stats.level_correct[difficulty] = stats.level_correct.get(difficulty, 0) + correct
+            stats.mark_seen(index)
+        return stats
+
+    def adopt(self, stats: PlayerWordStats) -> PlayerWordStats:
+        """把其他词汇表版本下的统计按单词转换到本选题器的下标（词汇表热更新后使用）"""
+        old = stats.owner
+        if old is None or old is self:
+            return stats
+        words = old.vocab_index.words
+        seen = sorted((stats.seen[i], i) for i in range(len(stats.seen)) if stats.seen[i])
+        return self.new_stats(
+            (words[i].word, stats.attempts[i], stats.correct[i], stats.correct_time[i])
+            for _, i in seen)
+
+    def level_weights(self, players: Sequence[PlayerWordStats],
+                      min_difficulty: int, max_difficulty: int) -> Dict[int, float]:
+        """各难度的权重：双方正确率越接近、平均正确率越接近目标值，权重越高"""
+        weights = {}
+        for difficulty in range(min_difficulty, max_difficulty + 1):
+            if self.vocab_index.count(difficulty, difficulty) == 0:
+                continue
+            accuracies = [p.level_accuracy(difficulty) for p in players] or [
+                Config.PRIOR_ACCURACY.get(difficulty, Config.DEFAULT_PRIOR)]
+            gap = max(accuracies) - min(accuracies)
+            mean = sum(accuracies) / len(accuracies)
+            weights[difficulty] = Config.LEVEL_FLOOR + math.exp(
+                -(gap / Config.GAP_SCALE) ** 2 - ((mean - Config.TARGET_ACCURACY) / Config.TARGET_SCALE) ** 2)
+        return weights
+
+    def choose(self, players: Sequence[PlayerWordStats], min_difficulty: int,
+               max_difficulty: int, count: int, rng: Optional[random.Random] = None) -> List[int]:
+        """不放回地抽出count道题，返回词汇索引中的下标，并记为这些玩家已见过
+
+        传入rng时只使用它产生随机数（对局按种子复现），否则使用选题器自己的随机数。
+        """
+        start, end = self.vocab_index.bounds(min_difficulty, max_difficulty)
+        if start == end:
+            raise ValueError(f"没有难度在 {min_difficulty}-{max_difficulty} 之间的单词")
+        level_weights = self.level_weights(players, min_difficulty, max_difficulty)
+        per_word = [0.0] * 256
+        for difficulty, weight in level_weights.items():
+            per_word[difficulty] = weight / self.vocab_index.count(difficulty, difficulty)
+
+        if np is not None:
+            np_rng = np.random.default_rng(rng.getrandbits(64)) if rng else self._np_rng
+            chosen = self._choose_numpy(players, start, end, per_word, count, np_rng)
+        else:
+            chosen = self._choose_python(players, start, end, per_word, count, rng or self.rng)
+        for index in chosen:
+            for player in players:
+                player.mark_seen(index)
+        return chosen
+
+    def _choose_numpy(self, players, start: int, end: int, per_word: List[float],
+                      count: int, np_rng) -> List[int]:
+        difficulties = np.frombuffer(self.difficulties, dtype=np.uint8)[start:end]
+        weights = np.asarray(per_word)[difficulties]
+        fresh = np.ones(end - start, dtype=bool)
+        for player in players:
+            seen = np.frombuffer(player.seen, dtype=np.uint32)[start:end]
+            fresh &= (seen == 0) | (player.sequence - seen.astype(np.int64) >= Config.RECENT_WINDOW)
+            weights = weights / (1.0 + np.frombuffer(player.correct, dtype=np.uint16)[start:end])
+        if np.count_nonzero(fresh) >= count:
+            weights = np.where(fresh, weights, 0.0)  # 候选词足够时才排除最近见过的
+        count = min(count, end - start)
+        picks = np_rng.choice(end - start, size=count, replace=False, p=weights / weights.sum())
+        return [start + int(i) for i in picks]
+
+    def _choose_python(self, players, start: int, end: int, per_word: List[float],
+                       count: int, rng: random.Random) -> List[int]:
+        weights = []
+        fresh_count = 0
+        for index in range(start, end):
+            weight = per_word[self.difficulties[index]]
+            fresh = True
+            for player in players:
+                fresh = fresh and not player.is_recent(index)
+                weight /= 1.0 + player.correct[index]
+            fresh_count += fresh
+            weights.append((weight, fresh))
+        if fresh_count >= count:
+            weights = [weight if fresh else 0.0 for weight, fresh in weights]
+        else:
+            weights = [weight for weight, _ in weights]
+        count = min(count, end - start)
+        picks = []
+        candidates = list(range(end - start))
+        for _ in range(count):
+            i = rng.choices(candidates, weights)[0]
+            weights[i] = 0.0
+            picks.append(start + i)
+        return picks